@@ -952,3 +952,56 @@ def download_url_media(
         },
         "duration_sec": duration if isinstance(duration, (int, float)) else None,
     }
+
+
+def resolve_audio_stream(url: str) -> Dict[str, Any]:
+    """Resolve a direct audio stream URL (plus request headers) for *url* without downloading."""
+    try:
+        from yt_dlp import YoutubeDL  # type: ignore
+    except Exception as exc:
+        raise RuntimeError("URL download requires yt-dlp. Please install the dependency.") from exc
+
+    origin = _build_origin(url)
+    headers = {"Referer": url}
+    if origin:
+        headers["Origin"] = origin
+
+    ydl_opts = {
+        "format": "bestaudio/best[acodec!=none]/best",
+        "noplaylist": True,
+        "quiet": True,
+        "no_warnings": True,
+        "http_headers": headers,
+    }
+    with YoutubeDL(ydl_opts) as ydl:
+        info = ydl.extract_info(url, download=False)
+
+    if not info:
+        raise RuntimeError("Failed to fetch media metadata.")
+    if "entries" in info:
+        info = next((entry for entry in info.get("entries") or [] if entry), None)
+        if not info:
+            raise RuntimeError("No playable media entries found.")
+
+    stream_url = info.get("url")
+    stream_headers = info.get("http_headers") or headers
+    if not stream_url:
+        requested = info.get("requested_formats") or []
+        audio_format = next((fmt for fmt in requested if fmt.get("acodec") not in (None, "none")), None)
+        if audio_format:
+            stream_url = audio_format.get("url")
+            stream_headers = audio_format.get("http_headers") or stream_headers
+    if not stream_url:
+        raise RuntimeError("Failed to resolve an audio stream URL.")
+
+    duration = info.get("duration")
+    return {
+        "url": stream_url,
+        "http_headers": dict(stream_headers),
+        "source": {
+            "url": url,
+            "title": info.get("title"),
+            "id": info.get("id"),
+        },
+        "duration_sec": duration if isinstance(duration, (int, float)) else None,
+    }
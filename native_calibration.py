@@ -0,0 +1,506 @@
+#!/usr/bin/env python3
+"""
+Hardware calibration for Whisper.cpp.
+
+Runs a short reference clip through every candidate model and (for the native
+engine binary) a grid of thread/processor counts, records real-time factor,
+peak memory and accuracy against a reference transcript, and persists the
+fastest configuration that meets the accuracy target as the hardware profile.
+Every later transcription reuses the selected settings.
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import logging
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import unicodedata
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+from native_config import get_data_dir, get_models_dir
+
+try:
+    import resource  # type: ignore
+except ImportError:
+    resource = None
+
+logger = logging.getLogger(__name__)
+
+PROFILE_VERSION = 1
+ENV_ACCURACY_TARGET = "XCAPTION_CALIBRATION_ACCURACY_TARGET"
+DEFAULT_ACCURACY_TARGET = 0.9
+_PROFILE_FILENAME = "hardware_profile.json"
+_RUN_TIMEOUT_SECONDS = 15 * 60
+
+_profile_cache: Optional[Dict[str, Any]] = None
+_profile_cache_mtime: Optional[float] = None
+_profile_lock = threading.Lock()
+
+
+def get_profile_path() -> Path:
+    return get_data_dir() / _PROFILE_FILENAME
+
+
+def _machine_signature() -> Dict[str, Any]:
+    return {
+        "platform": sys.platform,
+        "machine": platform.machine(),
+        "cpu_count": os.cpu_count() or 1,
+    }
+
+
+def load_hardware_profile() -> Optional[Dict[str, Any]]:
+    """Return the persisted profile, or None when missing or recorded on other hardware."""
+    global _profile_cache, _profile_cache_mtime
+    path = get_profile_path()
+    try:
+        mtime = path.stat().st_mtime
+    except OSError:
+        return None
+    with _profile_lock:
+        if _profile_cache is not None and _profile_cache_mtime == mtime:
+            return _profile_cache
+        try:
+            profile = json.loads(path.read_text(encoding="utf-8"))
+        except Exception as exc:
+            logger.warning("Failed to read hardware profile %s: %s", path, exc)
+            return None
+        if not isinstance(profile, dict) or profile.get("version") != PROFILE_VERSION:
+            return None
+        if profile.get("machine") != _machine_signature():
+            logger.info("Ignoring hardware profile recorded on different hardware")
+            return None
+        _profile_cache = profile
+        _profile_cache_mtime = mtime
+        return profile
+
+
+def _save_hardware_profile(profile: Dict[str, Any]) -> None:
+    global _profile_cache, _profile_cache_mtime
+    path = get_profile_path()
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_suffix(".tmp")
+    tmp_path.write_text(json.dumps(profile, indent=2, ensure_ascii=False), encoding="utf-8")
+    tmp_path.replace(path)
+    with _profile_lock:
+        _profile_cache = None
+        _profile_cache_mtime = None
+
+
+def get_calibrated_settings() -> Dict[str, Any]:
+    """Return the selected configuration (model_path, threads, processors) or an empty dict."""
+    profile = load_hardware_profile()
+    selected = profile.get("selected") if profile else None
+    return dict(selected) if isinstance(selected, dict) else {}
+
+
+def _normalize_for_cer(text: str) -> str:
+    return "".join(
+        ch
+        for ch in unicodedata.normalize("NFKC", text or "").lower()
+        if not ch.isspace() and not unicodedata.category(ch).startswith("P")
+    )
+
+
+def character_error_rate(hypothesis: str, reference: str) -> Optional[float]:
+    """Return the character error rate of *hypothesis* against *reference* (None if empty)."""
+    reference = _normalize_for_cer(reference)
+    hypothesis = _normalize_for_cer(hypothesis)
+    if not reference:
+        return None
+    previous = list(range(len(hypothesis) + 1))
+    for i, ref_char in enumerate(reference, start=1):
+        current = [i] + [0] * len(hypothesis)
+        for j, hyp_char in enumerate(hypothesis, start=1):
+            current[j] = min(
+                previous[j] + 1,
+                current[j - 1] + 1,
+                previous[j - 1] + (ref_char != hyp_char),
+            )
+        previous = current
+    return previous[-1] / len(reference)
+
+
+def _candidate_models(models: Optional[Iterable[str]]) -> List[Path]:
+    from whisper_cpp_runtime import resolve_whisper_model
+
+    candidates: List[Path] = []
+    if models:
+        for name in models:
+            resolved = resolve_whisper_model(name)
+            if resolved and resolved.name == Path(name).name:
+                candidates.append(resolved)
+            else:
+                logger.warning("Calibration model %s not found; skipping", name)
+    else:
+        models_dir = get_models_dir()
+        if models_dir.exists():
+            candidates.extend(sorted(models_dir.glob("ggml-*.bin")))
+        default_model = resolve_whisper_model(None)
+        if default_model:
+            candidates.append(default_model)
+
+    unique: List[Path] = []
+    seen = set()
+    for candidate in candidates:
+        key = candidate.resolve()
+        if key not in seen and candidate.is_file():
+            seen.add(key)
+            unique.append(candidate)
+    return unique
+
+
+def _candidate_thread_grid(cpu_count: int) -> List[Dict[str, int]]:
+    threads = sorted({t for t in (2, 4, 8, cpu_count) if 1 <= t <= cpu_count} or {1})
+    processors = [1, 2] if cpu_count >= 4 else [1]
+    return [
+        {"threads": t, "processors": p}
+        for t in threads
+        for p in processors
+        if t * p <= cpu_count
+    ]
+
+
+def _run_with_rusage(cmd: List[str], env: Optional[Dict[str, str]] = None) -> Dict[str, Any]:
+    started = time.perf_counter()
+    proc = subprocess.Popen(
+        cmd,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.STDOUT,
+        text=True,
+        encoding="utf-8",
+        errors="replace",
+        env=env,
+    )
+    # A hung candidate must not block the calibration job forever: kill it at
+    # the deadline, then reap it normally (with wait4 for rusage).
+    timed_out = threading.Event()
+
+    def _kill_on_deadline() -> None:
+        timed_out.set()
+        try:
+            proc.kill()
+        except OSError:
+            pass
+
+    deadline = threading.Timer(_RUN_TIMEOUT_SECONDS, _kill_on_deadline)
+    deadline.daemon = True
+    deadline.start()
+    max_rss_mb = None
+    try:
+        if resource is not None and hasattr(os, "wait4"):
+            output = proc.stdout.read() if proc.stdout else ""
+            _, status, usage = os.wait4(proc.pid, 0)
+            proc.returncode = os.waitstatus_to_exitcode(status)
+            # ru_maxrss is reported in bytes on macOS and kilobytes elsewhere.
+            divisor = 1024 * 1024 if sys.platform == "darwin" else 1024
+            max_rss_mb = round(usage.ru_maxrss / divisor, 1)
+        else:
+            output, _ = proc.communicate()
+    finally:
+        deadline.cancel()
+    if timed_out.is_set():
+        raise RuntimeError(f"engine timed out after {_RUN_TIMEOUT_SECONDS}s")
+    return {
+        "returncode": proc.returncode,
+        "output": output or "",
+        "elapsed": time.perf_counter() - started,
+        "max_rss_mb": max_rss_mb,
+    }
+
+
+def _transcribe_candidate(
+    engine: Path,
+    model_file: Path,
+    audio_path: Path,
+    *,
+    language: Optional[str],
+    threads: Optional[int],
+    processors: Optional[int],
+) -> Dict[str, Any]:
+    from whisper_cpp_runtime import (
+        _build_node_env,
+        _build_node_script,
+        _segment_from_item,
+        _SEGMENT_MARKER,
+        get_whisper_gpu_flags,
+        resolve_node_binary,
+    )
+
+    with tempfile.TemporaryDirectory(prefix="xcaption_calibration_") as work_dir:
+        output_prefix = Path(work_dir) / "whisper"
+        env = None
+        if engine.suffix.lower() == ".mjs":
+            node_bin = resolve_node_binary()
+            if not node_bin:
+                raise RuntimeError("Node.js runtime not found.")
+            script = _build_node_script(
+                engine,
+                audio_path,
+                {"model": str(model_file), "language": language or "auto"},
+            )
+            cmd = [node_bin, "--input-type=module", "-e", script]
+            env = _build_node_env()
+        else:
+            cmd = [
+                str(engine),
+                "-m",
+                str(model_file),
+                "-f",
+                str(audio_path),
+                "-of",
+                str(output_prefix),
+                "-otxt",
+                "-np",
+            ]
+            if language and language not in {"auto", ""}:
+                cmd.extend(["-l", language])
+            if threads:
+                cmd.extend(["-t", str(threads)])
+            if processors:
+                cmd.extend(["-p", str(processors)])
+            cmd.extend(get_whisper_gpu_flags())
+
+        run = _run_with_rusage(cmd, env=env)
+        if run["returncode"] != 0:
+            raise RuntimeError(run["output"].strip()[-500:] or "engine failed")
+
+        text = ""
+        txt_path = output_prefix.with_suffix(".txt")
+        if txt_path.exists():
+            text = txt_path.read_text(encoding="utf-8", errors="ignore").strip()
+        else:
+            texts: List[str] = []
+            for line in run["output"].splitlines():
+                if _SEGMENT_MARKER not in line:
+                    continue
+                try:
+                    segment = _segment_from_item(json.loads(line.split(_SEGMENT_MARKER, 1)[-1].strip()))
+                except Exception:
+                    continue
+                if segment and segment["text"]:
+                    texts.append(segment["text"])
+            text = " ".join(texts)
+    return {"text": text, "elapsed": run["elapsed"], "max_rss_mb": run["max_rss_mb"]}
+
+
+def _select_configuration(runs: List[Dict[str, Any]], accuracy_target: float) -> Optional[Dict[str, Any]]:
+    succeeded = [run for run in runs if run.get("rtf") is not None]
+    if not succeeded:
+        return None
+    qualifying = [run for run in succeeded if (run.get("accuracy") or 0.0) >= accuracy_target]
+    if qualifying:
+        return min(qualifying, key=lambda run: run["rtf"])
+    # Nothing meets the target: keep the most accurate, fastest among equals.
+    return min(succeeded, key=lambda run: (-(run.get("accuracy") or 0.0), run["rtf"]))
+
+
+def run_calibration(
+    reference_audio: str | Path,
+    *,
+    reference_text: Optional[str] = None,
+    models: Optional[Iterable[str]] = None,
+    language: Optional[str] = None,
+    accuracy_target: Optional[float] = None,
+    progress_callback: Optional[Callable[[int, str], None]] = None,
+) -> Dict[str, Any]:
+    """Benchmark candidate configurations on *reference_audio* and persist the hardware profile.
+
+    Without *reference_text*, the output of the largest candidate model is used
+    as the reference, so accuracy is relative to the best model available.
+    """
+    from native_ffmpeg import get_audio_duration
+    from whisper_cpp_runtime import resolve_whisper_engine
+
+    audio_path = Path(reference_audio)
+    if not audio_path.exists():
+        raise FileNotFoundError(f"Reference audio not found: {audio_path}")
+    engine = resolve_whisper_engine()
+    if not engine:
+        raise RuntimeError("Transcription engine not found.")
+    model_files = _candidate_models(models)
+    if not model_files:
+        raise RuntimeError("No candidate models found to calibrate.")
+    duration = get_audio_duration(str(audio_path))
+    if not duration or duration <= 0:
+        raise RuntimeError("Could not determine reference audio duration.")
+
+    if accuracy_target is None:
+        try:
+            accuracy_target = float(os.environ.get(ENV_ACCURACY_TARGET, DEFAULT_ACCURACY_TARGET))
+        except ValueError:
+            accuracy_target = DEFAULT_ACCURACY_TARGET
+
+    machine = _machine_signature()
+    uses_binary = engine.suffix.lower() != ".mjs"
+    grid = _candidate_thread_grid(machine["cpu_count"]) if uses_binary else [{"threads": None, "processors": None}]
+    # Largest model first so it can serve as the fallback reference.
+    model_files.sort(key=lambda path: path.stat().st_size, reverse=True)
+    total = len(model_files) * len(grid)
+
+    runs: List[Dict[str, Any]] = []
+    reference = reference_text
+    step = 0
+    for model_file in model_files:
+        for settings in grid:
+            step += 1
+            if progress_callback:
+                progress_callback(
+                    int(5 + 90 * (step - 1) / total),
+                    f"Calibrating {model_file.name} ({step}/{total})",
+                )
+            run: Dict[str, Any] = {
+                "model": model_file.name,
+                "model_path": str(model_file),
+                "threads": settings["threads"],
+                "processors": settings["processors"],
+            }
+            try:
+                outcome = _transcribe_candidate(
+                    engine,
+                    model_file,
+                    audio_path,
+                    language=language,
+                    threads=settings["threads"],
+                    processors=settings["processors"],
+                )
+            except Exception as exc:
+                logger.warning("Calibration run failed for %s %s: %s", model_file.name, settings, exc)
+                run["error"] = str(exc)
+                runs.append(run)
+                continue
+            if reference is None:
+                reference = outcome["text"]
+            cer = character_error_rate(outcome["text"], reference or "")
+            run.update({
+                "rtf": round(outcome["elapsed"] / duration, 4),
+                "elapsed": round(outcome["elapsed"], 2),
+                "max_rss_mb": outcome["max_rss_mb"],
+                "accuracy": round(max(0.0, 1.0 - cer), 4) if cer is not None else None,
+            })
+            logger.info(
+                "Calibration %s t=%s p=%s: rtf=%.3f accuracy=%s rss=%sMB",
+                model_file.name,
+                settings["threads"],
+                settings["processors"],
+                run["rtf"],
+                run["accuracy"],
+                run["max_rss_mb"],
+            )
+            runs.append(run)
+
+    selected = _select_configuration(runs, accuracy_target)
+    if not selected:
+        raise RuntimeError("Every calibration run failed; see logs for details.")
+
+    profile = {
+        "version": PROFILE_VERSION,
+        "created_at": time.time(),
+        "machine": machine,
+        "engine": str(engine),
+        "reference": {
+            "audio": str(audio_path),
+            "duration": round(duration, 2),
+            "transcript_provided": reference_text is not None,
+        },
+        "accuracy_target": accuracy_target,
+        "runs": runs,
+        "selected": {
+            key: selected.get(key)
+            for key in ("model", "model_path", "threads", "processors", "rtf", "accuracy", "max_rss_mb")
+        },
+    }
+    _save_hardware_profile(profile)
+    if progress_callback:
+        progress_callback(100, "Calibration complete")
+    return profile
+
+
+def process_calibration_job(
+    job_id: str,
+    reference_audio: str,
+    reference_text: Optional[str] = None,
+    models: Optional[List[str]] = None,
+    language: Optional[str] = None,
+    accuracy_target: Optional[float] = None,
+) -> Dict[str, Any]:
+    """Queue entry point for calibration with progress reported on the job channel."""
+    import native_job_handlers
+
+    def report(progress: int, message: str) -> None:
+        native_job_handlers.update_job_progress(job_id, progress, message, {"stage": "calibration"})
+
+    profile = run_calibration(
+        reference_audio,
+        reference_text=reference_text,
+        models=models,
+        language=language,
+        accuracy_target=accuracy_target,
+        progress_callback=report,
+    )
+    native_job_handlers.update_job_progress(job_id, 100, "Calibration complete", {
+        "stage": "completed",
+        "result": profile,
+    })
+    return profile
+
+
+def _parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Calibrate Whisper.cpp settings for this machine.")
+    parser.add_argument("audio", help="Short reference clip (30-60 s recommended).")
+    parser.add_argument("--reference", default=None, help="Reference transcript text file.")
+    parser.add_argument(
+        "--model",
+        action="append",
+        dest="models",
+        default=None,
+        help="Candidate model file (repeatable). Defaults to every ggml-*.bin in the models dir.",
+    )
+    parser.add_argument("--language", default=None, help="Language code passed to the engine.")
+    parser.add_argument(
+        "--accuracy-target",
+        type=float,
+        default=None,
+        help=f"Minimum 1-CER required (default {DEFAULT_ACCURACY_TARGET}, or ${ENV_ACCURACY_TARGET}).",
+    )
+    return parser.parse_args()
+
+
+def main() -> int:
+    args = _parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    from native_config import setup_environment
+
+    setup_environment()
+    reference_text = None
+    if args.reference:
+        reference_text = Path(args.reference).read_text(encoding="utf-8")
+    try:
+        profile = run_calibration(
+            args.audio,
+            reference_text=reference_text,
+            models=args.models,
+            language=args.language,
+            accuracy_target=args.accuracy_target,
+        )
+    except Exception as exc:
+        logger.error(str(exc))
+        return 2
+    selected = profile["selected"]
+    print(
+        f"[OK] Selected {selected['model']} threads={selected['threads']} "
+        f"processors={selected['processors']} rtf={selected['rtf']} accuracy={selected['accuracy']}"
+    )
+    print(f"Profile written to {get_profile_path()}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
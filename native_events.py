@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+"""
+In-process event hub behind the ``/events`` Server-Sent Events stream.
+
+Every published event gets a process-wide increasing id and is kept in a
+ring buffer so a reconnecting client can resume from ``Last-Event-ID``.
+Each subscriber has its own bounded queue; a subscriber that falls behind
+loses events instead of slowing publishers down, and is told to resync.
+"""
+
+from __future__ import annotations
+
+import json
+import queue
+import threading
+import time
+from collections import deque
+from typing import Any, Deque, Dict, Iterable, List, Optional, Set, Tuple
+
+HISTORY_SIZE = 2000
+SUBSCRIBER_QUEUE_SIZE = 256
+
+
+class Event:
+    __slots__ = ("id", "job_id", "event", "data", "timestamp")
+
+    def __init__(self, event_id: int, job_id: str, event: str, data: Dict[str, Any]) -> None:
+        self.id = event_id
+        self.job_id = job_id
+        self.event = event
+        self.data = data
+        self.timestamp = time.time()
+
+    def to_sse(self) -> str:
+        payload = json.dumps({"job_id": self.job_id, "data": self.data}, ensure_ascii=False, default=str)
+        return f"id: {self.id}\nevent: {self.event}\ndata: {payload}\n\n"
+
+
+class Subscriber:
+    """One stream's view of the hub; *job_ids* of None means every job."""
+
+    __slots__ = ("job_ids", "queue", "overflowed", "closed")
+
+    def __init__(self, job_ids: Optional[Set[str]]) -> None:
+        self.job_ids = job_ids
+        self.queue: "queue.Queue[Event]" = queue.Queue(maxsize=SUBSCRIBER_QUEUE_SIZE)
+        self.overflowed = False
+        self.closed = False
+
+    def wants(self, job_id: str) -> bool:
+        return self.job_ids is None or job_id in self.job_ids
+
+    def get(self, timeout: float) -> Optional[Event]:
+        try:
+            return self.queue.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+
+_lock = threading.Lock()
+_next_id = 1
+_history: Deque[Event] = deque(maxlen=HISTORY_SIZE)
+_subscribers: List[Subscriber] = []
+
+
+def publish(job_id: str, event: str, data: Dict[str, Any]) -> int:
+    """Record an event for *job_id* and hand it to every interested subscriber."""
+    global _next_id
+    with _lock:
+        item = Event(_next_id, job_id, event, data)
+        _next_id += 1
+        _history.append(item)
+        subscribers = [subscriber for subscriber in _subscribers if subscriber.wants(job_id)]
+    for subscriber in subscribers:
+        try:
+            subscriber.queue.put_nowait(item)
+        except queue.Full:
+            subscriber.overflowed = True
+    return item.id
+
+
+def subscribe(job_ids: Optional[Iterable[str]] = None) -> Subscriber:
+    subscriber = Subscriber(set(job_ids) if job_ids else None)
+    with _lock:
+        _subscribers.append(subscriber)
+    return subscriber
+
+
+def unsubscribe(subscriber: Subscriber) -> None:
+    with _lock:
+        try:
+            _subscribers.remove(subscriber)
+        except ValueError:
+            pass
+
+
+def replay(after_id: int, job_ids: Optional[Iterable[str]] = None) -> Tuple[List[Event], bool]:
+    """Return buffered events newer than *after_id*; the flag is False when some were already dropped."""
+    wanted = set(job_ids) if job_ids else None
+    with _lock:
+        events = [item for item in _history if item.id > after_id]
+        # An id from a previous server process is unknown here, and one older
+        # than the ring means events fell out of it: both need a resync.
+        complete = after_id < _next_id and (not _history or _history[0].id <= after_id + 1)
+    if wanted is not None:
+        events = [item for item in events if item.job_id in wanted]
+    return events, complete
+
+
+def close_all() -> None:
+    """Mark every subscriber closed and wake it, so open streams end (server shutdown)."""
+    with _lock:
+        subscribers = list(_subscribers)
+    for subscriber in subscribers:
+        subscriber.closed = True
+        try:
+            subscriber.queue.put_nowait(None)
+        except queue.Full:
+            pass
+
+
+def subscriber_count() -> int:
+    with _lock:
+        return len(_subscribers)
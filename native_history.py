@@ -3,9 +3,13 @@
 
 from __future__ import annotations
 
+import base64
 import json
 import logging
+import os
 import sqlite3
+import threading
+from collections import OrderedDict
 from datetime import datetime, timezone
 import time
 from pathlib import Path
@@ -14,6 +18,8 @@ import hashlib
 
 from native_config import get_data_dir
 from native_job_queue import get_queue
+from native_segment_index import SegmentIndex
+import native_transcript_store
 
 logger = logging.getLogger(__name__)
 
@@ -28,6 +34,31 @@ def _cleanup_legacy_history() -> None:
         logger.debug("Failed to remove legacy history file: %s", exc)
 
 
+# Segment indexes of recently opened transcripts, keyed by job id and
+# validated against the record's updated_at.
+_SEGMENT_INDEX_CACHE_SIZE = 8
+_segment_index_cache: "OrderedDict[str, Tuple[Any, Dict[str, Any], SegmentIndex]]" = OrderedDict()
+_segment_index_lock = threading.Lock()
+
+# Media validity is checked by a background thread; read paths only use the
+# cached flag in media_validity and schedule a recheck when it is stale.
+_MEDIA_SWEEP_ENV = "XCAPTION_MEDIA_SWEEP_SECONDS"
+_DEFAULT_MEDIA_SWEEP_SECONDS = 300.0
+_media_validation_lock = threading.Lock()
+_media_validation_pending: "OrderedDict[str, None]" = OrderedDict()
+_media_validation_wakeup = threading.Event()
+_media_validation_thread: Optional[threading.Thread] = None
+_media_identity_pending: "OrderedDict[str, None]" = OrderedDict()
+_MEDIA_IDENTITY_KEYS = ("media_path", "media_hash", "media_size", "media_mtime")
+_STRICT_MEDIA_HASH_ENV = "XCAPTION_STRICT_MEDIA_HASH"
+_transcripts_migrated = False
+_transcripts_migration_lock = threading.Lock()
+_MAINTENANCE_BATCH = 50
+_FINGERPRINT_PREFIX = "b2s1:"
+_FINGERPRINT_BLOCK_SIZE = 64 * 1024
+_FINGERPRINT_STRIDED_BLOCKS = 16
+_TOMBSTONE_RETENTION_SECONDS = 30 * 24 * 3600
+
 FINISHED_STATES = {"finished", "completed"}
 FAILED_STATES = {"failed", "errored"}
 CANCELLED_STATES = {"canceled", "cancelled"}
@@ -43,6 +74,10 @@ def _connect() -> sqlite3.Connection:
     path.parent.mkdir(parents=True, exist_ok=True)
     conn = sqlite3.connect(str(path))
     _ensure_records_table(conn)
+    _ensure_language_table(conn)
+    _ensure_media_validity_table(conn)
+    native_transcript_store.ensure_tables(conn)
+    _migrate_transcripts(conn)
     return conn
 
 
@@ -77,6 +112,10 @@ def _ensure_records_table(conn: sqlite3.Connection) -> None:
         "media_size": "INTEGER",
         "media_mtime": "REAL",
         "display_name": "TEXT",
+        "media_fingerprint": "TEXT",
+        "transcript_preview": "TEXT",
+        "sort_key": "REAL",
+        "changed_at": "REAL",
     })
     conn.execute(
         """
@@ -84,6 +123,170 @@ def _ensure_records_table(conn: sqlite3.Connection) -> None:
         ON job_records(updated_at)
         """
     )
+    # sort_key mirrors COALESCE(updated_at, created_at) as a plain column so
+    # history pages can seek on (sort_key, job_id) instead of sorting the table.
+    conn.execute(
+        """
+        CREATE INDEX IF NOT EXISTS idx_job_records_sort
+        ON job_records(sort_key, job_id)
+        """
+    )
+    # changed_at moves whenever anything a history entry shows changes,
+    # including fields (media validity, identity) that must not reorder the
+    # list; "since" syncs seek on it.
+    conn.execute(
+        """
+        CREATE INDEX IF NOT EXISTS idx_job_records_changed
+        ON job_records(changed_at, job_id)
+        """
+    )
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS job_tombstones (
+            job_id TEXT PRIMARY KEY,
+            deleted_at REAL
+        )
+        """
+    )
+    conn.execute(
+        """
+        CREATE INDEX IF NOT EXISTS idx_job_tombstones_deleted
+        ON job_tombstones(deleted_at)
+        """
+    )
+
+
+def _ensure_language_table(conn: sqlite3.Connection) -> None:
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS media_languages (
+            media_hash TEXT PRIMARY KEY,
+            language TEXT,
+            probability REAL,
+            detected_at REAL
+        )
+        """
+    )
+
+
+def _transcript_media_path(transcript: Any) -> Optional[str]:
+    if not isinstance(transcript, dict):
+        return None
+    return transcript.get("file_path") or transcript.get("original_audio_path")
+
+
+def _migrate_transcripts(conn: sqlite3.Connection) -> None:
+    """Move transcripts still stored inline in job_records into job_transcripts (runs once per process).
+
+    Also backfills sort_key and changed_at for rows written before those
+    columns existed; every later write sets both.
+    """
+    global _transcripts_migrated
+    if _transcripts_migrated:
+        return
+    with _transcripts_migration_lock:
+        if _transcripts_migrated:
+            return
+        conn.execute(
+            "UPDATE job_records SET sort_key = COALESCE(updated_at, created_at, 0) WHERE sort_key IS NULL"
+        )
+        conn.execute("UPDATE job_records SET changed_at = sort_key WHERE changed_at IS NULL")
+        conn.commit()
+        job_ids = [
+            row[0]
+            for row in conn.execute(
+                "SELECT job_id FROM job_records WHERE transcript_json IS NOT NULL OR transcript_text IS NOT NULL"
+            ).fetchall()
+        ]
+        for job_id in job_ids:
+            row = conn.execute(
+                "SELECT transcript_json, transcript_text, updated_at FROM job_records WHERE job_id = ?",
+                (job_id,),
+            ).fetchone()
+            if not row:
+                continue
+            transcript_json, transcript_text, updated_at = row
+            transcript = _parse_json(transcript_json)
+            if transcript_text is None and isinstance(transcript, dict):
+                transcript_text = transcript.get("text")
+            conn.execute(
+                """
+                INSERT INTO job_transcripts (job_id, transcript_json, transcript_text, updated_at)
+                VALUES (?, ?, ?, ?)
+                ON CONFLICT(job_id) DO NOTHING
+                """,
+                (job_id, transcript_json, transcript_text, updated_at),
+            )
+            conn.execute(
+                """
+                UPDATE job_records
+                SET transcript_json = NULL,
+                    transcript_text = NULL,
+                    transcript_preview = COALESCE(transcript_preview, ?),
+                    media_path = COALESCE(media_path, ?)
+                WHERE job_id = ?
+                """,
+                (native_transcript_store.transcript_preview(transcript_text), _transcript_media_path(transcript), job_id),
+            )
+            conn.commit()
+        if job_ids:
+            logger.info("Moved %d transcripts out of job_records", len(job_ids))
+        _transcripts_migrated = True
+    threading.Thread(target=_transcript_maintenance_loop, name="TranscriptMaintenance", daemon=True).start()
+
+
+def _transcript_maintenance_loop() -> None:
+    """Bring transcripts written by older versions up to date, in small batches.
+
+    Older transcripts are split into segment rows (which makes them
+    searchable), and JSON-text documents, word lists and queue results are
+    packed with native_transcript_codec.
+    """
+    try:
+        total = 0
+        while True:
+            with _connect() as conn:
+                job_ids = native_transcript_store.unsynced_jobs(conn, _MAINTENANCE_BATCH)
+                for job_id in job_ids:
+                    native_transcript_store.sync_segments(conn, job_id)
+                conn.commit()
+            if not job_ids:
+                break
+            total += len(job_ids)
+        if total:
+            logger.info("Indexed %d older transcripts for search", total)
+
+        job_cursor: Optional[str] = ""
+        while job_cursor is not None:
+            with _connect() as conn:
+                job_cursor = native_transcript_store.compact_transcripts(conn, job_cursor, _MAINTENANCE_BATCH)
+                conn.commit()
+        row_cursor: Optional[int] = 0
+        while row_cursor is not None:
+            with _connect() as conn:
+                row_cursor = native_transcript_store.compact_segment_words(conn, row_cursor, _MAINTENANCE_BATCH * 10)
+                conn.commit()
+        result_cursor: Optional[str] = ""
+        while result_cursor is not None:
+            result_cursor = get_queue("default").compact_results(result_cursor, _MAINTENANCE_BATCH)
+    except Exception as exc:
+        logger.warning("Transcript maintenance stopped: %s", exc)
+
+
+def _ensure_media_validity_table(conn: sqlite3.Connection) -> None:
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS media_validity (
+            job_id TEXT PRIMARY KEY,
+            media_path TEXT,
+            media_hash TEXT,
+            media_size INTEGER,
+            media_mtime REAL,
+            invalid INTEGER,
+            checked_at REAL
+        )
+        """
+    )
 
 
 def _ensure_columns(conn: sqlite3.Connection, columns: Dict[str, str]) -> None:
@@ -124,12 +327,56 @@ def compute_file_hash(path: str, chunk_size: int = 1024 * 1024) -> Optional[str]
         return None
 
 
+def is_strict_media_hashing() -> bool:
+    return os.environ.get(_STRICT_MEDIA_HASH_ENV, "").strip().lower() in {"1", "true", "yes"}
+
+
+def is_media_fingerprint(value: Optional[str]) -> bool:
+    return bool(value) and str(value).startswith(_FINGERPRINT_PREFIX)
+
+
+def compute_media_fingerprint(
+    path: str,
+    block_size: int = _FINGERPRINT_BLOCK_SIZE,
+    strided_blocks: int = _FINGERPRINT_STRIDED_BLOCKS,
+) -> Optional[str]:
+    """BLAKE2b over the file size and sampled blocks (head, tail and evenly strided chunks).
+
+    Reads a fixed ~1 MB regardless of file size. Files smaller than the
+    sample budget are hashed in full.
+    """
+    try:
+        size = Path(path).stat().st_size
+        hasher = hashlib.blake2b(digest_size=20)
+        hasher.update(str(size).encode("ascii"))
+        with open(path, "rb") as handle:
+            if size <= block_size * (strided_blocks + 2):
+                hasher.update(handle.read())
+            else:
+                last_offset = size - block_size
+                stride = last_offset / (strided_blocks + 1)
+                offsets = [0, *(int(stride * idx) for idx in range(1, strided_blocks + 1)), last_offset]
+                for offset in offsets:
+                    handle.seek(offset)
+                    hasher.update(handle.read(block_size))
+        return f"{_FINGERPRINT_PREFIX}{hasher.hexdigest()}"
+    except Exception:
+        return None
+
+
 def is_media_invalid(
     media_path: Optional[str],
     media_hash: Optional[str],
     media_size: Optional[int],
     media_mtime: Optional[float],
+    media_fingerprint: Optional[str] = None,
 ) -> Optional[bool]:
+    """Check media against its recorded identity; may hash the whole file.
+
+    Only the background validator calls this. Read paths use the cached flag.
+    The sampled fingerprint is compared unless strict hashing is enabled and
+    a full SHA-256 is on record.
+    """
     if not media_path or not media_hash:
         return None
     current_size, current_mtime = get_file_meta(media_path)
@@ -142,12 +389,245 @@ def is_media_invalid(
         and current_mtime == media_mtime
     ):
         return False
+    if is_media_fingerprint(media_hash):
+        media_fingerprint = media_fingerprint or media_hash
+    elif is_strict_media_hashing():
+        media_fingerprint = None
+    if media_fingerprint:
+        current_fingerprint = compute_media_fingerprint(media_path)
+        if not current_fingerprint:
+            return True
+        return current_fingerprint != media_fingerprint
     current_hash = compute_file_hash(media_path)
     if not current_hash:
         return True
     return current_hash != media_hash
 
 
+def _media_sweep_interval() -> float:
+    raw_value = os.environ.get(_MEDIA_SWEEP_ENV, "").strip()
+    try:
+        interval = float(raw_value) if raw_value else _DEFAULT_MEDIA_SWEEP_SECONDS
+    except ValueError:
+        interval = _DEFAULT_MEDIA_SWEEP_SECONDS
+    return max(5.0, interval)
+
+
+def schedule_media_validation(job_id: str) -> None:
+    """Queue *job_id* for an asynchronous media validity check."""
+    global _media_validation_thread
+    if not job_id:
+        return
+    with _media_validation_lock:
+        _media_validation_pending[job_id] = None
+        if _media_validation_thread is None or not _media_validation_thread.is_alive():
+            _media_validation_thread = threading.Thread(
+                target=_media_validation_loop,
+                name="MediaValidator",
+                daemon=True,
+            )
+            _media_validation_thread.start()
+    _media_validation_wakeup.set()
+
+
+def schedule_media_identity(job_id: str) -> None:
+    """Queue *job_id* to have its media fingerprint (and, in strict mode, SHA-256) computed."""
+    if not job_id:
+        return
+    with _media_validation_lock:
+        _media_identity_pending[job_id] = None
+    schedule_media_validation(job_id)
+
+
+def identify_media(job_id: str) -> Optional[str]:
+    """Compute and store the media identity of a job; returns the ``media_hash`` recorded."""
+    with _connect() as conn:
+        row = conn.execute(
+            "SELECT media_path, media_hash, media_fingerprint FROM job_records WHERE job_id = ?",
+            (job_id,),
+        ).fetchone()
+    if not row or not row[0]:
+        return None
+    media_path, media_hash, media_fingerprint = row
+    size, mtime = get_file_meta(str(media_path))
+    if size is None:
+        return media_hash
+    if not media_fingerprint:
+        media_fingerprint = compute_media_fingerprint(str(media_path))
+    if is_strict_media_hashing() and (not media_hash or is_media_fingerprint(media_hash)):
+        media_hash = compute_file_hash(str(media_path)) or media_hash
+    # media_hash always carries an identity: the full SHA-256 when one was
+    # computed, otherwise the fingerprint.
+    media_hash = media_hash or media_fingerprint
+    with _connect() as conn:
+        conn.execute(
+            """
+            UPDATE job_records
+            SET media_hash = ?1, media_fingerprint = ?2,
+                media_size = COALESCE(media_size, ?3), media_mtime = COALESCE(media_mtime, ?4),
+                changed_at = CASE
+                    WHEN media_hash IS NOT ?1
+                      OR (media_size IS NULL AND ?3 IS NOT NULL)
+                      OR (media_mtime IS NULL AND ?4 IS NOT NULL)
+                    THEN ?5 ELSE changed_at END
+            WHERE job_id = ?6
+            """,
+            (media_hash, media_fingerprint, size, mtime, time.time(), job_id),
+        )
+        conn.commit()
+    return media_hash
+
+
+def _stale_media_jobs(max_age: float) -> List[str]:
+    cutoff = time.time() - max_age
+    with _connect() as conn:
+        rows = conn.execute(
+            """
+            SELECT r.job_id
+            FROM job_records r
+            LEFT JOIN media_validity v ON v.job_id = r.job_id
+            WHERE r.media_path IS NOT NULL AND r.media_hash IS NOT NULL
+              AND (v.checked_at IS NULL OR v.checked_at < ?)
+            """,
+            (cutoff,),
+        ).fetchall()
+    return [row[0] for row in rows]
+
+
+def _media_validation_loop() -> None:
+    last_sweep = 0.0
+    while True:
+        interval = _media_sweep_interval()
+        _media_validation_wakeup.wait(timeout=max(0.0, last_sweep + interval - time.time()))
+        _media_validation_wakeup.clear()
+        with _media_validation_lock:
+            identify = list(_media_identity_pending)
+            _media_identity_pending.clear()
+            batch = list(_media_validation_pending)
+            _media_validation_pending.clear()
+        for job_id in identify:
+            try:
+                identify_media(job_id)
+            except Exception as exc:
+                logger.debug("Media fingerprint failed for %s: %s", job_id, exc)
+        if time.time() - last_sweep >= interval:
+            last_sweep = time.time()
+            try:
+                batch.extend(_stale_media_jobs(interval))
+            except Exception as exc:
+                logger.debug("Media validity sweep failed: %s", exc)
+        for job_id in dict.fromkeys(batch):
+            try:
+                validate_media(job_id)
+            except Exception as exc:
+                logger.debug("Media validation failed for %s: %s", job_id, exc)
+
+
+def validate_media(job_id: str) -> Optional[bool]:
+    """Recheck a job's media now and store the result in the validity cache."""
+    with _connect() as conn:
+        row = conn.execute(
+            "SELECT media_path, media_hash, media_size, media_mtime, media_fingerprint FROM job_records WHERE job_id = ?",
+            (job_id,),
+        ).fetchone()
+    if not row:
+        with _connect() as conn:
+            conn.execute("DELETE FROM media_validity WHERE job_id = ?", (job_id,))
+            conn.commit()
+        return None
+    media_path, media_hash, media_size, media_mtime, media_fingerprint = row
+    invalid = is_media_invalid(media_path, media_hash, media_size, media_mtime, media_fingerprint)
+    flag = None if invalid is None else int(invalid)
+    with _connect() as conn:
+        previous = conn.execute(
+            "SELECT invalid, media_path, media_hash, media_size, media_mtime FROM media_validity WHERE job_id = ?",
+            (job_id,),
+        ).fetchone()
+        # History shows the cached flag only while it matches the record, so
+        # any difference here is a visible change for "since" syncs.
+        changed = previous is None or tuple(previous) != (flag, media_path, media_hash, media_size, media_mtime)
+        if invalid is False:
+            if not media_fingerprint:
+                conn.execute(
+                    "UPDATE job_records SET media_fingerprint = ? WHERE job_id = ?",
+                    (compute_media_fingerprint(str(media_path)), job_id),
+                )
+            # Content matched after a size/mtime change: remember the new
+            # metadata so the next check is a stat instead of a hash.
+            current_size, current_mtime = get_file_meta(str(media_path))
+            if (current_size, current_mtime) != (media_size, media_mtime):
+                media_size, media_mtime = current_size, current_mtime
+                conn.execute(
+                    "UPDATE job_records SET media_size = ?, media_mtime = ? WHERE job_id = ?",
+                    (media_size, media_mtime, job_id),
+                )
+                changed = True
+        if changed:
+            conn.execute("UPDATE job_records SET changed_at = ? WHERE job_id = ?", (time.time(), job_id))
+        conn.execute(
+            """
+            INSERT INTO media_validity (job_id, media_path, media_hash, media_size, media_mtime, invalid, checked_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+            ON CONFLICT(job_id) DO UPDATE SET
+                media_path=excluded.media_path,
+                media_hash=excluded.media_hash,
+                media_size=excluded.media_size,
+                media_mtime=excluded.media_mtime,
+                invalid=excluded.invalid,
+                checked_at=excluded.checked_at
+            """,
+            (
+                job_id,
+                media_path,
+                media_hash,
+                media_size,
+                media_mtime,
+                flag,
+                time.time(),
+            ),
+        )
+        conn.commit()
+    return invalid
+
+
+def _load_media_validity(conn: sqlite3.Connection, job_ids: List[str]) -> Dict[str, Tuple[Any, ...]]:
+    cached: Dict[str, Tuple[Any, ...]] = {}
+    for offset in range(0, len(job_ids), 500):
+        chunk = job_ids[offset:offset + 500]
+        placeholders = ", ".join(["?"] * len(chunk))
+        rows = conn.execute(
+            f"""
+            SELECT job_id, media_path, media_hash, media_size, media_mtime, invalid, checked_at
+            FROM media_validity
+            WHERE job_id IN ({placeholders})
+            """,
+            tuple(chunk),
+        ).fetchall()
+        for row in rows:
+            cached[row[0]] = row[1:]
+    return cached
+
+
+def _cached_media_invalid(
+    job_id: str,
+    cached: Optional[Tuple[Any, ...]],
+    media_path: Optional[str],
+    media_hash: Optional[str],
+    media_size: Optional[int],
+    media_mtime: Optional[float],
+) -> Optional[bool]:
+    """Return the cached validity flag, scheduling a recheck when it is missing or stale."""
+    if not media_path or not media_hash:
+        return None
+    if not cached or tuple(cached[:4]) != (media_path, media_hash, media_size, media_mtime):
+        schedule_media_validation(job_id)
+        return None
+    invalid, checked_at = cached[4], cached[5]
+    if checked_at is None or time.time() - checked_at >= _media_sweep_interval():
+        schedule_media_validation(job_id)
+    return None if invalid is None else bool(invalid)
+
+
 def _serialize_json(value: Any) -> Optional[str]:
     if value is None:
         return None
@@ -190,7 +670,7 @@ def upsert_job_record(record: Dict[str, Any]) -> None:
         row = conn.execute(
             """
             SELECT filename, display_name, media_path, media_kind, media_hash, media_size, media_mtime,
-                   status, language, device, summary, transcript_json, transcript_text,
+                   status, language, device, summary, transcript_preview,
                    segment_count, duration, created_at, ui_state
             FROM job_records
             WHERE job_id = ?
@@ -211,12 +691,11 @@ def upsert_job_record(record: Dict[str, Any]) -> None:
                 "language": row[8],
                 "device": row[9],
                 "summary": row[10],
-                "transcript_json": row[11],
-                "transcript_text": row[12],
-                "segment_count": row[13],
-                "duration": row[14],
-                "created_at": row[15],
-                "ui_state": row[16],
+                "transcript_preview": row[11],
+                "segment_count": row[12],
+                "duration": row[13],
+                "created_at": row[14],
+                "ui_state": row[15],
             }
 
         def pick(key: str, serializer=None):
@@ -230,7 +709,14 @@ def upsert_job_record(record: Dict[str, Any]) -> None:
         created_at = record.get("created_at") or (existing.get("created_at") if existing else None) or now
         updated_at = record.get("updated_at") or now
 
-        media_path = pick("media_path")
+        has_transcript = "transcript_json" in record or "transcript_text" in record
+        transcript = record.get("transcript_json")
+        if "transcript_text" in record:
+            transcript_text = record.get("transcript_text")
+        else:
+            transcript_text = transcript.get("text") if isinstance(transcript, dict) else None
+
+        media_path = pick("media_path") or _transcript_media_path(transcript)
         media_hash = pick("media_hash")
         media_size = pick("media_size")
         media_mtime = pick("media_mtime")
@@ -242,8 +728,6 @@ def upsert_job_record(record: Dict[str, Any]) -> None:
                     media_size = current_size
                 if media_mtime is None:
                     media_mtime = current_mtime
-            if media_hash is None:
-                media_hash = compute_file_hash(str(media_path))
 
         display_name = pick("display_name") or _strip_extension(pick("filename"))
         payload = {
@@ -259,12 +743,17 @@ def upsert_job_record(record: Dict[str, Any]) -> None:
             "language": pick("language"),
             "device": pick("device"),
             "summary": pick("summary"),
-            "transcript_json": pick("transcript_json", _serialize_json),
-            "transcript_text": pick("transcript_text"),
+            "transcript_preview": (
+                native_transcript_store.transcript_preview(transcript_text)
+                if has_transcript
+                else pick("transcript_preview")
+            ),
             "segment_count": pick("segment_count"),
             "duration": pick("duration"),
             "created_at": created_at,
             "updated_at": updated_at,
+            "sort_key": updated_at,
+            "changed_at": updated_at,
             "ui_state": pick("ui_state", _serialize_json),
         }
 
@@ -279,7 +768,18 @@ def upsert_job_record(record: Dict[str, Any]) -> None:
             """,
             tuple(payload.values()),
         )
+        conn.execute("DELETE FROM job_tombstones WHERE job_id = ?", (job_id,))
+        if "transcript_json" in record:
+            native_transcript_store.write_transcript(conn, job_id, transcript, transcript_text, updated_at)
+        elif has_transcript:
+            native_transcript_store.write_transcript_text(conn, job_id, transcript_text, updated_at)
         conn.commit()
+    if "transcript_json" in record:
+        _invalidate_segment_index(job_id)
+    if media_path and not media_hash:
+        schedule_media_identity(job_id)
+    elif media_path and any(key in record for key in _MEDIA_IDENTITY_KEYS):
+        schedule_media_validation(job_id)
 
 
 def get_job_record(job_id: str) -> Optional[Dict[str, Any]]:
@@ -287,16 +787,18 @@ def get_job_record(job_id: str) -> Optional[Dict[str, Any]]:
         row = conn.execute(
             """
             SELECT job_id, filename, display_name, media_path, media_kind, media_hash, media_size, media_mtime,
-                   status, language, device, summary, transcript_json, transcript_text,
-                   segment_count, duration, created_at, updated_at, ui_state
+                   status, language, device, summary, segment_count, duration, created_at, updated_at, ui_state
             FROM job_records
             WHERE job_id = ?
             """,
             (job_id,),
         ).fetchone()
-
-    if not row:
-        return None
+        if not row:
+            return None
+        validity = _load_media_validity(conn, [job_id])
+        transcript, transcript_text = native_transcript_store.load_transcript(conn, job_id)
+        revision = native_transcript_store.current_revision(conn, job_id)
+        conn.commit()
 
     (
         job_id,
@@ -311,8 +813,6 @@ def get_job_record(job_id: str) -> Optional[Dict[str, Any]]:
         language,
         device,
         summary,
-        transcript_json,
-        transcript_text,
         segment_count,
         duration,
         created_at,
@@ -326,7 +826,6 @@ def get_job_record(job_id: str) -> Optional[Dict[str, Any]]:
         except Exception:
             filename = filename
 
-    transcript = _parse_json(transcript_json)
     if not media_path and transcript:
         media_path = transcript.get("file_path") or transcript.get("original_audio_path")
     if not filename and media_path:
@@ -344,13 +843,16 @@ def get_job_record(job_id: str) -> Optional[Dict[str, Any]]:
         "media_hash": media_hash,
         "media_size": media_size,
         "media_mtime": media_mtime,
-        "media_invalid": is_media_invalid(media_path, media_hash, media_size, media_mtime),
+        "media_invalid": _cached_media_invalid(
+            job_id, validity.get(job_id), media_path, media_hash, media_size, media_mtime
+        ),
         "status": status,
         "language": language,
         "device": device,
         "summary": summary,
         "transcript": transcript,
         "transcript_text": transcript_text,
+        "transcript_revision": revision,
         "segment_count": segment_count,
         "duration": duration,
         "created_at": created_at,
@@ -359,6 +861,46 @@ def get_job_record(job_id: str) -> Optional[Dict[str, Any]]:
     }
 
 
+def get_job_media_hash(job_id: str) -> Optional[str]:
+    with _connect() as conn:
+        row = conn.execute(
+            "SELECT media_hash FROM job_records WHERE job_id = ?",
+            (job_id,),
+        ).fetchone()
+    return row[0] if row and row[0] else None
+
+
+def get_cached_language(media_hash: Optional[str]) -> Optional[Dict[str, Any]]:
+    if not media_hash:
+        return None
+    with _connect() as conn:
+        row = conn.execute(
+            "SELECT language, probability, detected_at FROM media_languages WHERE media_hash = ?",
+            (media_hash,),
+        ).fetchone()
+    if not row or not row[0]:
+        return None
+    return {"language": row[0], "probability": row[1], "detected_at": row[2]}
+
+
+def store_cached_language(media_hash: Optional[str], language: str, probability: Optional[float]) -> None:
+    if not media_hash or not language:
+        return
+    with _connect() as conn:
+        conn.execute(
+            """
+            INSERT INTO media_languages (media_hash, language, probability, detected_at)
+            VALUES (?, ?, ?, ?)
+            ON CONFLICT(media_hash) DO UPDATE SET
+                language=excluded.language,
+                probability=excluded.probability,
+                detected_at=excluded.detected_at
+            """,
+            (media_hash, language, probability, time.time()),
+        )
+        conn.commit()
+
+
 def update_job_ui_state(job_id: str, ui_state: Dict[str, Any]) -> None:
     upsert_job_record({"job_id": job_id, "ui_state": ui_state})
 
@@ -366,6 +908,7 @@ def update_job_ui_state(job_id: str, ui_state: Dict[str, Any]) -> None:
 def update_job_transcript(job_id: str, transcript: Dict[str, Any]) -> None:
     text = transcript.get("text") if isinstance(transcript, dict) else None
     segments = transcript.get("segments") if isinstance(transcript, dict) else None
+    updated_at = time.time()
     upsert_job_record({
         "job_id": job_id,
         "transcript_json": transcript,
@@ -374,7 +917,198 @@ def update_job_transcript(job_id: str, transcript: Dict[str, Any]) -> None:
         "language": transcript.get("language") if isinstance(transcript, dict) else None,
         "duration": transcript.get("audio_duration") if isinstance(transcript, dict) else None,
         "status": "completed",
+        "updated_at": updated_at,
     })
+    if isinstance(segments, list):
+        _cache_segment_index(job_id, updated_at, transcript)
+
+
+def _cache_segment_index(job_id: str, updated_at: Any, transcript: Dict[str, Any]) -> SegmentIndex:
+    segments = transcript.get("segments")
+    if not isinstance(segments, list):
+        segments = []
+        transcript["segments"] = segments
+    index = SegmentIndex(segments)
+    with _segment_index_lock:
+        _segment_index_cache[job_id] = (updated_at, transcript, index)
+        _segment_index_cache.move_to_end(job_id)
+        while len(_segment_index_cache) > _SEGMENT_INDEX_CACHE_SIZE:
+            _segment_index_cache.popitem(last=False)
+    return index
+
+
+def _invalidate_segment_index(job_id: str) -> None:
+    with _segment_index_lock:
+        _segment_index_cache.pop(job_id, None)
+
+
+def get_segment_index(job_id: str) -> Optional[Tuple[Dict[str, Any], SegmentIndex]]:
+    """Return ``(transcript, index)`` for a job, rebuilding the index only after the record changed.
+
+    The returned transcript is shared with the cache; callers that modify it
+    must persist it with :func:`update_job_transcript`.
+    """
+    with _connect() as conn:
+        row = conn.execute(
+            "SELECT updated_at FROM job_records WHERE job_id = ?",
+            (job_id,),
+        ).fetchone()
+        if not row:
+            _invalidate_segment_index(job_id)
+            return None
+        updated_at = row[0]
+        with _segment_index_lock:
+            cached = _segment_index_cache.get(job_id)
+            if cached and cached[0] == updated_at:
+                _segment_index_cache.move_to_end(job_id)
+                return cached[1], cached[2]
+        transcript, _ = native_transcript_store.load_transcript(conn, job_id)
+        conn.commit()
+    if not transcript:
+        return None
+    return transcript, _cache_segment_index(job_id, updated_at, transcript)
+
+
+def update_transcript_segment(job_id: str, segment_id: Any, changes: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """Update one stored segment in place.
+
+    Returns ``{"revision", "segment"}`` with the updated segment, or None if
+    the job has no such segment. Raises LookupError when the job has no
+    transcript.
+    """
+    with _connect() as conn:
+        segment = native_transcript_store.update_segment(conn, job_id, int(segment_id), changes)
+        revision = native_transcript_store.current_revision(conn, job_id)
+        conn.commit()
+    if segment is None:
+        return None
+    _invalidate_segment_index(job_id)
+    return {"revision": revision, "segment": segment}
+
+
+def add_transcript_segment(job_id: str, segment: Dict[str, Any]) -> Dict[str, Any]:
+    """Insert one segment, assigning the next free id when it has none.
+
+    Returns ``{"revision", "segment"}``. Raises SegmentExistsError (nothing
+    written) when its id is already taken.
+    """
+    with _connect() as conn:
+        stored = native_transcript_store.insert_segment(conn, job_id, segment)
+        revision = native_transcript_store.current_revision(conn, job_id)
+        conn.commit()
+    _invalidate_segment_index(job_id)
+    return {"revision": revision, "segment": stored}
+
+
+def delete_transcript_segment(job_id: str, segment_id: Any) -> Optional[int]:
+    """Delete one segment; returns the new revision, or None if there was no such segment."""
+    with _connect() as conn:
+        deleted = native_transcript_store.delete_segment(conn, job_id, int(segment_id))
+        revision = native_transcript_store.current_revision(conn, job_id)
+        conn.commit()
+    if not deleted:
+        return None
+    _invalidate_segment_index(job_id)
+    return revision
+
+
+def search_transcripts(query: str, limit: int = 50, offset: int = 0) -> Optional[List[Dict[str, Any]]]:
+    """Search segment text across all jobs; None when SQLite lacks FTS5."""
+    with _connect() as conn:
+        if not native_transcript_store.search_available():
+            return None
+        return native_transcript_store.search_segments(conn, query, limit=limit, offset=offset)
+
+
+def apply_transcript_batch(job_id: str, operations: Any) -> Dict[str, Any]:
+    """Apply a batch of segment operations atomically.
+
+    Returns ``{"revision", "changes"}``. Nothing is written when any
+    operation fails: ValueError for an invalid operation, LookupError when
+    the job has no transcript.
+    """
+    with _connect() as conn:
+        try:
+            applied = native_transcript_store.apply_batch(conn, job_id, operations)
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+    _invalidate_segment_index(job_id)
+    return applied
+
+
+def splice_transcript_range(
+    job_id: str,
+    range_start: float,
+    range_end: float,
+    segments: List[Dict[str, Any]],
+) -> Dict[str, Any]:
+    """Swap the segments in a time range for *segments* as one undoable edit.
+
+    See :func:`native_transcript_store.splice_range`; raises LookupError
+    when the job has no transcript.
+    """
+    with _connect() as conn:
+        try:
+            spliced = native_transcript_store.splice_range(conn, job_id, range_start, range_end, segments)
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+    _invalidate_segment_index(job_id)
+    return spliced
+
+
+def replace_in_transcript(job_id: str, pattern: str, replacement: str, **options: Any) -> Dict[str, Any]:
+    """Preview or apply a find-and-replace over a job's segments.
+
+    See :func:`native_transcript_store.find_replace` for *options*. An
+    applied replacement commits as one transaction.
+    """
+    with _connect() as conn:
+        try:
+            result = native_transcript_store.find_replace(conn, job_id, pattern, replacement, **options)
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+    if result["applied"]:
+        _invalidate_segment_index(job_id)
+    return result
+
+
+def get_transcript_changes(job_id: str, since_rev: int) -> Dict[str, Any]:
+    """Segments changed after *since_rev*, or a snapshot; raises LookupError without a transcript."""
+    with _connect() as conn:
+        changes = native_transcript_store.changes_since(conn, job_id, since_rev)
+        conn.commit()
+    return changes
+
+
+def undo_transcript_edit(job_id: str) -> Optional[Dict[str, Any]]:
+    """Undo the newest segment edit of a job.
+
+    Returns ``{"revision", "changes"}`` with the segments it restored, or
+    None when there is nothing to undo. Raises LookupError when the job has
+    no transcript.
+    """
+    with _connect() as conn:
+        applied = native_transcript_store.undo(conn, job_id)
+        conn.commit()
+    if applied:
+        _invalidate_segment_index(job_id)
+    return applied
+
+
+def redo_transcript_edit(job_id: str) -> Optional[Dict[str, Any]]:
+    """Redo the most recently undone segment edit; see :func:`undo_transcript_edit`."""
+    with _connect() as conn:
+        applied = native_transcript_store.redo(conn, job_id)
+        conn.commit()
+    if applied:
+        _invalidate_segment_index(job_id)
+    return applied
 
 
 def _ts_to_iso(ts: Optional[float]) -> Optional[str]:
@@ -386,108 +1120,198 @@ def _ts_to_iso(ts: Optional[float]) -> Optional[str]:
         return None
 
 
-def load_history(limit: int = 200) -> List[Dict[str, Any]]:
-    """Return recent jobs stored in the records table."""
-    _cleanup_legacy_history()
-    entries: List[Dict[str, Any]] = []
+_HISTORY_COLUMNS = """
+    job_id, filename, display_name, media_path, media_kind, media_hash, media_size, media_mtime,
+    status, language, device, summary, transcript_preview, segment_count, duration,
+    created_at, updated_at, ui_state, sort_key, changed_at
+"""
+
+
+def encode_history_cursor(sort_key: Any, job_id: str) -> str:
+    raw = json.dumps([sort_key, job_id], separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
 
+
+def decode_history_cursor(cursor: str) -> Tuple[float, str]:
+    """Decode a history cursor; a bare number is accepted as a timestamp. Raises ValueError."""
     try:
-        with _connect() as conn:
-            rows = conn.execute(
-                """
-                SELECT job_id, filename, display_name, media_path, media_kind, media_hash, media_size, media_mtime,
-                       status, language, device, summary, transcript_text, segment_count, duration,
-                       created_at, updated_at, ui_state, transcript_json
-                FROM job_records
-                ORDER BY COALESCE(updated_at, created_at) DESC
-                LIMIT ?
-                """,
-                (limit,),
-            ).fetchall()
+        return float(cursor), ""
+    except (TypeError, ValueError):
+        pass
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        sort_key, job_id = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+        return float(sort_key), str(job_id)
+    except Exception as exc:
+        raise ValueError(f"Invalid cursor: {cursor!r}") from exc
 
-        for row in rows:
-            (
-                job_id,
-                filename,
-                display_name,
-                media_path,
-                media_kind,
-                media_hash,
-                media_size,
-                media_mtime,
-                status,
-                language,
-                device,
-                summary,
-                transcript_text,
-                segment_count,
-                duration,
-                created_at,
-                updated_at,
-                ui_state,
-                transcript_json,
-            ) = row
 
-            transcript = _parse_json(transcript_json)
-            if not filename and media_path:
-                try:
-                    filename = Path(str(media_path)).name
-                except Exception:
-                    filename = filename
-            if not display_name:
-                display_name = _strip_extension(filename) or filename or job_id
-
-            if not filename and not media_path and not transcript_text and not transcript:
-                continue
-            if not media_path and transcript:
-                media_path = transcript.get("file_path") or transcript.get("original_audio_path")
-
-            normalized_status = (status or "completed").lower()
-            progress = 100 if normalized_status in FINISHED_STATES else (-1 if normalized_status in FAILED_STATES else 0)
-
-            entry: Dict[str, Any] = {
-                "job_id": job_id,
-                "status": status or "completed",
-                "message": "",
-                "created_at": _ts_to_iso(created_at),
-                "completed_at": _ts_to_iso(updated_at),
-                "language": language,
-                "device": device,
-                "summary": summary or (transcript_text or "")[:500],
-                "progress": progress,
-                "original_filename": filename or job_id,
-                "display_name": display_name,
-                "media_path": media_path,
-                "media_kind": media_kind,
-                "media_hash": media_hash,
-                "media_size": media_size,
-                "media_mtime": media_mtime,
-                "media_invalid": is_media_invalid(media_path, media_hash, media_size, media_mtime),
-                "audio_file": {
-                    "name": filename or job_id,
-                    "path": media_path,
-                    "size": media_size,
-                    "hash": media_hash,
-                    "mtime": media_mtime,
-                },
-                "ui_state": _parse_json(ui_state),
-            }
+def _history_entry(row: Tuple[Any, ...], validity: Dict[str, Tuple[Any, ...]]) -> Optional[Dict[str, Any]]:
+    (
+        job_id,
+        filename,
+        display_name,
+        media_path,
+        media_kind,
+        media_hash,
+        media_size,
+        media_mtime,
+        status,
+        language,
+        device,
+        summary,
+        transcript_preview,
+        segment_count,
+        duration,
+        created_at,
+        updated_at,
+        ui_state,
+        _sort_key,
+        _changed_at,
+    ) = row
+
+    if not filename and media_path:
+        try:
+            filename = Path(str(media_path)).name
+        except Exception:
+            filename = filename
+    if not display_name:
+        display_name = _strip_extension(filename) or filename or job_id
 
-            if transcript_text or segment_count:
-                entry["result_preview"] = {
-                    "segment_count": int(segment_count or 0),
-                    "text": transcript_text,
-                    "language": language,
-                }
+    if not filename and not media_path and not transcript_preview and not segment_count:
+        return None
 
-            if duration is not None:
-                entry["audio_duration"] = duration
+    normalized_status = (status or "completed").lower()
+    progress = 100 if normalized_status in FINISHED_STATES else (-1 if normalized_status in FAILED_STATES else 0)
 
-            entries.append(entry)
+    entry: Dict[str, Any] = {
+        "job_id": job_id,
+        "status": status or "completed",
+        "message": "",
+        "created_at": _ts_to_iso(created_at),
+        "completed_at": _ts_to_iso(updated_at),
+        "language": language,
+        "device": device,
+        "summary": summary or transcript_preview or "",
+        "progress": progress,
+        "original_filename": filename or job_id,
+        "display_name": display_name,
+        "media_path": media_path,
+        "media_kind": media_kind,
+        "media_hash": media_hash,
+        "media_size": media_size,
+        "media_mtime": media_mtime,
+        "media_invalid": _cached_media_invalid(
+            job_id, validity.get(job_id), media_path, media_hash, media_size, media_mtime
+        ),
+        "audio_file": {
+            "name": filename or job_id,
+            "path": media_path,
+            "size": media_size,
+            "hash": media_hash,
+            "mtime": media_mtime,
+        },
+        "ui_state": _parse_json(ui_state),
+    }
+
+    if transcript_preview or segment_count:
+        entry["result_preview"] = {
+            "segment_count": int(segment_count or 0),
+            "text": transcript_preview,
+            "language": language,
+        }
+
+    if duration is not None:
+        entry["audio_duration"] = duration
+
+    return entry
+
+
+def load_history_page(
+    limit: int = 200,
+    cursor: Optional[str] = None,
+    fields: Optional[List[str]] = None,
+    since: Optional[str] = None,
+) -> Dict[str, Any]:
+    """Return one page of history.
+
+    Without *since*, pages run newest first and ``next_cursor`` continues
+    after the last row. With *since* (a timestamp or a previous
+    ``next_since``), only rows whose visible fields changed after it
+    (tracked by ``changed_at``, which also moves on media validity and
+    identity updates) are returned, oldest change first, together with
+    ``deleted`` job ids; ``reset`` is set when *since*
+    is older than the tombstones kept, and the client should reload fully.
+    *fields* limits each entry to those keys (``job_id`` is always kept).
+    Raises ValueError for a malformed cursor.
+    """
+    _cleanup_legacy_history()
+    delta = since is not None
+    if delta:
+        position = decode_history_cursor(since)
+        key, comparison, order = "changed_at", ">", "ASC"
+    else:
+        position = decode_history_cursor(cursor) if cursor else None
+        key, comparison, order = "sort_key", "<", "DESC"
+
+    where = f"WHERE ({key}, job_id) {comparison} (?, ?)" if position else ""
+    tombstones: List[Tuple[str, float]] = []
+    with _connect() as conn:
+        rows = conn.execute(
+            f"""
+            SELECT {_HISTORY_COLUMNS}
+            FROM job_records
+            {where}
+            ORDER BY {key} {order}, job_id {order}
+            LIMIT ?
+            """,
+            (*(position or ()), limit + 1),
+        ).fetchall()
+        has_more = len(rows) > limit
+        rows = rows[:limit]
+        wanted = set(fields) if fields else None
+        if wanted is None or "media_invalid" in wanted:
+            validity = _load_media_validity(conn, [row[0] for row in rows])
+        else:
+            validity = {}
+        if delta:
+            tombstones = conn.execute(
+                "SELECT job_id, deleted_at FROM job_tombstones WHERE deleted_at > ? ORDER BY deleted_at",
+                (position[0],),
+            ).fetchall()
+
+    jobs: List[Dict[str, Any]] = []
+    for row in rows:
+        entry = _history_entry(row, validity)
+        if entry is None:
+            continue
+        if wanted is not None:
+            entry = {key: value for key, value in entry.items() if key == "job_id" or key in wanted}
+        jobs.append(entry)
+
+    key_column = -1 if delta else -2
+    last_position = (rows[-1][key_column], rows[-1][0]) if rows else None
+    page: Dict[str, Any] = {"jobs": jobs, "has_more": has_more}
+    if not delta:
+        page["next_cursor"] = encode_history_cursor(*last_position) if has_more and last_position else None
+        return page
+
+    next_position = last_position or position
+    if not has_more and tombstones and tombstones[-1][1] > next_position[0]:
+        next_position = (tombstones[-1][1], "")
+    page["deleted"] = [job_id for job_id, _ in tombstones]
+    page["next_since"] = encode_history_cursor(*next_position)
+    page["reset"] = position[0] < time.time() - _TOMBSTONE_RETENTION_SECONDS
+    return page
+
+
+def load_history(limit: int = 200) -> List[Dict[str, Any]]:
+    """Return recent jobs stored in the records table."""
+    try:
+        return load_history_page(limit=limit)["jobs"]
     except Exception as exc:
         logger.error("Failed to load job history: %s", exc)
-
-    return entries
+        return []
 
 
 def mark_completed(
@@ -557,9 +1381,21 @@ def remove_entry(job_id: str) -> None:
     try:
         with _connect() as conn:
             conn.execute("DELETE FROM job_records WHERE job_id = ?", (job_id,))
+            conn.execute("DELETE FROM media_validity WHERE job_id = ?", (job_id,))
+            native_transcript_store.delete_transcript(conn, job_id)
+            now = time.time()
+            conn.execute(
+                "INSERT OR REPLACE INTO job_tombstones (job_id, deleted_at) VALUES (?, ?)",
+                (job_id, now),
+            )
+            conn.execute(
+                "DELETE FROM job_tombstones WHERE deleted_at < ?",
+                (now - _TOMBSTONE_RETENTION_SECONDS,),
+            )
             conn.commit()
     except Exception as exc:
         logger.debug("Failed to remove job record %s: %s", job_id, exc)
+    _invalidate_segment_index(job_id)
 
 
 def get_entry(job_id: str) -> Optional[Dict[str, Any]]:
@@ -9,7 +9,6 @@ import contextlib
 import hashlib
 import logging
 import os
-import re
 import shutil
 import subprocess
 import tempfile
@@ -18,9 +17,10 @@ import traceback
 from pathlib import Path
 from typing import Any, Callable, Dict, Iterable, Optional, Tuple
 
+import numpy as np
 import soundfile as sf
 
-from whisper_cpp_runtime import transcribe_whisper_cpp, resolve_whisper_model
+from whisper_cpp_runtime import transcribe_whisper_cpp, resolve_whisper_model, detect_language_whisper_cpp
 
 from native_config import get_uploads_dir, get_bundle_dir, setup_environment
 
@@ -31,6 +31,12 @@ except ImportError:
         return "CPU"
 from native_ffmpeg import get_ffmpeg_path, get_audio_duration
 import native_history
+from native_segments import (
+    SegmentTable,
+    postprocess_caption_table,
+    recover_first_after_prefix,
+    trim_prefix,
+)
 
 setup_environment()
 
@@ -41,7 +47,6 @@ _ALWAYS_TRANSCODE_AUDIO = {".m4a", ".aac", ".opus", ".weba"}
 _QUEUE_NAMES = ("high", "default", "low")
 
 
-_CC_CREDIT_PATTERN = re.compile(r"^\s*CC[^:：]+[:：].+\s*$", re.IGNORECASE)
 _WRITTEN_PREFIX_ENV = "XCAPTION_WRITTEN_PREFIX_AUDIO"
 _SPOKEN_PREFIX_ENV = "XCAPTION_SPOKEN_PREFIX_AUDIO"
 _DEFAULT_WRITTEN_PREFIX_RELATIVE = Path("merge") / "written.bin"
@@ -50,76 +55,176 @@ _PREFIX_BIN_MAGIC = b"XCAPTION_PREFIX_BIN_V1"
 _PREFIX_BIN_KEY = b"XCAPTION_PREFIX_AUDIO_KEY_V1"
 _PREFIX_SILENCE_SECONDS = 5.0
 _DEFAULT_PREFIX_SECONDS = 15.0
-_PREFIX_TRIM_MIN_DURATION = 0.2
-_PREFIX_TRIM_BOUNDARY_TOLERANCE = 0.25
-_PREFIX_RECOVERY_MAX_DURATION = 12.0
+_CANTONESE_DETECTED_LANGUAGES = {"yue", "zh"}
+_CONDITIONING_ENV = "XCAPTION_CANTONESE_CONDITIONING"
+_CONDITIONING_MODES = {"audio", "prompt"}
+_DEFAULT_CONDITIONING_MODE = "audio"
+_CANTONESE_STYLE_PROMPTS = {
+    "written": "以下是香港廣東話的語音，請使用書面語繁體中文字幕。",
+    "spoken": "以下係香港廣東話嘅語音，請用廣東話口語繁體中文字幕。",
+}
+_LANGUAGE_ID_SAMPLE_SECONDS = 30.0
+_LANGUAGE_ID_CANDIDATE_WINDOWS = 8
+_LANGUAGE_ID_FRAME_SECONDS = 0.5
+_LANGUAGE_ID_VOICED_RMS = 0.01
+_LANGUAGE_ID_MIN_PROBABILITY = 0.5
 
 
 def _postprocess_caption_segments(
-    segments: Iterable[Dict[str, Any]],
+    segments: Iterable[Dict[str, Any]] | SegmentTable,
     language: Optional[str] = None,
 ) -> list[Dict[str, Any]]:
-    normalized_language = (language or "").strip().lower()
-    is_zh = normalized_language.startswith("zh")
-    processed: list[Dict[str, Any]] = []
-    for segment in segments:
-        if not isinstance(segment, dict):
-            continue
-        text = str(segment.get("text", "")).strip()
-        if text and _CC_CREDIT_PATTERN.match(text):
-            continue
-        if text and "," in text:
-            text = re.sub(r"\s*,\s*", " ", text).strip()
-        if text and ("(" in text or ")" in text):
-            text = text.replace("(", "").replace(")", "").strip()
-            text = re.sub(r"\s{2,}", " ", text)
-        if is_zh and text.endswith("。"):
-            text = text[:-1].rstrip()
-
-        updated = dict(segment)
-        updated["text"] = text
-
-        if is_zh and " " in text:
-            start = float(updated.get("start", 0.0))
-            end = float(updated.get("end", 0.0))
-            duration = end - start
-            tokens = [token for token in text.split() if token]
-            if duration > 0.0 and len(tokens) >= 2:
-                if duration >= 8.0 or len(tokens) >= 3:
-                    total_chars = sum(len(token) for token in tokens)
-                    if total_chars > 0:
-                        cursor = start
-                        for idx, token in enumerate(tokens):
-                            if idx == len(tokens) - 1:
-                                seg_end = end
-                            else:
-                                portion = sum(len(t) for t in tokens[: idx + 1]) / total_chars
-                                seg_end = start + (duration * portion)
-                            split_seg = dict(updated)
-                            split_seg["start"] = max(0.0, float(cursor))
-                            split_seg["end"] = max(split_seg["start"], float(seg_end))
-                            split_text = token.strip()
-                            if split_text.endswith("。"):
-                                split_text = split_text[:-1].rstrip()
-                            split_seg["text"] = split_text
-                            processed.append(split_seg)
-                            cursor = seg_end
-                        continue
-
-        processed.append(updated)
-    for idx, segment in enumerate(processed):
-        segment["id"] = idx
-    return processed
-
-
-def _should_apply_cantonese_prefix(language: str, chinese_style: Optional[str]) -> bool:
+    table = postprocess_caption_table(SegmentTable.from_dicts(segments), language)
+    return table.to_dicts(renumber=True, defaults={"words": []})
+
+
+def _should_apply_cantonese_prefix(
+    language: str,
+    chinese_style: Optional[str],
+    detected_language: Optional[str] = None,
+) -> bool:
     if not chinese_style:
         return False
     normalized_style = chinese_style.strip().lower()
     if normalized_style not in {"written", "spoken"}:
         return False
     normalized_language = (language or "").strip().lower()
-    return normalized_language in {"auto", "yue"}
+    if normalized_language not in {"auto", "yue"}:
+        return False
+    if detected_language and detected_language not in _CANTONESE_DETECTED_LANGUAGES:
+        return False
+    return True
+
+
+def _resolve_conditioning_mode(conditioning: Optional[str]) -> str:
+    """Return how Cantonese style conditioning is applied: prefix ``audio`` or text ``prompt``."""
+    for candidate in (conditioning, os.environ.get(_CONDITIONING_ENV)):
+        normalized = (candidate or "").strip().lower()
+        if normalized in _CONDITIONING_MODES:
+            return normalized
+    return _DEFAULT_CONDITIONING_MODE
+
+
+def _resolve_style_prompt(chinese_style: Optional[str]) -> Optional[str]:
+    normalized_style = (chinese_style or "written").strip().lower()
+    return _CANTONESE_STYLE_PROMPTS.get(normalized_style)
+
+
+def _select_speech_dense_offset(audio_path: Path, window_seconds: float) -> float:
+    """Return the start offset of the candidate window with the most voiced frames."""
+    try:
+        with sf.SoundFile(str(audio_path)) as sound_file:
+            samplerate = sound_file.samplerate
+            total_frames = sound_file.frames
+            window_frames = int(window_seconds * samplerate)
+            if samplerate <= 0 or total_frames <= window_frames:
+                return 0.0
+            hop = (total_frames - window_frames) / max(1, _LANGUAGE_ID_CANDIDATE_WINDOWS - 1)
+            frame_size = max(1, int(_LANGUAGE_ID_FRAME_SECONDS * samplerate))
+            best_offset = 0
+            best_score = -1.0
+            for idx in range(_LANGUAGE_ID_CANDIDATE_WINDOWS):
+                offset = int(idx * hop)
+                sound_file.seek(offset)
+                data = sound_file.read(window_frames, dtype="float32", always_2d=True)
+                if not len(data):
+                    continue
+                mono = data.mean(axis=1)
+                usable = (len(mono) // frame_size) * frame_size
+                if usable <= 0:
+                    continue
+                frames = mono[:usable].reshape(-1, frame_size)
+                rms = (frames ** 2).mean(axis=1) ** 0.5
+                score = float((rms >= _LANGUAGE_ID_VOICED_RMS).mean())
+                if score > best_score:
+                    best_score = score
+                    best_offset = offset
+            return best_offset / samplerate
+    except Exception as exc:
+        logger.debug("Speech density scan failed for %s: %s", audio_path, exc)
+        return 0.0
+
+
+def _extract_audio_sample(
+    audio_path: Path,
+    *,
+    offset: float,
+    duration: float,
+    cleanup_paths: Optional[list] = None,
+) -> Optional[Path]:
+    ffmpeg_path = get_ffmpeg_path()
+    temp_dir = Path(tempfile.mkdtemp(prefix="xcaption_sample_"))
+    output_path = temp_dir / "sample.wav"
+    cmd = [
+        ffmpeg_path,
+        "-y",
+        "-ss",
+        f"{max(0.0, offset):.3f}",
+        "-t",
+        f"{duration:.3f}",
+        "-i",
+        str(audio_path),
+        "-vn",
+        "-acodec",
+        "pcm_s16le",
+        "-ac",
+        "1",
+        "-ar",
+        "16000",
+        str(output_path),
+    ]
+    process = subprocess.run(cmd, capture_output=True, text=True)
+    if process.returncode != 0 or not output_path.exists():
+        error_output = (process.stderr or process.stdout or "").strip()
+        logger.warning("Failed to extract audio sample: %s", error_output)
+        with contextlib.suppress(Exception):
+            shutil.rmtree(temp_dir, ignore_errors=True)
+        return None
+    if cleanup_paths is not None:
+        cleanup_paths.append(str(temp_dir))
+    return output_path
+
+
+def _identify_language(
+    job_id: str,
+    audio_path: Path,
+    model_path: Optional[str],
+    cleanup_paths: Optional[list] = None,
+) -> Optional[Dict[str, Any]]:
+    """Detect the spoken language on a short speech-dense sample, cached per media hash."""
+    media_hash = None
+    with contextlib.suppress(Exception):
+        media_hash = native_history.get_job_media_hash(job_id) or native_history.identify_media(job_id)
+    cached = None
+    with contextlib.suppress(Exception):
+        cached = native_history.get_cached_language(media_hash)
+    if cached:
+        return {**cached, "cached": True}
+
+    offset = _select_speech_dense_offset(audio_path, _LANGUAGE_ID_SAMPLE_SECONDS)
+    sample_path = _extract_audio_sample(
+        audio_path,
+        offset=offset,
+        duration=_LANGUAGE_ID_SAMPLE_SECONDS,
+        cleanup_paths=cleanup_paths,
+    )
+    if not sample_path:
+        return None
+    detection = detect_language_whisper_cpp(sample_path, model_path=model_path)
+    if not detection or not detection.get("language"):
+        return None
+    probability = detection.get("probability")
+    if probability is not None and probability < _LANGUAGE_ID_MIN_PROBABILITY:
+        logger.info(
+            "Language ID for job %s inconclusive (%s, p=%.2f); keeping auto.",
+            job_id,
+            detection.get("language"),
+            probability,
+        )
+        return None
+    with contextlib.suppress(Exception):
+        native_history.store_cached_language(media_hash, detection["language"], probability)
+    return {**detection, "sample_offset": round(offset, 2), "cached": False}
 
 
 def _xor_bytes(data: bytes, key: bytes) -> bytes:
@@ -262,150 +367,6 @@ def _concat_prefix_audio(
     return output_path
 
 
-def _trim_prefixed_segments(
-    segments: list[Dict[str, Any]],
-    prefix_seconds: float,
-    *,
-    strict: bool = True,
-) -> list[Dict[str, Any]]:
-    if prefix_seconds <= 0:
-        return segments
-    trimmed: list[Dict[str, Any]] = []
-    for segment in segments:
-        start = float(segment.get("start", 0.0))
-        end = float(segment.get("end", 0.0))
-        if end <= prefix_seconds + _PREFIX_TRIM_MIN_DURATION:
-            continue
-        words = segment.get("words")
-        if isinstance(words, list) and words:
-            adjusted_words = _adjust_words_after_prefix(words, prefix_seconds)
-            built = _build_segment_from_words(segment, adjusted_words)
-            if not built:
-                continue
-            updated, _, _ = built
-            trimmed.append(updated)
-        else:
-            if strict and start < prefix_seconds - _PREFIX_TRIM_BOUNDARY_TOLERANCE:
-                continue
-            updated = dict(segment)
-            new_start = max(0.0, start - prefix_seconds)
-            new_end = max(0.0, end - prefix_seconds)
-            if new_end - new_start < _PREFIX_TRIM_MIN_DURATION:
-                continue
-            updated["start"] = new_start
-            updated["end"] = new_end
-            trimmed.append(updated)
-    return trimmed
-
-
-def _adjust_words_after_prefix(words: list[Dict[str, Any]], prefix_seconds: float) -> list[Dict[str, Any]]:
-    adjusted_words: list[Dict[str, Any]] = []
-    for word in words:
-        if not isinstance(word, dict):
-            continue
-        w_start = word.get("start")
-        w_end = word.get("end")
-        if w_end is not None and float(w_end) <= prefix_seconds:
-            continue
-        new_word = dict(word)
-        if w_start is not None:
-            new_word["start"] = max(0.0, float(w_start) - prefix_seconds)
-        if w_end is not None:
-            new_word["end"] = max(0.0, float(w_end) - prefix_seconds)
-        adjusted_words.append(new_word)
-    return adjusted_words
-
-
-def _build_segment_from_words(
-    segment: Dict[str, Any],
-    adjusted_words: list[Dict[str, Any]],
-) -> Optional[tuple[Dict[str, Any], float, float]]:
-    if not adjusted_words:
-        return None
-    new_start = float(adjusted_words[0].get("start", 0.0))
-    new_end = float(adjusted_words[-1].get("end", 0.0))
-    if new_end - new_start < _PREFIX_TRIM_MIN_DURATION:
-        return None
-    updated = dict(segment)
-    updated["words"] = adjusted_words
-    text_tokens = []
-    for word in adjusted_words:
-        token = word.get("word") or word.get("text")
-        if token is None:
-            continue
-        text_tokens.append(str(token))
-    if text_tokens:
-        updated["text"] = "".join(text_tokens).strip()
-    updated["start"] = new_start
-    updated["end"] = new_end
-    return updated, new_start, new_end
-
-
-def _recover_first_segment_after_prefix(
-    raw_segments: list[Dict[str, Any]],
-    trimmed_segments: list[Dict[str, Any]],
-    prefix_seconds: float,
-) -> list[Dict[str, Any]]:
-    if not raw_segments:
-        return trimmed_segments
-    if not trimmed_segments:
-        first_start = None
-    else:
-        first_start = float(trimmed_segments[0].get("start", 0.0))
-    if first_start is not None and first_start <= _PREFIX_TRIM_BOUNDARY_TOLERANCE:
-        return trimmed_segments
-
-    next_start = None
-    if trimmed_segments:
-        next_start = float(trimmed_segments[0].get("start", 0.0))
-
-    best_candidate = None
-    best_overlap = None
-    for seg in raw_segments:
-        if not isinstance(seg, dict):
-            continue
-        start = float(seg.get("start", 0.0))
-        end = float(seg.get("end", 0.0))
-        if end <= prefix_seconds:
-            continue
-        if start >= prefix_seconds:
-            continue
-        overlap = max(0.0, prefix_seconds - start)
-
-        words = seg.get("words")
-        if isinstance(words, list) and words:
-            adjusted_words = _adjust_words_after_prefix(words, prefix_seconds)
-            built = _build_segment_from_words(seg, adjusted_words)
-            if not built:
-                continue
-            updated, new_start, new_end = built
-        else:
-            updated = dict(seg)
-            new_start = 0.0
-            new_end = max(0.0, end - prefix_seconds)
-            if new_end - new_start < _PREFIX_TRIM_MIN_DURATION:
-                continue
-        if new_end > _PREFIX_RECOVERY_MAX_DURATION and next_start is None:
-            continue
-        if next_start is not None and new_end > next_start:
-            new_end = max(new_start, next_start)
-            if new_end - new_start < _PREFIX_TRIM_MIN_DURATION:
-                continue
-
-        updated["start"] = new_start
-        updated["end"] = new_end
-        updated["start"] = max(0.0, float(updated["start"]))
-        updated["end"] = max(0.0, float(updated["end"]))
-        if best_candidate is None or overlap < (best_overlap or 0.0):
-            best_candidate = updated
-            best_overlap = overlap
-
-    if best_candidate is None:
-        return trimmed_segments
-
-    return [best_candidate, *trimmed_segments]
-
-
 def _can_decode_with_soundfile(path: Path) -> bool:
     try:
         with sf.SoundFile(str(path)) as sound_file:
@@ -418,6 +379,8 @@ def _normalized_audio_filename(job_id: str) -> str:
     return f"{job_id}_normalized.wav"
 
 
+def _media_kind_for(path: str) -> str:
+    return "video" if Path(path).suffix.lower() in _VIDEO_EXTENSIONS else "audio"
 
 
 def _prepare_audio_for_processing(
@@ -526,6 +489,7 @@ def process_transcription_job(
     cleanup_paths: Optional[list] = None,
     media_path: Optional[str] = None,
     media_kind: Optional[str] = None,
+    conditioning: Optional[str] = None,
 ) -> Dict[str, Any]:
     """Process audio transcription job using the selected backend."""
     prepared_audio_path_obj: Optional[Path] = None
@@ -562,12 +526,30 @@ def process_transcription_job(
                 inference_path_obj = candidate
 
         transcribe_path_obj = inference_path_obj
+        language_detection = None
+        detected_language_hint = None
+        if (language or "auto").strip().lower() in {"", "auto"}:
+            update_job_progress(job_id, 7, "Identifying spoken language...", {"stage": "preprocessing"})
+            try:
+                language_detection = _identify_language(job_id, inference_path_obj, model_path, cleanup_paths)
+            except Exception as detect_error:
+                logger.warning("Language identification failed for job %s: %s", job_id, detect_error)
+                language_detection = None
+            if language_detection:
+                detected_language_hint = language_detection.get("language")
+                logger.info("Job %s language identified as %s", job_id, detected_language_hint)
+
         prefix_trim_seconds = 0.0
         prefix_path = None
         prefix_label = None
-        if _should_apply_cantonese_prefix(language, chinese_style):
-            prefix_path = _resolve_prefix_path(chinese_style if chinese_style else "written", cleanup_paths)
-            prefix_label = "Cantonese"
+        style_prompt = None
+        conditioning_mode = _resolve_conditioning_mode(conditioning)
+        if _should_apply_cantonese_prefix(language, chinese_style, detected_language_hint):
+            if conditioning_mode == "prompt":
+                style_prompt = _resolve_style_prompt(chinese_style)
+            else:
+                prefix_path = _resolve_prefix_path(chinese_style if chinese_style else "written", cleanup_paths)
+                prefix_label = "Cantonese"
 
         if prefix_path and prefix_path.exists():
             update_job_progress(job_id, 8, f"Applying {prefix_label} prefix...", {"stage": "preprocessing"})
@@ -604,6 +586,8 @@ def process_transcription_job(
             update_job_progress(job_id, capped, message, {"stage": "transcription"})
 
         language_for_whisper = language
+        if detected_language_hint and (not prefix_trim_seconds or detected_language_hint == "yue"):
+            language_for_whisper = detected_language_hint
 
         update_job_progress(job_id, 10, "Running Whisper transcription...", {"stage": "transcription"})
         transcription = transcribe_whisper_cpp(
@@ -612,6 +596,7 @@ def process_transcription_job(
             language=language_for_whisper,
             output_dir=output_dir_path,
             progress_callback=whisper_progress,
+            prompt=style_prompt,
         )
         device_label = get_gpu_device_label()
 
@@ -623,16 +608,7 @@ def process_transcription_job(
                 media_duration = None
         except Exception:
             media_duration = None
-        segments = [
-            {
-                "id": idx,
-                "start": float(segment.get("start", 0.0)),
-                "end": float(segment.get("end", 0.0)),
-                "text": str(segment.get("text", "")).strip(),
-                "words": segment.get("words", []),
-            }
-            for idx, segment in enumerate(raw_segments)
-        ]
+        segments = SegmentTable.from_dicts(raw_segments)
         full_text = transcription.get("text", "").strip()
         detected_language = transcription.get("language") or (language or "auto")
         duration = transcription.get("duration")
@@ -650,20 +626,20 @@ def process_transcription_job(
             effective_duration = media_duration
 
         if effective_prefix_trim:
-            trimmed_segments = _trim_prefixed_segments(segments, effective_prefix_trim, strict=True)
-            if not trimmed_segments and segments:
+            trimmed_segments = trim_prefix(segments, effective_prefix_trim, strict=True)
+            if not len(trimmed_segments) and len(segments):
                 logger.warning(
                     "Prefix trim removed all segments (%.2fs); retrying with lenient trim.",
                     effective_prefix_trim,
                 )
-                trimmed_segments = _trim_prefixed_segments(segments, effective_prefix_trim, strict=False)
-            segments = _recover_first_segment_after_prefix(segments, trimmed_segments, effective_prefix_trim)
+                trimmed_segments = trim_prefix(segments, effective_prefix_trim, strict=False)
+            segments = recover_first_after_prefix(segments, trimmed_segments, effective_prefix_trim)
 
-        if not segments and full_text:
+        if not len(segments) and full_text:
             if effective_prefix_trim:
                 full_text = ""
             else:
-                segments = [
+                segments = SegmentTable.from_dicts([
                     {
                         "id": 0,
                         "start": 0.0,
@@ -671,7 +647,7 @@ def process_transcription_job(
                         "text": full_text,
                         "words": [],
                     }
-                ]
+                ])
 
         segments = _postprocess_caption_segments(segments, detected_language)
         full_text = " ".join([seg.get("text", "") for seg in segments if seg.get("text")]).strip()
@@ -709,6 +685,10 @@ def process_transcription_job(
             "device": device_label,
             "segment_count": len(segments),
         }
+        if language_detection:
+            result["language_detection"] = language_detection
+        if prefix_trim_seconds or style_prompt:
+            result["conditioning"] = "prompt" if style_prompt else "audio"
         if effective_duration is not None:
             try:
                 result["audio_duration"] = round(float(effective_duration), 2)
@@ -799,6 +779,7 @@ def process_full_pipeline_job(
     cleanup_paths: Optional[list] = None,
     media_path: Optional[str] = None,
     media_kind: Optional[str] = None,
+    conditioning: Optional[str] = None,
 ) -> Dict[str, Any]:
     """Process transcription pipeline."""
     reference_name = original_filename or (original_audio_path and Path(original_audio_path).name) or Path(file_path).name
@@ -821,6 +802,7 @@ def process_full_pipeline_job(
             cleanup_paths=cleanup_paths,
             media_path=media_path or file_path,
             media_kind=media_kind,
+            conditioning=conditioning,
         )
 
         audio_info: Dict[str, Any] = {"name": reference_name}
@@ -877,3 +859,136 @@ def process_full_pipeline_job(
         except Exception as history_error:
             logger.warning("Failed to record failed job %s in history: %s", job_id, history_error)
         raise
+
+
+def _resolve_range_source_audio(job_id: str, media_path: Optional[str]) -> Optional[Path]:
+    normalized_path = get_uploads_dir() / _normalized_audio_filename(job_id)
+    if normalized_path.exists():
+        return normalized_path
+    if media_path:
+        candidate = Path(media_path)
+        if candidate.exists():
+            return candidate
+    return None
+
+
+def _widen_range_to_segments(
+    segments: Iterable[Dict[str, Any]],
+    start: float,
+    end: float,
+) -> Tuple[float, float]:
+    range_start, range_end = start, end
+    for segment in segments:
+        seg_start = float(segment.get("start", 0.0))
+        seg_end = float(segment.get("end", 0.0))
+        if seg_start < end and seg_end > start:
+            range_start = min(range_start, seg_start)
+            range_end = max(range_end, seg_end)
+    return max(0.0, range_start), range_end
+
+
+def _offset_range_segments(
+    segments: Iterable[Dict[str, Any]],
+    offset: float,
+    range_end: float,
+) -> SegmentTable:
+    shifted = SegmentTable.from_dicts(segments).shifted(offset, upper=range_end)
+    shifted.text = [text.strip() for text in shifted.text]
+    # Only timings, text and words carry over from the slice transcription.
+    shifted.extras = [{} for _ in shifted.extras]
+    keep = (shifted.end > shifted.start) & np.fromiter(
+        (bool(text) for text in shifted.text), dtype=bool, count=len(shifted)
+    )
+    return shifted.take(np.flatnonzero(keep))
+
+
+def retranscribe_time_range(
+    job_id: str,
+    start: float,
+    end: float,
+    *,
+    model_path: Optional[str] = None,
+    language: Optional[str] = None,
+    chinese_style: Optional[str] = None,
+) -> Dict[str, Any]:
+    """Re-run Whisper on ``[start, end]`` of a job and splice the result into its transcript."""
+    record = native_history.get_job_record(job_id)
+    transcription = record.get("transcript") if record else None
+    if not transcription:
+        raise LookupError("Transcription not found")
+
+    source_path = _resolve_range_source_audio(job_id, record.get("media_path"))
+    if not source_path:
+        raise FileNotFoundError("Source media for this job is no longer available")
+
+    segments = transcription.get("segments") or []
+    range_start, range_end = _widen_range_to_segments(segments, start, end)
+    effective_language = (language or transcription.get("language") or record.get("language") or "auto").strip()
+
+    # The audio prefix would cost more than a short slice, so the style is
+    # always conveyed through the text prompt here.
+    style_prompt = None
+    if _should_apply_cantonese_prefix(effective_language, chinese_style):
+        style_prompt = _resolve_style_prompt(chinese_style)
+
+    cleanup_paths: list = []
+    output_dir_path = Path(tempfile.mkdtemp())
+    try:
+        slice_path = _extract_audio_sample(
+            source_path,
+            offset=range_start,
+            duration=range_end - range_start,
+            cleanup_paths=cleanup_paths,
+        )
+        if not slice_path:
+            raise RuntimeError("Failed to cut the selected range from the source audio")
+
+        started = time.time()
+        sliced = transcribe_whisper_cpp(
+            slice_path,
+            model_path=model_path,
+            language=effective_language,
+            output_dir=output_dir_path,
+            prompt=style_prompt,
+        )
+        transcription_time = time.time() - started
+    finally:
+        with contextlib.suppress(Exception):
+            shutil.rmtree(output_dir_path, ignore_errors=True)
+        for path in cleanup_paths:
+            with contextlib.suppress(Exception):
+                shutil.rmtree(path, ignore_errors=True)
+
+    detected_language = sliced.get("language") or effective_language
+    new_segments = _postprocess_caption_segments(
+        _offset_range_segments(sliced.get("segments") or [], range_start, range_end),
+        detected_language,
+    )
+
+    for segment in new_segments:
+        segment["originalText"] = segment["text"]
+
+    # Splice against the current rows (not the record read above, which may
+    # be stale after a long inference) as one journaled, undoable edit.
+    spliced = native_history.splice_transcript_range(job_id, range_start, range_end, new_segments)
+    removed_ids = spliced["removed_ids"]
+    new_segments = spliced["segments"]
+
+    logger.info(
+        "Re-transcribed %.2f-%.2fs of job %s in %.2fs (%d -> %d segments)",
+        range_start,
+        range_end,
+        job_id,
+        transcription_time,
+        len(removed_ids),
+        len(new_segments),
+    )
+    return {
+        "start": round(range_start, 3),
+        "end": round(range_end, 3),
+        "removed_ids": removed_ids,
+        "segments": new_segments,
+        "revision": spliced["revision"],
+        "language": detected_language,
+        "transcription_time": round(transcription_time, 2),
+    }
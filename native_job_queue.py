@@ -10,13 +10,18 @@ import json
 import uuid
 import traceback
 from pathlib import Path
-from typing import Dict, Any, Optional, Callable
+from typing import Dict, Any, Optional, Callable, Tuple
 from datetime import datetime
 import queue
 import logging
 
+import native_transcript_codec
+
 logger = logging.getLogger(__name__)
 
+# Stay well under SQLite's bound-variable limit in IN (...) lookups
+_STATE_QUERY_CHUNK = 500
+
 
 class Job:
     """Job object compatible with RQ Job interface"""
@@ -48,6 +53,13 @@ class Job:
         self._status = 'canceled'
 
 
+# Process-wide job registry shared by every queue instance, so each job has a
+# single live Job object (and a single set of in-memory updates) no matter
+# which queue it is enqueued on or looked up through.
+_active_jobs: Dict[str, Job] = {}
+_job_updates: Dict[str, Dict[str, Any]] = {}
+
+
 class NativeJobQueue:
     """SQLite-based job queue that mimics Redis + RQ behavior"""
 
@@ -63,8 +75,8 @@ class NativeJobQueue:
         self.db_path = db_path
         self.conn = None
         self.lock = threading.Lock()
-        self.job_updates = {}  # In-memory storage for real-time updates
-        self.active_jobs = {}  # Track active Job objects
+        self.job_updates = _job_updates  # In-memory storage for real-time updates
+        self.active_jobs = _active_jobs  # Live Job objects, shared across queues
         self._init_db()
 
         self.job_queue = queue.Queue()
@@ -101,6 +113,13 @@ class NativeJobQueue:
                 )
                 self.conn.commit()
 
+            cached = self.active_jobs.get(job_id)
+            if cached is not None:
+                cached._status = 'queued'
+                cached.started_at = None
+                cached.ended_at = None
+                cached.exc_info = None
+
             # Update metadata to indicate the job was interrupted
             self.update_job_meta(
                 job_id,
@@ -155,6 +174,36 @@ class NativeJobQueue:
     def enqueue(self, func: Callable, kwargs: Dict[str, Any] = None,
                 job_id: str = None):
         """Add job to queue"""
+        job = self._record_job(func, kwargs, job_id)
+
+        # Add to processing queue
+        self.job_queue.put((job, func, job.kwargs))
+
+        logger.info(f"Enqueued job {job.id} to queue '{self.name}'")
+        return job
+
+    def start_dedicated(self, func: Callable, kwargs: Dict[str, Any] = None,
+                        job_id: str = None, on_finish: Optional[Callable[[], None]] = None):
+        """
+        Record a job like enqueue() but run it on its own thread instead of the
+        shared workers, for long-running sessions that would otherwise hold a
+        worker until they stop. on_finish is called when the job ends.
+        """
+        job = self._record_job(func, kwargs, job_id)
+
+        def _run():
+            try:
+                _run_job(self, job, func, job.kwargs, f"Dedicated thread for {job.id}")
+            finally:
+                if on_finish is not None:
+                    on_finish()
+
+        thread = threading.Thread(target=_run, name=f"xcaption-job-{job.id[:8]}", daemon=True)
+        thread.start()
+        logger.info(f"Started job {job.id} on a dedicated thread (queue '{self.name}')")
+        return job
+
+    def _record_job(self, func: Callable, kwargs: Optional[Dict[str, Any]], job_id: Optional[str]) -> Job:
         if kwargs is None:
             kwargs = {}
 
@@ -192,40 +241,16 @@ class NativeJobQueue:
             ))
             self.conn.commit()
 
-        # Add to processing queue
-        self.job_queue.put((job, func, kwargs))
-
-        logger.info(f"Enqueued job {job_id} to queue '{self.name}'")
         return job
 
     def fetch_job(self, job_id: str):
         """Fetch job by ID (compatible with RQ Job.fetch)"""
-        # IMPORTANT: Jobs live in a shared DB across all queue instances. Do not
-        # trust per-queue in-memory caches alone, or status can go stale (e.g. a
-        # "low" queue job fetched via the "high" queue would otherwise stay
-        # "started" forever and make the UI oscillate between processing/done).
-
-        terminal_states = {"finished", "failed", "canceled", "cancelled", "deleted"}
-
+        # Jobs live in a shared DB and a shared registry across all queue
+        # instances. Every status/meta change goes through update_job_status /
+        # update_job_meta, which keep the registered Job current, so a hit
+        # needs no query.
         cached = self.active_jobs.get(job_id)
-        if cached is not None and cached.get_status() in terminal_states:
-            return cached
-
-        # Refresh from database (lightweight query for cached jobs).
         if cached is not None:
-            with self.lock:
-                row = self.conn.execute(
-                    "SELECT status, started_at, ended_at, error FROM jobs WHERE job_id = ?",
-                    (job_id,),
-                ).fetchone()
-            if not row:
-                raise Exception(f"Job {job_id} not found")
-
-            status, started_at, ended_at, error = row
-            cached._status = status or cached._status
-            cached.started_at = datetime.fromtimestamp(started_at) if started_at else cached.started_at
-            cached.ended_at = datetime.fromtimestamp(ended_at) if ended_at else cached.ended_at
-            cached.exc_info = error
             return cached
 
         # Not cached: load the full job record once.
@@ -255,7 +280,7 @@ class NativeJobQueue:
         except Exception:
             job.meta = {}
         try:
-            job.result = json.loads(row[9]) if row[9] else None
+            job.result = native_transcript_codec.decode_value(row[9]) if row[9] else None
         except Exception:
             job.result = None
         job.exc_info = row[10]
@@ -274,7 +299,7 @@ class NativeJobQueue:
                 updates['ended_at'] = time.time()
 
             if result is not None:
-                updates['result'] = json.dumps(result)
+                updates['result'] = native_transcript_codec.encode_value(result)
 
             if error is not None:
                 updates['error'] = error
@@ -295,6 +320,32 @@ class NativeJobQueue:
             if error is not None:
                 job.exc_info = error
 
+        for listener in list(_status_listeners):
+            try:
+                listener(job_id, status, error)
+            except Exception as exc:
+                logger.debug(f"Job status listener failed for {job_id}: {exc}")
+
+    def compact_results(self, after: str, limit: int = 50) -> Optional[str]:
+        """Re-encode JSON-text transcript results after job id *after*; returns the last id seen, None when done"""
+        with self.lock:
+            rows = self.conn.execute("""
+                SELECT job_id, result FROM jobs
+                WHERE job_id > ? AND typeof(result) = 'text'
+                ORDER BY job_id
+                LIMIT ?
+            """, (after, limit)).fetchall()
+            for job_id, result in rows:
+                try:
+                    value = json.loads(result)
+                except Exception:
+                    continue
+                encoded = native_transcript_codec.encode_value(value)
+                if isinstance(encoded, bytes):
+                    self.conn.execute("UPDATE jobs SET result = ? WHERE job_id = ?", (encoded, job_id))
+            self.conn.commit()
+        return rows[-1][0] if rows else None
+
     def update_job_meta(self, job_id: str, meta: Dict[str, Any]):
         """Update job metadata"""
         with self.lock:
@@ -320,6 +371,31 @@ class NativeJobQueue:
             job = self.active_jobs[job_id]
             job.meta.update(meta)
 
+    def fetch_job_states(self, job_ids) -> Dict[str, Dict[str, Any]]:
+        """Load status/meta/error for many jobs with one IN (...) query per chunk (result is not loaded)"""
+        job_ids = list(dict.fromkeys(job_ids))
+        states = {}
+        for offset in range(0, len(job_ids), _STATE_QUERY_CHUNK):
+            chunk = job_ids[offset:offset + _STATE_QUERY_CHUNK]
+            placeholders = ', '.join('?' for _ in chunk)
+            with self.lock:
+                rows = self.conn.execute(
+                    f"SELECT job_id, queue_name, status, meta, error FROM jobs WHERE job_id IN ({placeholders})",
+                    chunk,
+                ).fetchall()
+            for job_id, queue_name, status, meta, error in rows:
+                try:
+                    meta = json.loads(meta) if meta else {}
+                except Exception:
+                    meta = {}
+                states[job_id] = {
+                    'queue_name': queue_name,
+                    'status': status,
+                    'meta': meta,
+                    'error': error,
+                }
+        return states
+
     def get_job_updates(self, job_id: str) -> Dict[str, Any]:
         """Get latest job updates (for polling)"""
         return self.job_updates.get(job_id, {})
@@ -330,11 +406,8 @@ class NativeJobQueue:
             self.conn.execute("DELETE FROM jobs WHERE job_id = ?", (job_id,))
             self.conn.commit()
 
-        if job_id in self.active_jobs:
-            del self.active_jobs[job_id]
-
-        if job_id in self.job_updates:
-            del self.job_updates[job_id]
+        self.active_jobs.pop(job_id, None)
+        self.job_updates.pop(job_id, None)
 
     def __len__(self):
         """Get queue length"""
@@ -398,40 +471,7 @@ class NativeWorker:
                     job, func, kwargs = job_queue.job_queue.get(timeout=0.1)
                     job_processed = True
 
-                    logger.info(f"Worker {worker_id} processing job {job.id}")
-
-                    # Update status to started
-                    job_queue.update_job_status(job.id, 'started')
-                    job._status = 'started'
-                    job.started_at = datetime.now()
-
-                    try:
-                        # Execute the job
-                        result = func(**kwargs)
-
-                        # Update status to finished
-                        job_queue.update_job_status(job.id, 'finished', result=result)
-                        job._status = 'finished'
-                        job.result = result
-                        job.ended_at = datetime.now()
-
-                        logger.info(f"Worker {worker_id} completed job {job.id}")
-
-                    except Exception as e:
-                        # Job failed
-                        error_msg = traceback.format_exc()
-                        logger.error(
-                            "Worker %s job %s failed: %s\n%s",
-                            worker_id,
-                            job.id,
-                            e,
-                            error_msg,
-                        )
-
-                        job_queue.update_job_status(job.id, 'failed', error=error_msg)
-                        job._status = 'failed'
-                        job.exc_info = error_msg
-                        job.ended_at = datetime.now()
+                    _run_job(job_queue, job, func, kwargs, f"Worker {worker_id}")
 
                     break  # Job processed, exit queue loop
 
@@ -446,9 +486,48 @@ class NativeWorker:
         logger.info(f"Worker thread {worker_id} stopped")
 
 
+def _run_job(job_queue: NativeJobQueue, job: Job, func: Callable, kwargs: Dict[str, Any], runner: str):
+    """Execute one job and record its outcome on job_queue"""
+    logger.info(f"{runner} processing job {job.id}")
+
+    # Update status to started
+    job_queue.update_job_status(job.id, 'started')
+    job._status = 'started'
+    job.started_at = datetime.now()
+
+    try:
+        # Execute the job
+        result = func(**kwargs)
+
+        # Update status to finished
+        job_queue.update_job_status(job.id, 'finished', result=result)
+        job._status = 'finished'
+        job.result = result
+        job.ended_at = datetime.now()
+
+        logger.info(f"{runner} completed job {job.id}")
+
+    except Exception as e:
+        # Job failed
+        error_msg = traceback.format_exc()
+        logger.error(
+            "%s job %s failed: %s\n%s",
+            runner,
+            job.id,
+            e,
+            error_msg,
+        )
+
+        job_queue.update_job_status(job.id, 'failed', error=error_msg)
+        job._status = 'failed'
+        job.exc_info = error_msg
+        job.ended_at = datetime.now()
+
+
 # Singleton instances
 _queues = {}
 _worker = None
+_status_listeners = []
 
 
 def get_queue(name: str = 'default') -> NativeJobQueue:
@@ -482,6 +561,23 @@ def start_worker(num_threads: int = 2):
     return _worker
 
 
+def find_job(job_id: str) -> Tuple[Optional[Job], Optional[NativeJobQueue]]:
+    """Return (job, owning queue): a registry hit, or one DB read on a cold miss"""
+    job = _active_jobs.get(job_id)
+    if job is None:
+        try:
+            job = get_queue('default').fetch_job(job_id)
+        except Exception:
+            return None, None
+    return job, get_queue(job.queue_name or 'default')
+
+
+def add_status_listener(listener: Callable[[str, str, Optional[str]], None]):
+    """Call listener(job_id, status, error) after every job status change"""
+    if listener not in _status_listeners:
+        _status_listeners.append(listener)
+
+
 def get_worker() -> Optional[NativeWorker]:
     """Get the worker instance"""
     return _worker
@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+"""Interval index over a transcript's segments for time-range and id lookups."""
+
+from __future__ import annotations
+
+from bisect import bisect_left, bisect_right
+from typing import Any, Dict, List, Optional
+
+
+def _as_float(value: Any) -> float:
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return 0.0
+
+
+class SegmentIndex:
+    """Sorted segment starts plus a running max of ends, and an id -> position map.
+
+    Segments may overlap and may be stored out of order, so queries run over
+    the start-sorted order: ``bisect`` on the starts bounds the right side and
+    ``bisect`` on the non-decreasing running max of ends bounds the left side.
+    Positions refer to the caller's ``segments`` list, which is not copied.
+    """
+
+    __slots__ = ("segments", "_order", "_starts", "_max_ends", "_positions", "max_id")
+
+    def __init__(self, segments: List[Dict[str, Any]]) -> None:
+        self.segments = segments
+        keyed = sorted(
+            (_as_float(segment.get("start")), position)
+            for position, segment in enumerate(segments)
+            if isinstance(segment, dict)
+        )
+        self._order = [position for _, position in keyed]
+        self._starts = [start for start, _ in keyed]
+        self._max_ends: List[float] = []
+        running = float("-inf")
+        for position in self._order:
+            running = max(running, _as_float(segments[position].get("end")))
+            self._max_ends.append(running)
+
+        self._positions: Dict[Any, int] = {}
+        max_id = -1
+        for position, segment in enumerate(segments):
+            if not isinstance(segment, dict):
+                continue
+            segment_id = segment.get("id")
+            self._positions.setdefault(segment_id, position)
+            try:
+                numeric_id = int(segment_id)
+            except (TypeError, ValueError):
+                continue
+            self._positions.setdefault(numeric_id, position)
+            max_id = max(max_id, numeric_id)
+        self.max_id = max_id
+
+    def __len__(self) -> int:
+        return len(self._order)
+
+    def position(self, segment_id: Any) -> Optional[int]:
+        """Return the list position of the first segment with *segment_id*."""
+        position = self._positions.get(segment_id)
+        if position is None and not isinstance(segment_id, int):
+            try:
+                position = self._positions.get(int(segment_id))
+            except (TypeError, ValueError):
+                position = None
+        return position
+
+    def get(self, segment_id: Any) -> Optional[Dict[str, Any]]:
+        position = self.position(segment_id)
+        return self.segments[position] if position is not None else None
+
+    def overlapping(self, start: Optional[float] = None, end: Optional[float] = None) -> List[Dict[str, Any]]:
+        """Return segments intersecting [start, end), ordered by start time."""
+        low = 0 if start is None else bisect_right(self._max_ends, start)
+        high = len(self._order) if end is None else bisect_left(self._starts, end)
+        matches: List[Dict[str, Any]] = []
+        for position in self._order[low:high]:
+            segment = self.segments[position]
+            if start is not None and _as_float(segment.get("end")) <= start:
+                continue
+            matches.append(segment)
+        return matches
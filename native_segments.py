@@ -0,0 +1,417 @@
+#!/usr/bin/env python3
+"""
+Columnar segment storage for transcript post-processing.
+
+Segments are held as NumPy ``start``/``end`` arrays plus parallel text and
+metadata lists, so offset shifting, prefix trimming and proportional splitting
+run as array operations instead of per-segment dict copies. Dicts are only
+built again by :meth:`SegmentTable.to_dicts` when a result leaves the pipeline.
+"""
+from __future__ import annotations
+
+import re
+from typing import Any, Dict, Iterable, List, Optional, Sequence
+
+import numpy as np
+
+_CC_CREDIT_PATTERN = re.compile(r"^\s*CC[^:：]+[:：].+\s*$", re.IGNORECASE)
+_COMMA_PATTERN = re.compile(r"\s*,\s*")
+_MULTI_SPACE_PATTERN = re.compile(r"\s{2,}")
+_SPLIT_MIN_DURATION = 8.0
+_SPLIT_MIN_TOKENS = 3
+
+PREFIX_TRIM_MIN_DURATION = 0.2
+PREFIX_TRIM_BOUNDARY_TOLERANCE = 0.25
+PREFIX_RECOVERY_MAX_DURATION = 12.0
+
+
+def _to_text(value: Any) -> str:
+    return "" if value is None else str(value)
+
+
+class WordColumns:
+    """Word timings of one segment; missing times are stored as NaN."""
+
+    __slots__ = ("start", "end", "source")
+
+    def __init__(self, start: np.ndarray, end: np.ndarray, source: List[Dict[str, Any]]) -> None:
+        self.start = start
+        self.end = end
+        self.source = source
+
+    @classmethod
+    def from_dicts(cls, words: Iterable[Any]) -> "WordColumns":
+        source = [word for word in words if isinstance(word, dict)]
+        start = np.array(
+            [np.nan if word.get("start") is None else float(word["start"]) for word in source],
+            dtype=np.float64,
+        )
+        end = np.array(
+            [np.nan if word.get("end") is None else float(word["end"]) for word in source],
+            dtype=np.float64,
+        )
+        return cls(start, end, source)
+
+    def __len__(self) -> int:
+        return len(self.source)
+
+    def take(self, mask: np.ndarray) -> "WordColumns":
+        indices = np.flatnonzero(mask)
+        return WordColumns(self.start[indices], self.end[indices], [self.source[i] for i in indices.tolist()])
+
+    def shifted(self, offset: float, *, clamp: bool = False, upper: Optional[float] = None) -> "WordColumns":
+        start = self.start + offset
+        end = self.end + offset
+        if clamp:
+            # np.maximum propagates NaN, so missing times stay missing.
+            start = np.maximum(start, 0.0)
+            end = np.maximum(end, 0.0)
+        if upper is not None:
+            start = np.minimum(start, upper)
+            end = np.minimum(end, upper)
+        return WordColumns(start, end, self.source)
+
+    def after_prefix(self, prefix_seconds: float) -> "WordColumns":
+        """Drop words that end inside the prefix and shift the rest back to zero."""
+        keep = ~(self.end <= prefix_seconds)
+        return self.take(keep).shifted(-prefix_seconds, clamp=True)
+
+    def text(self) -> Optional[str]:
+        tokens = []
+        for word in self.source:
+            token = word.get("word") or word.get("text")
+            if token is not None:
+                tokens.append(str(token))
+        return "".join(tokens).strip() if tokens else None
+
+    def to_dicts(self) -> List[Dict[str, Any]]:
+        words: List[Dict[str, Any]] = []
+        for idx, word in enumerate(self.source):
+            new_word = dict(word)
+            if not np.isnan(self.start[idx]):
+                new_word["start"] = float(self.start[idx])
+            if not np.isnan(self.end[idx]):
+                new_word["end"] = float(self.end[idx])
+            words.append(new_word)
+        return words
+
+
+class SegmentTable:
+    """Columnar transcript segments.
+
+    ``extras`` keeps a reference to each source dict so keys other than
+    start/end/text survive the round trip. ``words`` holds rebuilt word
+    columns only for rows whose words were changed; other rows keep the
+    source ``words`` value untouched.
+    """
+
+    __slots__ = ("start", "end", "text", "extras", "words")
+
+    def __init__(
+        self,
+        start: np.ndarray,
+        end: np.ndarray,
+        text: List[str],
+        extras: List[Dict[str, Any]],
+        words: Optional[List[Optional[WordColumns]]] = None,
+    ) -> None:
+        self.start = start
+        self.end = end
+        self.text = text
+        self.extras = extras
+        self.words = words if words is not None else [None] * len(text)
+
+    @classmethod
+    def empty(cls) -> "SegmentTable":
+        return cls(np.zeros(0), np.zeros(0), [], [])
+
+    @classmethod
+    def from_dicts(cls, segments: Iterable[Any]) -> "SegmentTable":
+        if isinstance(segments, SegmentTable):
+            return segments
+        extras = [segment for segment in segments if isinstance(segment, dict)]
+        start = np.fromiter((float(seg.get("start", 0.0) or 0.0) for seg in extras), dtype=np.float64, count=len(extras))
+        end = np.fromiter((float(seg.get("end", 0.0) or 0.0) for seg in extras), dtype=np.float64, count=len(extras))
+        text = [_to_text(seg.get("text", "")) for seg in extras]
+        return cls(start, end, text, extras)
+
+    def __len__(self) -> int:
+        return len(self.text)
+
+    def word_columns(self, row: int) -> Optional[WordColumns]:
+        columns = self.words[row]
+        if columns is not None:
+            return columns
+        words = self.extras[row].get("words")
+        if isinstance(words, list) and words:
+            return WordColumns.from_dicts(words)
+        return None
+
+    def take(self, indices: Sequence[int] | np.ndarray) -> "SegmentTable":
+        index_array = np.asarray(indices, dtype=np.intp)
+        rows = index_array.tolist()
+        return SegmentTable(
+            self.start[index_array],
+            self.end[index_array],
+            [self.text[i] for i in rows],
+            [self.extras[i] for i in rows],
+            [self.words[i] for i in rows],
+        )
+
+    def shifted(self, offset: float, *, upper: Optional[float] = None) -> "SegmentTable":
+        start = self.start + offset
+        end = self.end + offset
+        if upper is not None:
+            start = np.minimum(start, upper)
+            end = np.minimum(end, upper)
+        words: List[Optional[WordColumns]] = []
+        for row in range(len(self)):
+            columns = self.word_columns(row)
+            words.append(None if columns is None else columns.shifted(offset, upper=upper))
+        return SegmentTable(start, end, list(self.text), list(self.extras), words)
+
+    @staticmethod
+    def concat(tables: Sequence["SegmentTable"]) -> "SegmentTable":
+        tables = [table for table in tables if len(table)]
+        if not tables:
+            return SegmentTable.empty()
+        return SegmentTable(
+            np.concatenate([table.start for table in tables]),
+            np.concatenate([table.end for table in tables]),
+            [text for table in tables for text in table.text],
+            [extra for table in tables for extra in table.extras],
+            [columns for table in tables for columns in table.words],
+        )
+
+    def to_dicts(
+        self,
+        *,
+        renumber: bool = False,
+        defaults: Optional[Dict[str, Any]] = None,
+    ) -> List[Dict[str, Any]]:
+        starts = self.start.tolist()
+        ends = self.end.tolist()
+        segments: List[Dict[str, Any]] = []
+        for idx, extra in enumerate(self.extras):
+            segment = dict(defaults) if defaults else {}
+            segment.update(extra)
+            segment["start"] = starts[idx]
+            segment["end"] = ends[idx]
+            segment["text"] = self.text[idx]
+            columns = self.words[idx]
+            if columns is not None:
+                segment["words"] = columns.to_dicts()
+            if renumber:
+                segment["id"] = idx
+            segments.append(segment)
+        return segments
+
+
+def _clean_caption_text(text: str, is_zh: bool) -> Optional[str]:
+    text = text.strip()
+    if not text:
+        return text
+    if text[:2].lower() == "cc" and _CC_CREDIT_PATTERN.match(text):
+        return None
+    if "," in text:
+        text = _COMMA_PATTERN.sub(" ", text).strip()
+    if "(" in text or ")" in text:
+        text = text.replace("(", "").replace(")", "").strip()
+        text = _MULTI_SPACE_PATTERN.sub(" ", text)
+    if is_zh and text.endswith("。"):
+        text = text[:-1].rstrip()
+    return text
+
+
+def _split_bounds(
+    seg_start: np.ndarray,
+    seg_end: np.ndarray,
+    token_lengths: np.ndarray,
+    token_counts: np.ndarray,
+) -> tuple[np.ndarray, np.ndarray]:
+    """Split each segment into its tokens, sharing the duration by character count.
+
+    All segments are handled in one pass: cumulative character counts are
+    taken over the flat token array and rebased per segment.
+    """
+    group_starts = np.cumsum(token_counts) - token_counts
+    owner = np.repeat(np.arange(len(token_counts)), token_counts)
+    cumulative = np.cumsum(token_lengths)
+    before_group = cumulative[group_starts] - token_lengths[group_starts]
+    within = cumulative - before_group[owner]
+    totals = np.add.reduceat(token_lengths, group_starts)
+    duration = seg_end - seg_start
+    ends = seg_start[owner] + duration[owner] * (within / totals[owner])
+    last_tokens = group_starts + token_counts - 1
+    ends[last_tokens] = seg_end
+    starts = np.empty_like(ends)
+    starts[1:] = ends[:-1]
+    starts[group_starts] = seg_start
+    starts = np.maximum(starts, 0.0)
+    ends = np.maximum(starts, ends)
+    return starts, ends
+
+
+def postprocess_caption_table(table: SegmentTable, language: Optional[str] = None) -> SegmentTable:
+    """Clean caption text, drop credit lines and split long Chinese segments on spaces."""
+    is_zh = (language or "").strip().lower().startswith("zh")
+    keep: List[int] = []
+    texts: List[str] = []
+    for idx, raw_text in enumerate(table.text):
+        cleaned = _clean_caption_text(raw_text, is_zh)
+        if cleaned is None:
+            continue
+        keep.append(idx)
+        texts.append(cleaned)
+    kept = table.take(keep)
+    kept.text = texts
+    if not is_zh or not len(kept):
+        return kept
+
+    duration = (kept.end - kept.start).tolist()
+    split_rows: List[int] = []
+    split_tokens: List[List[str]] = []
+    for idx, text in enumerate(texts):
+        if " " not in text or duration[idx] <= 0.0:
+            continue
+        tokens = text.split()
+        if len(tokens) < 2:
+            continue
+        if duration[idx] >= _SPLIT_MIN_DURATION or len(tokens) >= _SPLIT_MIN_TOKENS:
+            split_rows.append(idx)
+            split_tokens.append(tokens)
+    if not split_rows:
+        return kept
+
+    rows = np.asarray(split_rows, dtype=np.intp)
+    token_counts = np.fromiter((len(tokens) for tokens in split_tokens), dtype=np.intp, count=len(split_tokens))
+    flat_tokens = [token for tokens in split_tokens for token in tokens]
+    token_lengths = np.fromiter((len(token) for token in flat_tokens), dtype=np.float64, count=len(flat_tokens))
+    token_starts, token_ends = _split_bounds(kept.start[rows], kept.end[rows], token_lengths, token_counts)
+
+    counts = np.ones(len(kept), dtype=np.intp)
+    counts[rows] = token_counts
+    source_rows = np.repeat(np.arange(len(kept)), counts)
+    output_offsets = np.cumsum(counts) - counts
+    group_starts = np.cumsum(token_counts) - token_counts
+    positions = np.repeat(output_offsets[rows], token_counts) + (
+        np.arange(len(flat_tokens)) - np.repeat(group_starts, token_counts)
+    )
+
+    result = kept.take(source_rows)
+    result.start[positions] = token_starts
+    result.end[positions] = token_ends
+    for position, token in zip(positions.tolist(), flat_tokens):
+        if token.endswith("。"):
+            token = token[:-1].rstrip()
+        result.text[position] = token
+    return result
+
+
+def _trim_word_row(table: SegmentTable, row: int, prefix_seconds: float) -> Optional[tuple[WordColumns, float, float]]:
+    columns = table.word_columns(row)
+    if columns is None:
+        return None
+    adjusted = columns.after_prefix(prefix_seconds)
+    if not len(adjusted):
+        return None
+    new_start = 0.0 if np.isnan(adjusted.start[0]) else float(adjusted.start[0])
+    new_end = 0.0 if np.isnan(adjusted.end[-1]) else float(adjusted.end[-1])
+    if new_end - new_start < PREFIX_TRIM_MIN_DURATION:
+        return None
+    return adjusted, new_start, new_end
+
+
+def _apply_word_row(
+    table: SegmentTable,
+    row: int,
+    built: tuple[WordColumns, float, float],
+) -> None:
+    adjusted, new_start, new_end = built
+    table.words[row] = adjusted
+    text = adjusted.text()
+    if text is not None:
+        table.text[row] = text
+    table.start[row] = new_start
+    table.end[row] = new_end
+
+
+def _has_words(table: SegmentTable) -> np.ndarray:
+    return np.fromiter(
+        (
+            columns is not None or (isinstance(extra.get("words"), list) and bool(extra.get("words")))
+            for columns, extra in zip(table.words, table.extras)
+        ),
+        dtype=bool,
+        count=len(table),
+    )
+
+
+def trim_prefix(table: SegmentTable, prefix_seconds: float, *, strict: bool = True) -> SegmentTable:
+    """Remove segments produced by a prepended prefix clip and shift the rest to zero."""
+    if prefix_seconds <= 0 or not len(table):
+        return table
+    has_words = _has_words(table)
+    alive = table.end > prefix_seconds + PREFIX_TRIM_MIN_DURATION
+
+    plain = alive & ~has_words
+    if strict:
+        plain &= ~(table.start < prefix_seconds - PREFIX_TRIM_BOUNDARY_TOLERANCE)
+    new_start = np.maximum(table.start - prefix_seconds, 0.0)
+    new_end = np.maximum(table.end - prefix_seconds, 0.0)
+    plain &= (new_end - new_start) >= PREFIX_TRIM_MIN_DURATION
+
+    keep = plain.copy()
+    trimmed = SegmentTable(new_start, new_end, list(table.text), list(table.extras), list(table.words))
+    for row in np.flatnonzero(alive & has_words).tolist():
+        built = _trim_word_row(table, row, prefix_seconds)
+        if built is None:
+            continue
+        _apply_word_row(trimmed, row, built)
+        keep[row] = True
+    return trimmed.take(np.flatnonzero(keep))
+
+
+def recover_first_after_prefix(
+    raw: SegmentTable,
+    trimmed: SegmentTable,
+    prefix_seconds: float,
+) -> SegmentTable:
+    """Bring back the segment that straddles the prefix boundary when trimming lost the opening."""
+    if not len(raw):
+        return trimmed
+    next_start = float(trimmed.start[0]) if len(trimmed) else None
+    if next_start is not None and next_start <= PREFIX_TRIM_BOUNDARY_TOLERANCE:
+        return trimmed
+
+    candidates = np.flatnonzero((raw.end > prefix_seconds) & (raw.start < prefix_seconds))
+    if not len(candidates):
+        return trimmed
+    has_words = _has_words(raw)
+    # Smallest overlap with the prefix first; stable order keeps the earliest on ties.
+    overlaps = prefix_seconds - raw.start[candidates]
+    for row in candidates[np.argsort(overlaps, kind="stable")].tolist():
+        built = None
+        if has_words[row]:
+            built = _trim_word_row(raw, row, prefix_seconds)
+            if built is None:
+                continue
+            new_start, new_end = built[1], built[2]
+        else:
+            new_start = 0.0
+            new_end = max(0.0, float(raw.end[row]) - prefix_seconds)
+            if new_end - new_start < PREFIX_TRIM_MIN_DURATION:
+                continue
+        if new_end > PREFIX_RECOVERY_MAX_DURATION and next_start is None:
+            continue
+        if next_start is not None and new_end > next_start:
+            new_end = max(new_start, next_start)
+            if new_end - new_start < PREFIX_TRIM_MIN_DURATION:
+                continue
+        recovered = raw.take([row])
+        if built is not None:
+            _apply_word_row(recovered, 0, built)
+        recovered.start[0] = max(0.0, new_start)
+        recovered.end[0] = max(0.0, new_end)
+        return SegmentTable.concat([recovered, trimmed])
+    return trimmed
@@ -0,0 +1,582 @@
+#!/usr/bin/env python3
+"""
+Transcription over streaming audio sources: live captioning and URL imports
+that start transcribing while the download is still in progress.
+
+FFmpeg decodes the source (URL, capture device or growing file) to 16 kHz mono
+PCM. Overlapping sliding windows of that audio are transcribed with Whisper.cpp
+and segments are committed once they fall far enough behind the live edge that
+a later window will not revise them. Committed segments go through the same
+post-processing as file mode and are pushed through the job update channel.
+"""
+from __future__ import annotations
+
+import contextlib
+import logging
+import os
+import shutil
+import subprocess
+import tempfile
+import threading
+import time
+import wave
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+import native_history
+import native_job_handlers
+from download_media import resolve_audio_stream
+from native_config import get_uploads_dir
+from native_ffmpeg import get_ffmpeg_path
+from whisper_cpp_runtime import transcribe_whisper_cpp
+
+logger = logging.getLogger(__name__)
+
+_SAMPLE_RATE = 16000
+_BYTES_PER_SAMPLE = 2
+_BYTES_PER_SECOND = _SAMPLE_RATE * _BYTES_PER_SAMPLE
+_READ_CHUNK_BYTES = _BYTES_PER_SECOND // 10
+
+_WINDOW_ENV = "XCAPTION_LIVE_WINDOW_SECONDS"
+_STEP_ENV = "XCAPTION_LIVE_STEP_SECONDS"
+_MAX_LAG_ENV = "XCAPTION_LIVE_MAX_LAG_SECONDS"
+_DEFAULT_WINDOW_SECONDS = 10.0
+_DEFAULT_STEP_SECONDS = 3.0
+_DEFAULT_MAX_LAG_SECONDS = 30.0
+_COMMIT_TOLERANCE_SECONDS = 0.2
+_HOLDBACK_SECONDS = 3.0
+_GROWING_FILE_TIMEOUT_US = 5_000_000
+_IMPORT_WINDOW_SECONDS = 30.0
+_IMPORT_DOWNLOAD_WAIT_SECONDS = 6 * 60 * 60
+_CANCELED_STATES = {"canceled", "cancelled", "deleted"}
+
+
+def _env_seconds(name: str, default: float) -> float:
+    raw = os.environ.get(name, "").strip()
+    if not raw:
+        return default
+    try:
+        value = float(raw)
+    except ValueError:
+        return default
+    return value if value > 0 else default
+
+
+class _PcmBuffer:
+    """Thread-safe PCM buffer addressed by absolute stream time."""
+
+    def __init__(self) -> None:
+        self._data = bytearray()
+        self._origin_bytes = 0
+        self._lock = threading.Lock()
+        self.eof = threading.Event()
+
+    def append(self, chunk: bytes) -> None:
+        with self._lock:
+            self._data.extend(chunk)
+
+    @property
+    def end_seconds(self) -> float:
+        with self._lock:
+            return (self._origin_bytes + len(self._data)) / _BYTES_PER_SECOND
+
+    @property
+    def origin_seconds(self) -> float:
+        with self._lock:
+            return self._origin_bytes / _BYTES_PER_SECOND
+
+    def slice(self, start: float, end: float) -> bytes:
+        with self._lock:
+            start_byte = max(0, _align(start) - self._origin_bytes)
+            end_byte = max(start_byte, _align(end) - self._origin_bytes)
+            return bytes(self._data[start_byte:end_byte])
+
+    def discard_before(self, seconds: float) -> None:
+        with self._lock:
+            drop = min(len(self._data), _align(seconds) - self._origin_bytes)
+            if drop > 0:
+                del self._data[:drop]
+                self._origin_bytes += drop
+
+
+def _align(seconds: float) -> int:
+    frames = int(max(0.0, seconds) * _SAMPLE_RATE)
+    return frames * _BYTES_PER_SAMPLE
+
+
+def _start_decoder(
+    source: str,
+    realtime: bool,
+    growing: bool,
+    http_headers: Optional[Dict[str, str]] = None,
+) -> subprocess.Popen:
+    cmd = [get_ffmpeg_path(), "-hide_banner", "-loglevel", "error"]
+    if realtime:
+        cmd.append("-re")
+    if growing:
+        # Keep reading at EOF while the file is still being written; stop after
+        # it has not grown for a few seconds.
+        cmd.extend(["-follow", "1", "-rw_timeout", str(_GROWING_FILE_TIMEOUT_US)])
+    if http_headers:
+        header_blob = "".join(f"{key}: {value}\r\n" for key, value in http_headers.items())
+        cmd.extend(["-headers", header_blob])
+    cmd.extend([
+        "-i",
+        source,
+        "-vn",
+        "-ac",
+        "1",
+        "-ar",
+        str(_SAMPLE_RATE),
+        "-f",
+        "s16le",
+        "-",
+    ])
+    logger.info("Starting stream decoder for %s", source if not http_headers else "remote stream")
+    return subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+
+
+def _pump_decoder(process: subprocess.Popen, buffer: _PcmBuffer, sink_path: Optional[Path] = None) -> None:
+    sink = None
+    try:
+        if sink_path is not None:
+            sink_path.parent.mkdir(parents=True, exist_ok=True)
+            sink = wave.open(str(sink_path), "wb")
+            sink.setnchannels(1)
+            sink.setsampwidth(_BYTES_PER_SAMPLE)
+            sink.setframerate(_SAMPLE_RATE)
+        while True:
+            chunk = process.stdout.read(_READ_CHUNK_BYTES) if process.stdout else b""
+            if not chunk:
+                break
+            buffer.append(chunk)
+            if sink is not None:
+                sink.writeframes(chunk)
+    except Exception as exc:
+        logger.warning("Stream decoder read failed: %s", exc)
+    finally:
+        if sink is not None:
+            with contextlib.suppress(Exception):
+                sink.close()
+        buffer.eof.set()
+
+
+def _write_window_wav(pcm: bytes, target: Path) -> None:
+    with wave.open(str(target), "wb") as handle:
+        handle.setnchannels(1)
+        handle.setsampwidth(_BYTES_PER_SAMPLE)
+        handle.setframerate(_SAMPLE_RATE)
+        handle.writeframes(pcm)
+
+
+def _is_canceled(job_id: str) -> bool:
+    try:
+        from native_job_queue import find_job
+
+        job, _ = find_job(job_id)
+        return job is not None and job.get_status() in _CANCELED_STATES
+    except Exception:
+        return False
+
+
+def _transcribe_window(
+    pcm: bytes,
+    offset: float,
+    *,
+    model_path: Optional[str],
+    language: Optional[str],
+    prompt: Optional[str],
+) -> Dict[str, Any]:
+    work_dir = Path(tempfile.mkdtemp(prefix="xcaption_live_"))
+    try:
+        window_path = work_dir / "window.wav"
+        _write_window_wav(pcm, window_path)
+        transcription = transcribe_whisper_cpp(
+            window_path,
+            model_path=model_path,
+            language=language,
+            output_dir=work_dir,
+            prompt=prompt,
+        )
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    segments = []
+    for segment in transcription.get("segments") or []:
+        text = str(segment.get("text", "")).strip()
+        if not text:
+            continue
+        segments.append({
+            "start": float(segment.get("start", 0.0)) + offset,
+            "end": float(segment.get("end", 0.0)) + offset,
+            "text": text,
+            "words": [],
+        })
+    return {"segments": segments, "language": transcription.get("language")}
+
+
+def _caption_stream(
+    job_id: str,
+    process: subprocess.Popen,
+    *,
+    model_path: Optional[str],
+    language: str,
+    chinese_style: Optional[str],
+    window_seconds: float,
+    step_seconds: float,
+    max_window_seconds: float,
+    skip_lag: bool,
+    stage: str,
+    realtime: bool = False,
+    expected_duration: Optional[float] = None,
+    sink_path: Optional[Path] = None,
+) -> Dict[str, Any]:
+    """Transcribe overlapping windows of *process* output until EOF or termination.
+
+    Segments that end at least ``_HOLDBACK_SECONDS`` before the decoded edge are
+    committed; the rest are re-decoded with the next window. With *skip_lag*
+    the oldest audio is dropped once transcription falls more than
+    *max_window_seconds* behind, otherwise windows are capped at that length
+    and processing catches up at its own pace.
+    """
+    def publish(progress: int, message: str, extra: Dict[str, Any]) -> None:
+        # Resolve at call time so the web server's patched publisher is used.
+        native_job_handlers.update_job_progress(job_id, progress, message, extra)
+
+    style_prompt = None
+    if native_job_handlers._should_apply_cantonese_prefix(language, chinese_style):
+        style_prompt = native_job_handlers._resolve_style_prompt(chinese_style)
+    window_language = language
+
+    buffer = _PcmBuffer()
+    reader = threading.Thread(target=_pump_decoder, args=(process, buffer, sink_path), daemon=True)
+    reader.start()
+
+    committed: List[Dict[str, Any]] = []
+    committed_until = 0.0
+    decoded_until = 0.0
+    started = time.time()
+    stopped = False
+    try:
+        while True:
+            if _is_canceled(job_id):
+                stopped = True
+                break
+
+            final = buffer.eof.is_set()
+            live_edge = buffer.end_seconds
+            if skip_lag and live_edge - committed_until > max_window_seconds:
+                skipped_to = live_edge - max_window_seconds
+                logger.warning(
+                    "Stream job %s is %.1fs behind; skipping to %.1fs",
+                    job_id,
+                    live_edge - committed_until,
+                    skipped_to,
+                )
+                committed_until = skipped_to
+
+            window_end = min(live_edge, committed_until + max_window_seconds)
+            final_window = final and window_end >= live_edge
+            if not final and window_end - decoded_until < step_seconds:
+                time.sleep(0.05)
+                continue
+            if window_end <= committed_until + _COMMIT_TOLERANCE_SECONDS:
+                if final:
+                    break
+                time.sleep(0.05)
+                continue
+
+            window_start = max(buffer.origin_seconds, min(committed_until, window_end - window_seconds))
+            window = _transcribe_window(
+                buffer.slice(window_start, window_end),
+                window_start,
+                model_path=model_path,
+                language=window_language,
+                prompt=style_prompt,
+            )
+            decoded_until = window_end
+            if window_language in {None, "", "auto"} and window.get("language"):
+                # Pin the language so consecutive windows stay consistent.
+                window_language = window["language"]
+
+            horizon = window_end if final_window else window_end - _HOLDBACK_SECONDS
+            stable: List[Dict[str, Any]] = []
+            partial: List[Dict[str, Any]] = []
+            for segment in window["segments"]:
+                midpoint = (segment["start"] + segment["end"]) / 2
+                if midpoint < committed_until - _COMMIT_TOLERANCE_SECONDS:
+                    continue
+                if segment["end"] <= horizon + _COMMIT_TOLERANCE_SECONDS and not partial:
+                    segment["start"] = max(segment["start"], committed_until)
+                    stable.append(segment)
+                else:
+                    partial.append(segment)
+            if not stable and partial and window_end < live_edge:
+                # The window is already capped at max_window_seconds, so a
+                # segment spanning the holdback would be re-decoded unchanged
+                # forever; commit it to force progress.
+                forced = partial.pop(0)
+                forced["start"] = max(forced["start"], committed_until)
+                stable.append(forced)
+
+            if stable:
+                committed_until = max(committed_until, max(seg["end"] for seg in stable))
+            else:
+                next_start = partial[0]["start"] if partial else horizon
+                committed_until = max(committed_until, min(horizon, next_start))
+            if final_window:
+                committed_until = max(committed_until, window_end)
+
+            new_segments = native_job_handlers._postprocess_caption_segments(
+                stable,
+                window_language or language,
+            )
+            for segment in new_segments:
+                segment["id"] = len(committed)
+                segment["originalText"] = segment["text"]
+                committed.append(segment)
+
+            progress = 50
+            if expected_duration:
+                progress = int(max(10, min(95, 10 + 85 * (committed_until / expected_duration))))
+            latency = time.time() - started - window_end if realtime else None
+            publish(
+                progress,
+                f"Transcribed {len(committed)} segments ({committed_until:.0f}s)",
+                {
+                    "stage": stage,
+                    "new_segments": new_segments,
+                    "partial_segments": [
+                        {"start": seg["start"], "end": seg["end"], "text": seg["text"]}
+                        for seg in partial
+                    ],
+                    "stream_position": round(committed_until, 2),
+                    "stream_segment_count": len(committed),
+                    "stream_latency": round(latency, 2) if latency is not None else None,
+                },
+            )
+
+            buffer.discard_before(min(committed_until, window_end - window_seconds))
+            if final_window:
+                break
+    finally:
+        if process.poll() is None:
+            with contextlib.suppress(Exception):
+                process.terminate()
+                process.wait(timeout=5)
+        with contextlib.suppress(Exception):
+            process.kill()
+        reader.join(timeout=5)
+
+    return {
+        "segments": committed,
+        "text": " ".join(seg.get("text", "") for seg in committed if seg.get("text")).strip(),
+        "language": window_language or language or "auto",
+        "transcription_time": round(time.time() - started, 2),
+        "audio_duration": round(decoded_until, 2),
+        "stopped": stopped,
+    }
+
+
+def process_live_caption_job(
+    job_id: str,
+    source: str,
+    model_path: str = "whisper",
+    language: str = "auto",
+    chinese_style: Optional[str] = None,
+    realtime: bool = False,
+    growing: bool = False,
+    window_seconds: Optional[float] = None,
+    step_seconds: Optional[float] = None,
+    display_name: Optional[str] = None,
+) -> Dict[str, Any]:
+    """Caption a streaming source until it ends or the job is terminated."""
+    window_seconds = window_seconds or _env_seconds(_WINDOW_ENV, _DEFAULT_WINDOW_SECONDS)
+    step_seconds = min(step_seconds or _env_seconds(_STEP_ENV, _DEFAULT_STEP_SECONDS), window_seconds)
+    max_lag_seconds = max(window_seconds, _env_seconds(_MAX_LAG_ENV, _DEFAULT_MAX_LAG_SECONDS))
+
+    native_job_handlers.update_job_progress(job_id, 0, "Connecting to live source...", {"stage": "live"})
+    process = _start_decoder(source, realtime, growing)
+    outcome = _caption_stream(
+        job_id,
+        process,
+        model_path=model_path,
+        language=language,
+        chinese_style=chinese_style,
+        window_seconds=window_seconds,
+        step_seconds=step_seconds,
+        max_window_seconds=max_lag_seconds,
+        skip_lag=True,
+        stage="live",
+        realtime=realtime,
+    )
+
+    result = {
+        "job_id": job_id,
+        "status": "completed",
+        "file_path": source,
+        "segments": outcome["segments"],
+        "text": outcome["text"],
+        "language": outcome["language"],
+        "transcription_time": outcome["transcription_time"],
+        "model": "Whisper.cpp (live)",
+        "segment_count": len(outcome["segments"]),
+        "audio_duration": outcome["audio_duration"],
+        "live": True,
+    }
+    try:
+        native_history.upsert_job_record({
+            "job_id": job_id,
+            "display_name": display_name or Path(source).stem or job_id,
+            "filename": Path(source).name or source,
+            "media_path": source if Path(source).exists() else None,
+            "media_kind": "audio",
+            "status": "completed",
+            "language": result["language"],
+            "summary": result["text"][:500],
+            "transcript_json": result,
+            "transcript_text": result["text"],
+            "segment_count": result["segment_count"],
+            "duration": result["audio_duration"],
+        })
+    except Exception as history_error:
+        logger.warning("Failed to store live job record %s: %s", job_id, history_error)
+
+    message = "Live captioning stopped" if outcome["stopped"] else "Live captioning finished"
+    native_job_handlers.update_job_progress(job_id, 100, message, {"result": result, "stage": "completed"})
+    return result
+
+
+def _wait_for_downloaded_media(job_id: str) -> Optional[str]:
+    """Block until the parallel download has attached a media file to *job_id*."""
+    deadline = time.time() + _IMPORT_DOWNLOAD_WAIT_SECONDS
+    while time.time() < deadline:
+        if _is_canceled(job_id):
+            return None
+        record = native_history.get_job_record(job_id)
+        if record:
+            media_path = record.get("media_path")
+            if media_path and Path(media_path).exists():
+                return str(media_path)
+            if (record.get("status") or "").lower() == "failed":
+                return None
+        time.sleep(1.0)
+    return None
+
+
+def process_url_import_job(
+    job_id: str,
+    url: str,
+    model_path: str = "whisper",
+    language: str = "auto",
+    chinese_style: Optional[str] = None,
+    conditioning: Optional[str] = None,
+    display_name: Optional[str] = None,
+) -> Dict[str, Any]:
+    """Transcribe a URL import from its audio stream while the media download runs in parallel.
+
+    FFmpeg pulls the audio stream resolved by yt-dlp, normalizes it and feeds
+    fixed-size windows to Whisper as data arrives; the normalized audio is kept
+    as ``<job_id>_normalized.wav`` for later range re-transcription. Sources
+    whose audio stream cannot be resolved fall back to transcribing the
+    downloaded file once it is ready.
+    """
+    reference_name = display_name or url
+    native_job_handlers.update_job_progress(job_id, 0, "Resolving audio stream...", {"stage": "transcription"})
+    try:
+        try:
+            stream = resolve_audio_stream(url)
+        except Exception as resolve_error:
+            logger.warning("Audio stream resolution failed for %s (%s); waiting for download.", url, resolve_error)
+            native_job_handlers.update_job_progress(
+                job_id, 2, "Waiting for download to finish...", {"stage": "transcription"}
+            )
+            media_path = _wait_for_downloaded_media(job_id)
+            if not media_path:
+                raise RuntimeError("Download did not complete; nothing to transcribe.")
+            return native_job_handlers.process_full_pipeline_job(
+                job_id=job_id,
+                file_path=media_path,
+                model_path=model_path,
+                language=language,
+                chinese_style=chinese_style,
+                conditioning=conditioning,
+                original_filename=Path(media_path).name,
+                media_path=media_path,
+                media_kind=native_job_handlers._media_kind_for(media_path),
+            )
+
+        source_info = stream.get("source") or {}
+        reference_name = display_name or source_info.get("title") or url
+        sink_path = get_uploads_dir() / native_job_handlers._normalized_audio_filename(job_id)
+        native_job_handlers.update_job_progress(
+            job_id, 5, "Transcribing while downloading...", {"stage": "transcription"}
+        )
+        process = _start_decoder(stream["url"], False, False, stream.get("http_headers"))
+        outcome = _caption_stream(
+            job_id,
+            process,
+            model_path=model_path,
+            language=language,
+            chinese_style=chinese_style,
+            window_seconds=_IMPORT_WINDOW_SECONDS,
+            step_seconds=_IMPORT_WINDOW_SECONDS - _HOLDBACK_SECONDS,
+            max_window_seconds=_IMPORT_WINDOW_SECONDS,
+            skip_lag=False,
+            stage="transcription",
+            expected_duration=stream.get("duration_sec"),
+            sink_path=sink_path,
+        )
+        if process.returncode not in (0, None) and not outcome["stopped"] and not outcome["segments"]:
+            raise RuntimeError("FFmpeg could not read the audio stream.")
+
+        result = {
+            "job_id": job_id,
+            "status": "completed",
+            "file_path": url,
+            "segments": outcome["segments"],
+            "text": outcome["text"],
+            "language": outcome["language"],
+            "transcription_time": outcome["transcription_time"],
+            "total_processing_time": outcome["transcription_time"],
+            "model": "Whisper.cpp (streamed)",
+            "segment_count": len(outcome["segments"]),
+            "audio_duration": outcome["audio_duration"],
+            "normalized_audio_path": str(sink_path),
+            "source": source_info,
+        }
+
+        # The parallel download attaches the playback file to the record when it
+        # finishes; leave media_path untouched here so it is never overwritten.
+        record = native_history.get_job_record(job_id) or {}
+        audio_info: Dict[str, Any] = {"name": reference_name, "path": record.get("media_path")}
+        native_job_handlers.update_job_progress(job_id, 100, "All processing completed", {
+            "result": result,
+            "stage": "pipeline",
+            "audio_file": audio_info,
+        })
+        try:
+            native_history.mark_completed(
+                job_id=job_id,
+                original_filename=reference_name,
+                message="All processing completed",
+                result=result,
+                output_dir=None,
+                audio_file=audio_info,
+                language=result.get("language"),
+            )
+        except Exception as history_error:
+            logger.warning("Failed to persist history for job %s: %s", job_id, history_error)
+        return result
+
+    except Exception as e:
+        logger.error("URL import job %s failed: %s", job_id, e)
+        native_job_handlers.update_job_progress(job_id, -1, f"Transcription failed: {str(e)}", {
+            "stage": "transcription",
+            "error": str(e),
+        })
+        try:
+            native_history.mark_failed(job_id=job_id, original_filename=reference_name, message=str(e))
+        except Exception as history_error:
+            logger.warning("Failed to record failed job %s in history: %s", job_id, history_error)
+        raise
@@ -0,0 +1,344 @@
+#!/usr/bin/env python3
+"""
+Compact binary encoding for stored transcripts.
+
+A transcript is packed as a struct of arrays: segment and word timings as
+int32 milliseconds, segment/word text as int32 indexes into a string table
+that is shared (and de-duplicated) across the whole document, and word
+probabilities as int32 ten-thousandths. Everything that does not fit those
+columns travels in a small JSON header, so any document round-trips; the
+whole payload is zlib-compressed.
+
+Timings are therefore kept to the millisecond and probabilities to four
+decimals. Segments or words whose values do not fit the columns (missing or
+non-numeric timings, non-string text, non-integer ids) are kept verbatim in
+the header instead.
+
+Decoding accepts both encoded blobs and legacy JSON text, so readers never
+need to know which format a row was written in.
+"""
+
+from __future__ import annotations
+
+import json
+import struct
+import sys
+import zlib
+from array import array
+from typing import Any, Dict, List, Optional, Tuple
+
+TRANSCRIPT_MAGIC = b"XCT1"
+WORDS_MAGIC = b"XCW1"
+_COMPRESSION_LEVEL = 6
+_MISSING = -(2 ** 31)
+_INT32_MAX = 2 ** 31 - 1
+_SEGMENT_KEYS = ("id", "start", "end", "text", "words")
+_WORD_KEYS = ("word", "start", "end", "probability")
+
+
+def is_encoded(value: Any) -> bool:
+    return isinstance(value, (bytes, bytearray, memoryview)) and bytes(value[:4]) in (TRANSCRIPT_MAGIC, WORDS_MAGIC)
+
+
+def _ms(value: Any) -> Optional[int]:
+    if isinstance(value, bool) or not isinstance(value, (int, float)):
+        return None
+    if value != value:  # NaN
+        return None
+    scaled = int(round(value * 1000))
+    return scaled if _MISSING < scaled <= _INT32_MAX else None
+
+
+def _seconds(value: int) -> float:
+    return value / 1000.0
+
+
+class _Strings:
+    __slots__ = ("values", "_lookup")
+
+    def __init__(self) -> None:
+        self.values: List[str] = []
+        self._lookup: Dict[str, int] = {}
+
+    def index(self, value: str) -> int:
+        position = self._lookup.get(value)
+        if position is None:
+            position = len(self.values)
+            self.values.append(value)
+            self._lookup[value] = position
+        return position
+
+
+def _int32(values: List[int]) -> bytes:
+    packed = array("i", values)
+    if sys.byteorder != "little":
+        packed.byteswap()
+    return packed.tobytes()
+
+
+def _read_int32(payload: bytes, offset: int, count: int) -> Tuple[List[int], int]:
+    packed = array("i")
+    end = offset + 4 * count
+    packed.frombytes(payload[offset:end])
+    if sys.byteorder != "little":
+        packed.byteswap()
+    return packed.tolist(), end
+
+
+class _WordColumns:
+    __slots__ = ("start", "end", "text", "probability", "raw", "extra")
+
+    def __init__(self) -> None:
+        self.start: List[int] = []
+        self.end: List[int] = []
+        self.text: List[int] = []
+        self.probability: List[int] = []
+        self.raw: Dict[str, Any] = {}
+        self.extra: Dict[str, Any] = {}
+
+    def add(self, word: Any, strings: _Strings) -> None:
+        position = len(self.start)
+        start = _ms(word.get("start")) if isinstance(word, dict) else None
+        end = _ms(word.get("end")) if isinstance(word, dict) else None
+        text = word.get("word") if isinstance(word, dict) else None
+        if start is None or end is None or not isinstance(text, str):
+            self.raw[str(position)] = word
+            self.start.append(0)
+            self.end.append(0)
+            self.text.append(0)
+            self.probability.append(_MISSING)
+            return
+        self.start.append(start)
+        self.end.append(end)
+        self.text.append(strings.index(text))
+        probability = word.get("probability", None)
+        extra = {key: value for key, value in word.items() if key not in _WORD_KEYS}
+        if "probability" not in word:
+            self.probability.append(_MISSING)
+        else:
+            scaled = _ms(probability * 10) if isinstance(probability, (int, float)) else None
+            if scaled is None or scaled == _MISSING or round(probability, 4) != probability:
+                self.probability.append(_MISSING)
+                extra["probability"] = probability
+            else:
+                self.probability.append(scaled)
+        if extra:
+            self.extra[str(position)] = extra
+
+    def pack(self) -> bytes:
+        return b"".join((_int32(self.start), _int32(self.end), _int32(self.text), _int32(self.probability)))
+
+    @staticmethod
+    def unpack(
+        payload: bytes,
+        offset: int,
+        count: int,
+        strings: List[str],
+        raw: Dict[str, Any],
+        extra: Dict[str, Any],
+    ) -> Tuple[List[Any], int]:
+        starts, offset = _read_int32(payload, offset, count)
+        ends, offset = _read_int32(payload, offset, count)
+        texts, offset = _read_int32(payload, offset, count)
+        probabilities, offset = _read_int32(payload, offset, count)
+        words: List[Any] = []
+        for position in range(count):
+            key = str(position)
+            if key in raw:
+                words.append(raw[key])
+                continue
+            word: Dict[str, Any] = {
+                "word": strings[texts[position]],
+                "start": _seconds(starts[position]),
+                "end": _seconds(ends[position]),
+            }
+            if probabilities[position] != _MISSING:
+                word["probability"] = probabilities[position] / 10000.0
+            if key in extra:
+                word.update(extra[key])
+            words.append(word)
+        return words, offset
+
+
+def _pack(header: Dict[str, Any], body: bytes, magic: bytes) -> bytes:
+    header_bytes = json.dumps(header, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+    payload = struct.pack("<I", len(header_bytes)) + header_bytes + body
+    return magic + zlib.compress(payload, _COMPRESSION_LEVEL)
+
+
+def _unpack(blob: Any) -> Tuple[bytes, Dict[str, Any], bytes, int]:
+    blob = bytes(blob)
+    payload = zlib.decompress(blob[4:])
+    (header_length,) = struct.unpack_from("<I", payload, 0)
+    header = json.loads(payload[4:4 + header_length].decode("utf-8"))
+    return blob[:4], header, payload, 4 + header_length
+
+
+def encode_words(words: List[Any]) -> bytes:
+    strings = _Strings()
+    columns = _WordColumns()
+    for word in words:
+        columns.add(word, strings)
+    header = {"n": len(columns.start), "strings": strings.values, "raw": columns.raw, "extra": columns.extra}
+    return _pack(header, columns.pack(), WORDS_MAGIC)
+
+
+def decode_words(blob: Any) -> List[Any]:
+    _, header, payload, offset = _unpack(blob)
+    words, _ = _WordColumns.unpack(
+        payload, offset, header["n"], header["strings"], header["raw"], header["extra"]
+    )
+    return words
+
+
+def encode_transcript(transcript: Dict[str, Any]) -> bytes:
+    """Pack a transcript document; see the module docstring for the layout."""
+    segments = transcript.get("segments")
+    doc = {key: value for key, value in transcript.items() if key != "segments"}
+    strings = _Strings()
+    ids: List[int] = []
+    starts: List[int] = []
+    ends: List[int] = []
+    texts: List[int] = []
+    word_counts: List[int] = []
+    raw: Dict[str, Any] = {}
+    extra: Dict[str, Any] = {}
+    words = _WordColumns()
+
+    for position, segment in enumerate(segments if isinstance(segments, list) else []):
+        key = str(position)
+        seg_id = segment.get("id") if isinstance(segment, dict) else None
+        start = _ms(segment.get("start")) if isinstance(segment, dict) else None
+        end = _ms(segment.get("end")) if isinstance(segment, dict) else None
+        text = segment.get("text") if isinstance(segment, dict) else None
+        segment_words = segment.get("words", []) if isinstance(segment, dict) else None
+        if (
+            isinstance(seg_id, bool)
+            or not isinstance(seg_id, int)
+            or not _MISSING < seg_id <= _INT32_MAX
+            or start is None
+            or end is None
+            or not isinstance(text, str)
+            or not isinstance(segment_words, (list, type(None)))
+        ):
+            raw[key] = segment
+            ids.append(0)
+            starts.append(0)
+            ends.append(0)
+            texts.append(0)
+            word_counts.append(0)
+            continue
+        ids.append(seg_id)
+        starts.append(start)
+        ends.append(end)
+        texts.append(strings.index(text))
+        if segment_words is None:
+            word_counts.append(-1)
+        else:
+            word_counts.append(len(segment_words))
+            for word in segment_words:
+                words.add(word, strings)
+        segment_extra = {name: value for name, value in segment.items() if name not in _SEGMENT_KEYS}
+        if "words" not in segment:
+            segment_extra["__no_words__"] = True
+        if segment_extra:
+            extra[key] = segment_extra
+
+    # The document text is normally the segment texts joined; rebuild it on
+    # decode instead of storing every caption twice.
+    joined = " ".join(strings.values[index] for index in texts if strings.values[index]).strip() if not raw else None
+    text_joined = joined is not None and "text" in doc and doc["text"] == joined
+    if text_joined:
+        del doc["text"]
+
+    header = {
+        "doc": doc,
+        "text_joined": text_joined,
+        "has_segments": isinstance(segments, list),
+        "segments_value": None if isinstance(segments, list) else segments,
+        "doc_keys": ["segments"] if "segments" in transcript else [],
+        "n": len(ids),
+        "nw": len(words.start),
+        "strings": strings.values,
+        "raw": raw,
+        "extra": extra,
+        "word_raw": words.raw,
+        "word_extra": words.extra,
+    }
+    body = b"".join(
+        (_int32(ids), _int32(starts), _int32(ends), _int32(texts), _int32(word_counts), words.pack())
+    )
+    return _pack(header, body, TRANSCRIPT_MAGIC)
+
+
+def decode_transcript(blob: Any) -> Dict[str, Any]:
+    _, header, payload, offset = _unpack(blob)
+    count = header["n"]
+    strings = header["strings"]
+    ids, offset = _read_int32(payload, offset, count)
+    starts, offset = _read_int32(payload, offset, count)
+    ends, offset = _read_int32(payload, offset, count)
+    texts, offset = _read_int32(payload, offset, count)
+    word_counts, offset = _read_int32(payload, offset, count)
+    all_words, _ = _WordColumns.unpack(
+        payload, offset, header["nw"], strings, header["word_raw"], header["word_extra"]
+    )
+
+    transcript = dict(header["doc"])
+    if not header["has_segments"]:
+        if "segments" in header["doc_keys"]:
+            transcript["segments"] = header["segments_value"]
+        return transcript
+
+    raw = header["raw"]
+    extra = header["extra"]
+    segments: List[Any] = []
+    word_offset = 0
+    for position in range(count):
+        key = str(position)
+        if key in raw:
+            segments.append(raw[key])
+            continue
+        segment: Dict[str, Any] = {
+            "id": ids[position],
+            "start": _seconds(starts[position]),
+            "end": _seconds(ends[position]),
+            "text": strings[texts[position]],
+        }
+        word_count = word_counts[position]
+        if word_count >= 0:
+            segment["words"] = all_words[word_offset:word_offset + word_count]
+            word_offset += word_count
+        else:
+            segment["words"] = None
+        segment_extra = extra.get(key)
+        if segment_extra:
+            segment_extra = dict(segment_extra)
+            if segment_extra.pop("__no_words__", False):
+                segment.pop("words", None)
+            segment.update(segment_extra)
+        segments.append(segment)
+    transcript["segments"] = segments
+    if header["text_joined"]:
+        transcript["text"] = " ".join(strings[index] for index in texts if strings[index]).strip()
+    return transcript
+
+
+def encode_value(value: Any) -> Any:
+    """Encode a stored result: transcripts are packed, anything else stays JSON text."""
+    if isinstance(value, dict) and isinstance(value.get("segments"), list):
+        return encode_transcript(value)
+    return json.dumps(value)
+
+
+def decode_value(value: Any) -> Any:
+    """Decode a value written by :func:`encode_value` or as plain JSON text."""
+    if value is None:
+        return None
+    if is_encoded(value):
+        if bytes(value[:4]) == WORDS_MAGIC:
+            return decode_words(value)
+        return decode_transcript(value)
+    if isinstance(value, (bytes, bytearray, memoryview)):
+        value = bytes(value).decode("utf-8")
+    return json.loads(value)
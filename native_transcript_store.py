@@ -0,0 +1,1269 @@
+#!/usr/bin/env python3
+"""
+Transcript storage for the jobs database.
+
+Each job's transcript is kept twice: ``transcript_segments`` holds one row per
+segment and is what segment edits touch, while ``job_transcripts`` keeps the
+full document for readers, packed by native_transcript_codec into
+``transcript_blob`` (rows from older versions may still hold JSON text in
+``transcript_json`` until they are compacted). A segment edit only marks that
+document stale; it is rebuilt from the rows the next time someone reads it.
+
+Segment edits are also appended to ``transcript_ops`` with the segment's
+state before and after, under a per-job revision number that only grows.
+Undo and redo replay those states (and are journaled themselves), so they
+touch only the segments of one edit. The journal keeps roughly the last
+``JOURNAL_LIMIT`` revisions, trimmed by whole transactions after each one
+completes (the newest transaction is always kept, however large);
+``journal_base`` records the newest revision that is no longer available,
+and a full rewrite of the transcript starts a new journal.
+
+``segment_search`` is an FTS5 index over the segment rows (keyed by their
+rowid) and is kept in step with every write below. The unicode61 tokenizer
+treats a run of Han characters as one token, so CJK characters are spaced
+apart before indexing and querying; a query then matches as a phrase of
+single characters, which works for names of any length.
+
+Functions here take an open connection and never commit; callers in
+native_history own connections and transactions.
+"""
+
+from __future__ import annotations
+
+import json
+import logging
+import re
+import sqlite3
+import time
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+import native_transcript_codec
+
+logger = logging.getLogger(__name__)
+
+TRANSCRIPT_PREVIEW_CHARS = 500
+SEARCH_SNIPPET_CHARS = 40
+JOURNAL_LIMIT = 500
+_JOURNAL_COMPACT_EVERY = 50
+_SEGMENT_COLUMN_KEYS = ("id", "start", "end", "text", "words")
+
+_CJK_RE = re.compile(
+    "[\u3040-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uac00-\ud7af\uf900-\ufaff\U00020000-\U0003134f]"
+)
+_search_available: Optional[bool] = None
+
+
+class SegmentExistsError(ValueError):
+    """An added segment carries the id of a segment that already exists."""
+
+
+def ensure_tables(conn: sqlite3.Connection) -> None:
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS job_transcripts (
+            job_id TEXT PRIMARY KEY,
+            transcript_json TEXT,
+            transcript_text TEXT,
+            updated_at REAL
+        )
+        """
+    )
+    existing = {row[1] for row in conn.execute("PRAGMA table_info(job_transcripts)").fetchall()}
+    for name, col_type in (
+        ("segments_synced", "INTEGER DEFAULT 0"),
+        ("stale", "INTEGER DEFAULT 0"),
+        ("transcript_blob", "BLOB"),
+        ("revision", "INTEGER DEFAULT 0"),
+        ("journal_base", "INTEGER DEFAULT 0"),
+    ):
+        if name not in existing:
+            try:
+                conn.execute(f"ALTER TABLE job_transcripts ADD COLUMN {name} {col_type}")
+            except sqlite3.OperationalError as exc:
+                if "duplicate column name" not in str(exc).lower():
+                    raise
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS transcript_segments (
+            job_id TEXT NOT NULL,
+            seg_id INTEGER NOT NULL,
+            start_time REAL,
+            end_time REAL,
+            text TEXT,
+            words TEXT,
+            extra TEXT,
+            PRIMARY KEY (job_id, seg_id)
+        )
+        """
+    )
+    conn.execute(
+        """
+        CREATE INDEX IF NOT EXISTS idx_transcript_segments_start
+        ON transcript_segments(job_id, start_time)
+        """
+    )
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS transcript_ops (
+            job_id TEXT NOT NULL,
+            rev INTEGER NOT NULL,
+            txn INTEGER NOT NULL,
+            kind TEXT NOT NULL,
+            op TEXT NOT NULL,
+            seg_id INTEGER,
+            before TEXT,
+            after TEXT,
+            undone INTEGER DEFAULT 0,
+            created_at REAL,
+            PRIMARY KEY (job_id, rev)
+        )
+        """
+    )
+    _ensure_search_table(conn)
+
+
+def _ensure_search_table(conn: sqlite3.Connection) -> None:
+    global _search_available
+    if _search_available is False:
+        return
+    conn.create_function("xcaption_search_text", 1, search_text, deterministic=True)
+    exists = conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'segment_search'"
+    ).fetchone()
+    if exists:
+        _search_available = True
+        return
+    try:
+        conn.execute(
+            "CREATE VIRTUAL TABLE segment_search USING fts5(body, tokenize='unicode61 remove_diacritics 2')"
+        )
+    except sqlite3.OperationalError as exc:
+        logger.warning("Transcript search disabled (FTS5 unavailable): %s", exc)
+        _search_available = False
+        return
+    _search_available = True
+    conn.execute(
+        """
+        INSERT INTO segment_search (rowid, body)
+        SELECT rowid, xcaption_search_text(text) FROM transcript_segments
+        """
+    )
+
+
+def search_available() -> bool:
+    return bool(_search_available)
+
+
+def search_text(text: Optional[str]) -> str:
+    """Space out CJK characters so the unicode61 tokenizer indexes each one."""
+    if not text:
+        return ""
+    return _CJK_RE.sub(lambda match: f" {match.group(0)} ", str(text))
+
+
+def _index_segments(conn: sqlite3.Connection, job_id: str, seg_id: Optional[int] = None) -> None:
+    if not _search_available:
+        return
+    where, params = ("job_id = ?", (job_id,)) if seg_id is None else ("job_id = ? AND seg_id = ?", (job_id, seg_id))
+    conn.execute(
+        f"""
+        INSERT INTO segment_search (rowid, body)
+        SELECT rowid, xcaption_search_text(text) FROM transcript_segments WHERE {where}
+        """,
+        params,
+    )
+
+
+def _unindex_segments(conn: sqlite3.Connection, job_id: str, seg_id: Optional[int] = None) -> None:
+    if not _search_available:
+        return
+    where, params = ("job_id = ?", (job_id,)) if seg_id is None else ("job_id = ? AND seg_id = ?", (job_id, seg_id))
+    conn.execute(
+        f"DELETE FROM segment_search WHERE rowid IN (SELECT rowid FROM transcript_segments WHERE {where})",
+        params,
+    )
+
+
+def transcript_preview(text: Optional[str]) -> Optional[str]:
+    if not text:
+        return None
+    return str(text)[:TRANSCRIPT_PREVIEW_CHARS]
+
+
+def join_segment_text(segments: Iterable[Dict[str, Any]]) -> str:
+    return " ".join([seg.get("text", "") for seg in segments if seg.get("text")]).strip()
+
+
+def _as_float(value: Any) -> float:
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return 0.0
+
+
+def _encode_words(words: Any) -> Any:
+    if words is None:
+        return None
+    if isinstance(words, list) and words:
+        return native_transcript_codec.encode_words(words)
+    return json.dumps(words, ensure_ascii=False)
+
+
+def _segment_row(job_id: str, seg_id: int, segment: Dict[str, Any]) -> Tuple[Any, ...]:
+    extra = {key: value for key, value in segment.items() if key not in _SEGMENT_COLUMN_KEYS}
+    return (
+        job_id,
+        seg_id,
+        _as_float(segment.get("start")),
+        _as_float(segment.get("end")),
+        "" if segment.get("text") is None else str(segment.get("text")),
+        _encode_words(segment.get("words")),
+        json.dumps(extra, ensure_ascii=False) if extra else None,
+    )
+
+
+def _row_segment(row: Tuple[Any, ...]) -> Dict[str, Any]:
+    seg_id, start, end, text, words, extra = row
+    segment: Dict[str, Any] = {"id": seg_id, "start": start, "end": end, "text": text}
+    if words is not None:
+        segment["words"] = native_transcript_codec.decode_value(words)
+    if extra:
+        segment.update(json.loads(extra))
+    return segment
+
+
+def replace_segments(conn: sqlite3.Connection, job_id: str, segments: Any) -> None:
+    """Rewrite all segment rows of a job from a full segment list."""
+    _unindex_segments(conn, job_id)
+    conn.execute("DELETE FROM transcript_segments WHERE job_id = ?", (job_id,))
+    if not isinstance(segments, list):
+        conn.execute("UPDATE job_transcripts SET segments_synced = 0 WHERE job_id = ?", (job_id,))
+        return
+    rows = []
+    seen: set = set()
+    max_id = -1
+    for segment in segments:
+        if not isinstance(segment, dict):
+            continue
+        try:
+            seg_id = int(segment.get("id"))
+        except (TypeError, ValueError):
+            seg_id = None
+        if seg_id is None or seg_id in seen:
+            # Ids must be unique per job; give strays a fresh one past the max.
+            seg_id = max_id + 1
+        seen.add(seg_id)
+        max_id = max(max_id, seg_id)
+        rows.append(_segment_row(job_id, seg_id, segment))
+    conn.executemany(
+        """
+        INSERT INTO transcript_segments (job_id, seg_id, start_time, end_time, text, words, extra)
+        VALUES (?, ?, ?, ?, ?, ?, ?)
+        """,
+        rows,
+    )
+    _index_segments(conn, job_id)
+    conn.execute("UPDATE job_transcripts SET segments_synced = 1 WHERE job_id = ?", (job_id,))
+
+
+def _encode_document(transcript: Any) -> Tuple[Optional[str], Optional[bytes]]:
+    """Return the ``(transcript_json, transcript_blob)`` column values for a document."""
+    if isinstance(transcript, dict):
+        return None, native_transcript_codec.encode_transcript(transcript)
+    if transcript is None:
+        return None, None
+    return json.dumps(transcript, ensure_ascii=False), None
+
+
+def _decode_document(transcript_json: Optional[str], transcript_blob: Any) -> Optional[Dict[str, Any]]:
+    try:
+        if transcript_blob is not None:
+            transcript = native_transcript_codec.decode_transcript(transcript_blob)
+        elif transcript_json:
+            transcript = json.loads(transcript_json)
+        else:
+            return None
+    except Exception as exc:
+        logger.warning("Failed to decode stored transcript: %s", exc)
+        return None
+    return transcript if isinstance(transcript, dict) else None
+
+
+def write_transcript(
+    conn: sqlite3.Connection,
+    job_id: str,
+    transcript: Any,
+    transcript_text: Optional[str],
+    updated_at: float,
+) -> None:
+    """Store a full transcript document and its segment rows."""
+    transcript_json, transcript_blob = _encode_document(transcript)
+    conn.execute(
+        """
+        INSERT INTO job_transcripts (job_id, transcript_json, transcript_blob, transcript_text, updated_at, stale)
+        VALUES (?, ?, ?, ?, ?, 0)
+        ON CONFLICT(job_id) DO UPDATE SET
+            transcript_json=excluded.transcript_json,
+            transcript_blob=excluded.transcript_blob,
+            transcript_text=excluded.transcript_text,
+            updated_at=excluded.updated_at,
+            stale=0,
+            revision=revision + 1,
+            journal_base=revision + 1
+        """,
+        (job_id, transcript_json, transcript_blob, transcript_text, updated_at),
+    )
+    # The journal describes edits to the previous document; it cannot be replayed over this one.
+    conn.execute("DELETE FROM transcript_ops WHERE job_id = ?", (job_id,))
+    replace_segments(conn, job_id, transcript.get("segments") if isinstance(transcript, dict) else None)
+
+
+def write_transcript_text(conn: sqlite3.Connection, job_id: str, transcript_text: Optional[str], updated_at: float) -> None:
+    conn.execute(
+        """
+        INSERT INTO job_transcripts (job_id, transcript_text, updated_at)
+        VALUES (?, ?, ?)
+        ON CONFLICT(job_id) DO UPDATE SET
+            transcript_text=excluded.transcript_text,
+            updated_at=excluded.updated_at
+        """,
+        (job_id, transcript_text, updated_at),
+    )
+
+
+def unsynced_jobs(conn: sqlite3.Connection, limit: int) -> List[str]:
+    rows = conn.execute(
+        """
+        SELECT job_id FROM job_transcripts
+        WHERE segments_synced = 0 AND (transcript_json IS NOT NULL OR transcript_blob IS NOT NULL)
+        LIMIT ?
+        """,
+        (limit,),
+    ).fetchall()
+    return [row[0] for row in rows]
+
+
+def sync_segments(conn: sqlite3.Connection, job_id: str) -> bool:
+    """Make sure segment rows exist for a job; False when it has no transcript."""
+    row = conn.execute(
+        "SELECT transcript_json, transcript_blob, segments_synced FROM job_transcripts WHERE job_id = ?",
+        (job_id,),
+    ).fetchone()
+    if not row or (not row[0] and row[1] is None):
+        return False
+    if row[2]:
+        return True
+    transcript = _decode_document(row[0], row[1])
+    if transcript is None:
+        conn.execute("UPDATE job_transcripts SET segments_synced = 1 WHERE job_id = ?", (job_id,))
+        return False
+    segments = transcript.get("segments")
+    replace_segments(conn, job_id, segments if isinstance(segments, list) else [])
+    return True
+
+
+def load_segments(conn: sqlite3.Connection, job_id: str) -> List[Dict[str, Any]]:
+    rows = conn.execute(
+        """
+        SELECT seg_id, start_time, end_time, text, words, extra
+        FROM transcript_segments
+        WHERE job_id = ?
+        ORDER BY start_time, seg_id
+        """,
+        (job_id,),
+    ).fetchall()
+    return [_row_segment(row) for row in rows]
+
+
+def load_transcript(conn: sqlite3.Connection, job_id: str) -> Tuple[Optional[Dict[str, Any]], Optional[str]]:
+    """Return ``(transcript, transcript_text)``, rebuilding the document first if edits made it stale."""
+    row = conn.execute(
+        "SELECT transcript_json, transcript_blob, transcript_text, stale FROM job_transcripts WHERE job_id = ?",
+        (job_id,),
+    ).fetchone()
+    if not row:
+        return None, None
+    transcript_json, transcript_blob, transcript_text, stale = row
+    transcript = _decode_document(transcript_json, transcript_blob)
+    if not stale or (not transcript_json and transcript_blob is None):
+        return transcript, transcript_text
+    if transcript is None:
+        transcript = {}
+    segments = load_segments(conn, job_id)
+    transcript["segments"] = segments
+    transcript_text = join_segment_text(segments)
+    transcript["text"] = transcript_text
+    conn.execute(
+        """
+        UPDATE job_transcripts
+        SET transcript_json = NULL, transcript_blob = ?, transcript_text = ?, stale = 0
+        WHERE job_id = ?
+        """,
+        (native_transcript_codec.encode_transcript(transcript), transcript_text, job_id),
+    )
+    conn.execute(
+        """
+        UPDATE job_records SET transcript_preview = ?1, changed_at = ?2
+        WHERE job_id = ?3 AND transcript_preview IS NOT ?1
+        """,
+        (transcript_preview(transcript_text), time.time(), job_id),
+    )
+    return transcript, transcript_text
+
+
+def compact_transcripts(conn: sqlite3.Connection, after: str, limit: int) -> Optional[str]:
+    """Pack up to *limit* JSON-text documents after job id *after*; returns the last id seen, None when done."""
+    rows = conn.execute(
+        """
+        SELECT job_id, transcript_json FROM job_transcripts
+        WHERE job_id > ? AND transcript_json IS NOT NULL
+        ORDER BY job_id
+        LIMIT ?
+        """,
+        (after, limit),
+    ).fetchall()
+    for job_id, transcript_json in rows:
+        transcript = _decode_document(transcript_json, None)
+        if transcript is None:
+            continue
+        conn.execute(
+            "UPDATE job_transcripts SET transcript_json = NULL, transcript_blob = ? WHERE job_id = ?",
+            (native_transcript_codec.encode_transcript(transcript), job_id),
+        )
+    return rows[-1][0] if rows else None
+
+
+def compact_segment_words(conn: sqlite3.Connection, after: int, limit: int) -> Optional[int]:
+    """Pack up to *limit* JSON-text word lists after segment rowid *after*; returns the last rowid, None when done."""
+    rows = conn.execute(
+        """
+        SELECT rowid, words FROM transcript_segments
+        WHERE rowid > ? AND typeof(words) = 'text' AND words != '[]'
+        ORDER BY rowid
+        LIMIT ?
+        """,
+        (after, limit),
+    ).fetchall()
+    for rowid, words in rows:
+        try:
+            decoded = json.loads(words)
+        except Exception:
+            continue
+        conn.execute("UPDATE transcript_segments SET words = ? WHERE rowid = ?", (_encode_words(decoded), rowid))
+    return rows[-1][0] if rows else None
+
+
+def _touch(conn: sqlite3.Connection, job_id: str) -> float:
+    """Finish a segment change: mark the document stale, bump the record and trim the journal."""
+    now = time.time()
+    conn.execute("UPDATE job_transcripts SET stale = 1, updated_at = ? WHERE job_id = ?", (now, job_id))
+    conn.execute(
+        """
+        UPDATE job_records
+        SET updated_at = ?1, sort_key = ?1, changed_at = ?1, status = 'completed',
+            segment_count = (SELECT COUNT(*) FROM transcript_segments WHERE job_id = ?2)
+        WHERE job_id = ?2
+        """,
+        (now, job_id),
+    )
+    _compact_journal(conn, job_id)
+    return now
+
+
+def get_segment(conn: sqlite3.Connection, job_id: str, seg_id: int) -> Optional[Dict[str, Any]]:
+    row = conn.execute(
+        """
+        SELECT seg_id, start_time, end_time, text, words, extra
+        FROM transcript_segments
+        WHERE job_id = ? AND seg_id = ?
+        """,
+        (job_id, seg_id),
+    ).fetchone()
+    return _row_segment(row) if row else None
+
+
+def _put_segment(
+    conn: sqlite3.Connection,
+    job_id: str,
+    seg_id: int,
+    segment: Optional[Dict[str, Any]],
+    replace: bool = True,
+) -> None:
+    """Write *segment* as the row for *seg_id*, or remove the row when it is None.
+
+    With *replace* False the row must not exist yet (sqlite3.IntegrityError otherwise).
+    """
+    _unindex_segments(conn, job_id, seg_id)
+    if segment is None:
+        conn.execute("DELETE FROM transcript_segments WHERE job_id = ? AND seg_id = ?", (job_id, seg_id))
+        return
+    verb = "INSERT OR REPLACE" if replace else "INSERT"
+    conn.execute(
+        f"""
+        {verb} INTO transcript_segments (job_id, seg_id, start_time, end_time, text, words, extra)
+        VALUES (?, ?, ?, ?, ?, ?, ?)
+        """,
+        _segment_row(job_id, seg_id, segment),
+    )
+    _index_segments(conn, job_id, seg_id)
+
+
+def current_revision(conn: sqlite3.Connection, job_id: str) -> int:
+    row = conn.execute("SELECT revision FROM job_transcripts WHERE job_id = ?", (job_id,)).fetchone()
+    return int(row[0] or 0) if row else 0
+
+
+def _op_type(before: Optional[Dict[str, Any]], after: Optional[Dict[str, Any]]) -> str:
+    if before is None:
+        return "insert"
+    if after is None:
+        return "delete"
+    return "update"
+
+
+def _dump_state(segment: Optional[Dict[str, Any]]) -> Optional[str]:
+    return json.dumps(segment, ensure_ascii=False) if segment is not None else None
+
+
+def _load_state(value: Optional[str]) -> Optional[Dict[str, Any]]:
+    return json.loads(value) if value else None
+
+
+def _record_op(
+    conn: sqlite3.Connection,
+    job_id: str,
+    seg_id: int,
+    before: Optional[Dict[str, Any]],
+    after: Optional[Dict[str, Any]],
+    *,
+    kind: str = "edit",
+    txn: Optional[int] = None,
+) -> int:
+    """Append one journal entry and return its revision; *txn* groups entries undone together."""
+    rev = current_revision(conn, job_id) + 1
+    if kind == "edit":
+        # A new edit ends the redo chain.
+        conn.execute("UPDATE transcript_ops SET undone = 2 WHERE job_id = ? AND undone = 1", (job_id,))
+    conn.execute(
+        """
+        INSERT INTO transcript_ops (job_id, rev, txn, kind, op, seg_id, before, after, created_at)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+        """,
+        (
+            job_id,
+            rev,
+            txn if txn is not None else rev,
+            kind,
+            _op_type(before, after),
+            seg_id,
+            _dump_state(before),
+            _dump_state(after),
+            time.time(),
+        ),
+    )
+    conn.execute("UPDATE job_transcripts SET revision = ? WHERE job_id = ?", (rev, job_id))
+    return rev
+
+
+def _compact_journal(conn: sqlite3.Connection, job_id: str) -> None:
+    """Trim the journal to about ``JOURNAL_LIMIT`` revisions once a transaction is complete.
+
+    Whole transactions only, so an undo never finds half an edit. The newest
+    transaction and any edit that can still be redone are always kept, so a
+    single edit touching more than ``JOURNAL_LIMIT`` segments stays undoable.
+    """
+    revision, journal_base = conn.execute(
+        "SELECT COALESCE(revision, 0), COALESCE(journal_base, 0) FROM job_transcripts WHERE job_id = ?",
+        (job_id,),
+    ).fetchone()
+    if revision - journal_base <= JOURNAL_LIMIT + _JOURNAL_COMPACT_EVERY:
+        return
+    newest_txn, oldest_redo = conn.execute(
+        """
+        SELECT MAX(txn), (SELECT MIN(txn) FROM transcript_ops WHERE job_id = ? AND kind = 'edit' AND undone = 1)
+        FROM transcript_ops WHERE job_id = ?
+        """,
+        (job_id, job_id),
+    ).fetchone()
+    cutoff = revision - JOURNAL_LIMIT
+    if newest_txn is not None:
+        cutoff = min(cutoff, newest_txn - 1)
+    if oldest_redo is not None:
+        cutoff = min(cutoff, oldest_redo - 1)
+    conn.execute("DELETE FROM transcript_ops WHERE job_id = ? AND txn <= ?", (job_id, cutoff))
+    row = conn.execute("SELECT MIN(rev) FROM transcript_ops WHERE job_id = ?", (job_id,)).fetchone()
+    base = (row[0] - 1) if row and row[0] is not None else current_revision(conn, job_id)
+    conn.execute("UPDATE job_transcripts SET journal_base = MAX(journal_base, ?) WHERE job_id = ?", (base, job_id))
+
+
+def _next_segment_id(conn: sqlite3.Connection, job_id: str) -> int:
+    row = conn.execute(
+        "SELECT COALESCE(MAX(seg_id), 0) FROM transcript_segments WHERE job_id = ?",
+        (job_id,),
+    ).fetchone()
+    return int(row[0]) + 1
+
+
+def _apply_update(
+    conn: sqlite3.Connection,
+    job_id: str,
+    seg_id: int,
+    changes: Dict[str, Any],
+    txn: Optional[int],
+) -> Optional[Dict[str, Any]]:
+    before = get_segment(conn, job_id, seg_id)
+    if before is None:
+        return None
+    segment = dict(before)
+    segment.update(changes)
+    segment["id"] = seg_id
+    _put_segment(conn, job_id, seg_id, segment)
+    _record_op(conn, job_id, seg_id, before, segment, txn=txn)
+    return segment
+
+
+def _apply_insert(
+    conn: sqlite3.Connection,
+    job_id: str,
+    segment: Dict[str, Any],
+    txn: Optional[int],
+) -> Dict[str, Any]:
+    segment = dict(segment)
+    if segment.get("id") is None:
+        segment["id"] = _next_segment_id(conn, job_id)
+    seg_id = int(segment["id"])
+    segment["id"] = seg_id
+    if get_segment(conn, job_id, seg_id) is not None:
+        raise SegmentExistsError(f"segment {seg_id} already exists")
+    _put_segment(conn, job_id, seg_id, segment, replace=False)
+    _record_op(conn, job_id, seg_id, None, segment, txn=txn)
+    return segment
+
+
+def _apply_delete(conn: sqlite3.Connection, job_id: str, seg_id: int, txn: Optional[int]) -> bool:
+    before = get_segment(conn, job_id, seg_id)
+    if before is None:
+        return False
+    _put_segment(conn, job_id, seg_id, None)
+    _record_op(conn, job_id, seg_id, before, None, txn=txn)
+    return True
+
+
+def update_segment(
+    conn: sqlite3.Connection,
+    job_id: str,
+    seg_id: int,
+    changes: Dict[str, Any],
+) -> Optional[Dict[str, Any]]:
+    """Apply *changes* to one segment row; raises LookupError without a transcript."""
+    if not sync_segments(conn, job_id):
+        raise LookupError(job_id)
+    segment = _apply_update(conn, job_id, seg_id, changes, None)
+    if segment is not None:
+        _touch(conn, job_id)
+    return segment
+
+
+def insert_segment(conn: sqlite3.Connection, job_id: str, segment: Dict[str, Any]) -> Dict[str, Any]:
+    """Insert one segment, assigning the next id when it has none.
+
+    Raises SegmentExistsError when its id is already taken.
+    """
+    if not sync_segments(conn, job_id):
+        raise LookupError(job_id)
+    segment = _apply_insert(conn, job_id, segment, None)
+    _touch(conn, job_id)
+    return segment
+
+
+def delete_segment(conn: sqlite3.Connection, job_id: str, seg_id: int) -> bool:
+    if not sync_segments(conn, job_id):
+        raise LookupError(job_id)
+    if not _apply_delete(conn, job_id, seg_id, None):
+        return False
+    _touch(conn, job_id)
+    return True
+
+
+BATCH_OPERATIONS = ("edit", "timing", "add", "delete", "shift_range", "merge", "split")
+
+
+def _batch_number(operation: Dict[str, Any], key: str, position: int, required: bool = True) -> Optional[float]:
+    value = operation.get(key)
+    if value is None:
+        if required:
+            raise ValueError(f"operation {position}: {key} is required")
+        return None
+    if isinstance(value, bool):
+        raise ValueError(f"operation {position}: {key} must be a number")
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        raise ValueError(f"operation {position}: {key} must be a number") from None
+
+
+def _batch_segment_id(value: Any, position: int, key: str = "segment_id") -> int:
+    if value is None or isinstance(value, bool):
+        raise ValueError(f"operation {position}: {key} is required")
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        raise ValueError(f"operation {position}: {key} must be a number") from None
+
+
+def validate_batch(operations: Any) -> List[Dict[str, Any]]:
+    """Check the shape of a batch and return it normalized; raises ValueError naming the bad operation."""
+    if not isinstance(operations, list) or not operations:
+        raise ValueError("operations must be a non-empty list")
+    normalized: List[Dict[str, Any]] = []
+    for position, operation in enumerate(operations):
+        if not isinstance(operation, dict):
+            raise ValueError(f"operation {position}: must be an object")
+        name = str(operation.get("op") or "").replace("-", "_")
+        if name not in BATCH_OPERATIONS:
+            raise ValueError(f"operation {position}: unknown op {operation.get('op')!r}")
+        item: Dict[str, Any] = {"op": name}
+        if name in ("edit", "timing", "delete", "split"):
+            item["segment_id"] = _batch_segment_id(operation.get("segment_id"), position)
+        if name == "edit":
+            text = operation.get("text", operation.get("new_text"))
+            if not isinstance(text, str) or not text:
+                raise ValueError(f"operation {position}: text is required")
+            item["text"] = text
+        elif name in ("timing", "add"):
+            item["start"] = _batch_number(operation, "start", position)
+            item["end"] = _batch_number(operation, "end", position)
+            if item["end"] <= item["start"]:
+                raise ValueError(f"operation {position}: end must be greater than start")
+            if name == "add":
+                text = operation.get("text")
+                if text is not None and not isinstance(text, str):
+                    raise ValueError(f"operation {position}: text must be a string")
+                item["text"] = text or "New Caption"
+                if operation.get("segment_id") is not None:
+                    item["segment_id"] = _batch_segment_id(operation.get("segment_id"), position)
+        elif name == "shift_range":
+            item["delta"] = _batch_number(operation, "delta", position)
+            item["start"] = _batch_number(operation, "start", position, required=False)
+            item["end"] = _batch_number(operation, "end", position, required=False)
+            segment_ids = operation.get("segment_ids")
+            if segment_ids is not None:
+                if not isinstance(segment_ids, list):
+                    raise ValueError(f"operation {position}: segment_ids must be a list")
+                item["segment_ids"] = [_batch_segment_id(value, position, "segment_ids") for value in segment_ids]
+        elif name == "merge":
+            segment_ids = operation.get("segment_ids")
+            if not isinstance(segment_ids, list) or len(segment_ids) < 2:
+                raise ValueError(f"operation {position}: segment_ids must list at least two segments")
+            item["segment_ids"] = [_batch_segment_id(value, position, "segment_ids") for value in segment_ids]
+        elif name == "split":
+            item["at"] = _batch_number(operation, "at", position)
+            for key in ("text_before", "text_after"):
+                if operation.get(key) is not None:
+                    if not isinstance(operation[key], str):
+                        raise ValueError(f"operation {position}: {key} must be a string")
+                    item[key] = operation[key]
+        normalized.append(item)
+    return normalized
+
+
+def _join_caption_text(parts: List[str]) -> str:
+    text = ""
+    for part in parts:
+        part = (part or "").strip()
+        if not part:
+            continue
+        if text and not (_CJK_RE.match(text[-1]) or _CJK_RE.match(part[0])):
+            text += " "
+        text += part
+    return text
+
+
+def _shift_words(words: Any, delta: float) -> Any:
+    if not isinstance(words, list):
+        return words
+    shifted = []
+    for word in words:
+        if isinstance(word, dict):
+            word = dict(word)
+            for key in ("start", "end"):
+                if isinstance(word.get(key), (int, float)) and not isinstance(word.get(key), bool):
+                    word[key] = word[key] + delta
+        shifted.append(word)
+    return shifted
+
+
+def _split_text(segment: Dict[str, Any], at: float) -> Tuple[str, str]:
+    words = segment.get("words")
+    if isinstance(words, list) and words and all(isinstance(word, dict) and "word" in word for word in words):
+        before = [word for word in words if _as_float(word.get("start")) < at]
+        after = [word for word in words if _as_float(word.get("start")) >= at]
+        return "".join(str(word["word"]) for word in before).strip(), "".join(str(word["word"]) for word in after).strip()
+    text = str(segment.get("text") or "")
+    start, end = _as_float(segment.get("start")), _as_float(segment.get("end"))
+    cut = int(round(len(text) * (at - start) / (end - start))) if end > start else len(text) // 2
+    if " " in text:
+        spaces = [index for index, char in enumerate(text) if char == " "]
+        cut = min(spaces, key=lambda index: abs(index - cut))
+    return text[:cut].strip(), text[cut:].strip()
+
+
+def _require_segment(conn: sqlite3.Connection, job_id: str, seg_id: int, position: int) -> Dict[str, Any]:
+    segment = get_segment(conn, job_id, seg_id)
+    if segment is None:
+        raise ValueError(f"operation {position}: segment {seg_id} not found")
+    return segment
+
+
+def apply_batch(conn: sqlite3.Connection, job_id: str, operations: Any) -> Dict[str, Any]:
+    """Apply an ordered list of segment operations as one journal transaction.
+
+    Operations are validated up front and applied in order; a later
+    operation sees the result of earlier ones. Raises ValueError for an
+    invalid or inapplicable operation (the caller rolls back) and
+    LookupError when the job has no transcript. Returns the new revision
+    and the final state of every segment the batch touched. One undo
+    reverts the whole batch however many segments it touched (see
+    _compact_journal).
+    """
+    normalized = validate_batch(operations)
+    if not sync_segments(conn, job_id):
+        raise LookupError(job_id)
+    txn = current_revision(conn, job_id) + 1
+    touched: Dict[int, Optional[Dict[str, Any]]] = {}
+
+    for position, operation in enumerate(normalized):
+        name = operation["op"]
+        if name == "edit":
+            seg_id = operation["segment_id"]
+            _require_segment(conn, job_id, seg_id, position)
+            changes = {"text": operation["text"], "originalText": operation["text"]}
+            touched[seg_id] = _apply_update(conn, job_id, seg_id, changes, txn)
+        elif name == "timing":
+            seg_id = operation["segment_id"]
+            _require_segment(conn, job_id, seg_id, position)
+            changes = {"start": operation["start"], "end": operation["end"]}
+            touched[seg_id] = _apply_update(conn, job_id, seg_id, changes, txn)
+        elif name == "add":
+            try:
+                segment = _apply_insert(
+                    conn,
+                    job_id,
+                    {
+                        "id": operation.get("segment_id"),
+                        "start": operation["start"],
+                        "end": operation["end"],
+                        "text": operation["text"],
+                        "originalText": operation["text"],
+                    },
+                    txn,
+                )
+            except SegmentExistsError as exc:
+                raise SegmentExistsError(f"operation {position}: {exc}") from None
+            touched[segment["id"]] = segment
+        elif name == "delete":
+            seg_id = operation["segment_id"]
+            if not _apply_delete(conn, job_id, seg_id, txn):
+                raise ValueError(f"operation {position}: segment {seg_id} not found")
+            touched[seg_id] = None
+        elif name == "shift_range":
+            if "segment_ids" in operation:
+                seg_ids = operation["segment_ids"]
+            else:
+                clauses, params = ["job_id = ?"], [job_id]
+                if operation["start"] is not None:
+                    clauses.append("start_time >= ?")
+                    params.append(operation["start"])
+                if operation["end"] is not None:
+                    clauses.append("start_time < ?")
+                    params.append(operation["end"])
+                seg_ids = [
+                    row[0]
+                    for row in conn.execute(
+                        f"SELECT seg_id FROM transcript_segments WHERE {' AND '.join(clauses)}",
+                        params,
+                    ).fetchall()
+                ]
+            delta = operation["delta"]
+            for seg_id in seg_ids:
+                segment = _require_segment(conn, job_id, seg_id, position)
+                start = _as_float(segment.get("start")) + delta
+                if start < 0:
+                    raise ValueError(f"operation {position}: segment {seg_id} would start before 0")
+                changes = {
+                    "start": start,
+                    "end": _as_float(segment.get("end")) + delta,
+                    "words": _shift_words(segment.get("words"), delta),
+                }
+                touched[seg_id] = _apply_update(conn, job_id, seg_id, changes, txn)
+        elif name == "merge":
+            segments = [_require_segment(conn, job_id, seg_id, position) for seg_id in operation["segment_ids"]]
+            segments.sort(key=lambda segment: (_as_float(segment.get("start")), segment["id"]))
+            first = segments[0]
+            words: List[Any] = []
+            for segment in segments:
+                if isinstance(segment.get("words"), list):
+                    words.extend(segment["words"])
+            text = _join_caption_text([str(segment.get("text") or "") for segment in segments])
+            changes = {
+                "start": min(_as_float(segment.get("start")) for segment in segments),
+                "end": max(_as_float(segment.get("end")) for segment in segments),
+                "text": text,
+                "originalText": text,
+                "words": words,
+            }
+            touched[first["id"]] = _apply_update(conn, job_id, first["id"], changes, txn)
+            for segment in segments[1:]:
+                _apply_delete(conn, job_id, segment["id"], txn)
+                touched[segment["id"]] = None
+        elif name == "split":
+            seg_id = operation["segment_id"]
+            segment = _require_segment(conn, job_id, seg_id, position)
+            at = operation["at"]
+            start, end = _as_float(segment.get("start")), _as_float(segment.get("end"))
+            if not start < at < end:
+                raise ValueError(f"operation {position}: split point must fall inside segment {seg_id}")
+            text_before, text_after = _split_text(segment, at)
+            text_before = operation.get("text_before", text_before)
+            text_after = operation.get("text_after", text_after)
+            words = segment.get("words") if isinstance(segment.get("words"), list) else []
+            head_words = [word for word in words if not isinstance(word, dict) or _as_float(word.get("start")) < at]
+            tail_words = [word for word in words if isinstance(word, dict) and _as_float(word.get("start")) >= at]
+            head = _apply_update(
+                conn,
+                job_id,
+                seg_id,
+                {"end": at, "text": text_before, "originalText": text_before, "words": head_words},
+                txn,
+            )
+            tail = dict(segment)
+            tail.update({
+                "id": _next_segment_id(conn, job_id),
+                "start": at,
+                "end": end,
+                "text": text_after,
+                "originalText": text_after,
+                "words": tail_words,
+            })
+            tail = _apply_insert(conn, job_id, tail, txn)
+            touched[seg_id] = head
+            touched[tail["id"]] = tail
+
+    _touch(conn, job_id)
+    return {
+        "revision": current_revision(conn, job_id),
+        "changes": [{"segment_id": seg_id, "segment": segment} for seg_id, segment in touched.items()],
+    }
+
+
+def splice_range(
+    conn: sqlite3.Connection,
+    job_id: str,
+    range_start: float,
+    range_end: float,
+    segments: List[Dict[str, Any]],
+) -> Dict[str, Any]:
+    """Replace the segments overlapping ``[range_start, range_end)`` with *segments*.
+
+    Works on the current rows, so edits made elsewhere in the transcript
+    since the caller read it are kept. The deletes and inserts are one
+    journal transaction, undone together. New segments get fresh ids.
+    Returns the new revision, the removed ids and the inserted segments;
+    raises LookupError when the job has no transcript.
+    """
+    if not sync_segments(conn, job_id):
+        raise LookupError(job_id)
+    txn = current_revision(conn, job_id) + 1
+    # Allocate ids before deleting, so a removed id is never handed out again here.
+    next_id = _next_segment_id(conn, job_id)
+    removed_ids = [
+        row[0]
+        for row in conn.execute(
+            """
+            SELECT seg_id FROM transcript_segments
+            WHERE job_id = ? AND start_time < ? AND end_time > ?
+            ORDER BY start_time, seg_id
+            """,
+            (job_id, range_end, range_start),
+        ).fetchall()
+    ]
+    for seg_id in removed_ids:
+        _apply_delete(conn, job_id, seg_id, txn)
+    inserted = []
+    for offset, segment in enumerate(segments):
+        segment = dict(segment)
+        segment["id"] = next_id + offset
+        inserted.append(_apply_insert(conn, job_id, segment, txn))
+    _touch(conn, job_id)
+    return {"revision": current_revision(conn, job_id), "removed_ids": removed_ids, "segments": inserted}
+
+
+def _replay(conn: sqlite3.Connection, job_id: str, undo: bool) -> Optional[Dict[str, Any]]:
+    if not sync_segments(conn, job_id):
+        raise LookupError(job_id)
+    if undo:
+        # The newest edit that is still applied.
+        row = conn.execute(
+            "SELECT MAX(txn) FROM transcript_ops WHERE job_id = ? AND kind = 'edit' AND undone = 0",
+            (job_id,),
+        ).fetchone()
+    else:
+        # Undone edits sit on top of the stack, so the oldest of them is redone first.
+        row = conn.execute(
+            "SELECT MIN(txn) FROM transcript_ops WHERE job_id = ? AND kind = 'edit' AND undone = 1",
+            (job_id,),
+        ).fetchone()
+    if not row or row[0] is None:
+        return None
+    target = row[0]
+    ops = conn.execute(
+        f"""
+        SELECT seg_id, before, after FROM transcript_ops
+        WHERE job_id = ? AND txn = ? AND kind = 'edit'
+        ORDER BY rev {"DESC" if undo else "ASC"}
+        """,
+        (job_id, target),
+    ).fetchall()
+
+    txn = current_revision(conn, job_id) + 1
+    changes: List[Dict[str, Any]] = []
+    for seg_id, before_json, after_json in ops:
+        before, after = _load_state(before_json), _load_state(after_json)
+        source, state = (after, before) if undo else (before, after)
+        _put_segment(conn, job_id, seg_id, state)
+        _record_op(conn, job_id, seg_id, source, state, kind="undo" if undo else "redo", txn=txn)
+        changes.append({"op": _op_type(source, state), "segment_id": seg_id, "segment": state})
+    conn.execute(
+        "UPDATE transcript_ops SET undone = ? WHERE job_id = ? AND txn = ? AND kind = 'edit'",
+        (1 if undo else 0, job_id, target),
+    )
+    _touch(conn, job_id)
+    return {"revision": current_revision(conn, job_id), "changes": changes}
+
+
+def _normalized_text(text: str, normalize: Callable[[str], str], cache: Dict[str, str]) -> str:
+    """Normalize *text* without changing its length, so match offsets map back onto the original."""
+    converted = normalize(text)
+    if len(converted) == len(text):
+        return converted
+    chars = []
+    for char in text:
+        mapped = cache.get(char)
+        if mapped is None:
+            mapped = normalize(char)
+            mapped = mapped if len(mapped) == 1 else char
+            cache[char] = mapped
+        chars.append(mapped)
+    return "".join(chars)
+
+
+def find_replace(
+    conn: sqlite3.Connection,
+    job_id: str,
+    pattern: str,
+    replacement: str,
+    *,
+    regex: bool = False,
+    case_sensitive: bool = False,
+    normalize: Optional[Callable[[str], str]] = None,
+    segment_ids: Optional[List[int]] = None,
+    apply: bool = False,
+    preview_limit: int = 500,
+) -> Dict[str, Any]:
+    """Find *pattern* in segment text and, when *apply* is set, replace every match.
+
+    With *normalize* (e.g. a traditional-to-simplified converter) matching
+    runs on normalized text while replacements are spliced into the original.
+    Regex replacements may use group references. All changes are one journal
+    transaction and the document text is re-joined once, on the next read.
+    Raises ValueError for a bad pattern and LookupError without a transcript.
+    """
+    if not pattern:
+        raise ValueError("pattern is required")
+    if not sync_segments(conn, job_id):
+        raise LookupError(job_id)
+    cache: Dict[str, str] = {}
+    needle = _normalized_text(pattern, normalize, cache) if normalize else pattern
+    flags = 0 if case_sensitive else re.IGNORECASE
+    try:
+        compiled = re.compile(needle if regex else re.escape(needle), flags)
+    except re.error as exc:
+        raise ValueError(f"Invalid pattern: {exc}") from None
+
+    query = "SELECT seg_id, start_time, end_time, text FROM transcript_segments WHERE job_id = ?"
+    params: List[Any] = [job_id]
+    if segment_ids is not None:
+        query += f" AND seg_id IN ({', '.join('?' * len(segment_ids))})" if segment_ids else " AND 0"
+        params.extend(segment_ids)
+    rows = conn.execute(query + " ORDER BY start_time, seg_id", params).fetchall()
+
+    total = 0
+    matched_segments = 0
+    edits: List[Tuple[int, str]] = []
+    preview: List[Dict[str, Any]] = []
+    for seg_id, start, end, text in rows:
+        text = text or ""
+        haystack = _normalized_text(text, normalize, cache) if normalize else text
+        pieces: List[str] = []
+        matches: List[Dict[str, Any]] = []
+        cursor = 0
+        for match in compiled.finditer(haystack):
+            if match.end() == match.start():
+                continue
+            replaced = match.expand(replacement) if regex else replacement
+            pieces.append(text[cursor:match.start()])
+            pieces.append(replaced)
+            cursor = match.end()
+            matches.append({
+                "offset": match.start(),
+                "length": match.end() - match.start(),
+                "match": text[match.start():match.end()],
+                "replacement": replaced,
+            })
+        if not matches:
+            continue
+        pieces.append(text[cursor:])
+        new_text = "".join(pieces)
+        total += len(matches)
+        matched_segments += 1
+        if new_text != text:
+            edits.append((seg_id, new_text))
+        if len(preview) < preview_limit:
+            preview.append({
+                "segment_id": seg_id,
+                "start": start,
+                "end": end,
+                "text": text,
+                "new_text": new_text,
+                "matches": matches,
+            })
+
+    result: Dict[str, Any] = {
+        "applied": False,
+        "match_count": total,
+        "segment_count": matched_segments,
+        "truncated": matched_segments > len(preview),
+        "segments": preview,
+        "revision": current_revision(conn, job_id),
+    }
+    if apply and edits:
+        txn = current_revision(conn, job_id) + 1
+        for seg_id, new_text in edits:
+            _apply_update(conn, job_id, seg_id, {"text": new_text, "originalText": new_text}, txn)
+        _touch(conn, job_id)
+        result["applied"] = True
+        result["revision"] = current_revision(conn, job_id)
+    return result
+
+
+def changes_since(conn: sqlite3.Connection, job_id: str, since_rev: int) -> Dict[str, Any]:
+    """Return what changed after *since_rev*.
+
+    ``{"mode": "delta", "changes": [...]}`` carries the latest state of each
+    changed segment (None when deleted). When the journal no longer reaches
+    back to *since_rev* (or the client claims a revision the job never had),
+    ``{"mode": "snapshot", "segments": [...]}`` carries the whole transcript
+    instead. Raises LookupError when the job has no transcript.
+    """
+    if not sync_segments(conn, job_id):
+        raise LookupError(job_id)
+    revision, journal_base = conn.execute(
+        "SELECT COALESCE(revision, 0), COALESCE(journal_base, 0) FROM job_transcripts WHERE job_id = ?",
+        (job_id,),
+    ).fetchone()
+    if since_rev < journal_base or since_rev > revision:
+        return {"mode": "snapshot", "revision": revision, "segments": load_segments(conn, job_id)}
+    rows = conn.execute(
+        """
+        SELECT seg_id, after FROM transcript_ops
+        WHERE job_id = ? AND rev IN (
+            SELECT MAX(rev) FROM transcript_ops
+            WHERE job_id = ? AND rev > ?
+            GROUP BY seg_id
+        )
+        ORDER BY rev
+        """,
+        (job_id, job_id, since_rev),
+    ).fetchall()
+    return {
+        "mode": "delta",
+        "revision": revision,
+        "changes": [{"segment_id": seg_id, "segment": _load_state(after)} for seg_id, after in rows],
+    }
+
+
+def undo(conn: sqlite3.Connection, job_id: str) -> Optional[Dict[str, Any]]:
+    """Revert the newest applied edit; None when there is nothing to undo."""
+    return _replay(conn, job_id, undo=True)
+
+
+def redo(conn: sqlite3.Connection, job_id: str) -> Optional[Dict[str, Any]]:
+    """Re-apply the most recently undone edit; None when there is nothing to redo."""
+    return _replay(conn, job_id, undo=False)
+
+
+def delete_transcript(conn: sqlite3.Connection, job_id: str) -> None:
+    _unindex_segments(conn, job_id)
+    conn.execute("DELETE FROM transcript_segments WHERE job_id = ?", (job_id,))
+    conn.execute("DELETE FROM transcript_ops WHERE job_id = ?", (job_id,))
+    conn.execute("DELETE FROM job_transcripts WHERE job_id = ?", (job_id,))
+
+
+def search_query(query: str) -> Optional[str]:
+    """Turn free text into an FTS5 query: every whitespace-separated term must match as a phrase."""
+    phrases = []
+    for term in (query or "").split():
+        spaced = " ".join(search_text(term).split())
+        if spaced:
+            phrases.append('"' + spaced.replace('"', '""') + '"')
+    return " ".join(phrases) or None
+
+
+def _snippet(text: str, terms: List[str]) -> str:
+    lowered = text.lower()
+    hit = -1
+    for term in terms:
+        hit = lowered.find(term.lower())
+        if hit >= 0:
+            break
+    if hit < 0 or len(text) <= SEARCH_SNIPPET_CHARS * 2:
+        return text if len(text) <= SEARCH_SNIPPET_CHARS * 2 else text[: SEARCH_SNIPPET_CHARS * 2] + "…"
+    begin = max(0, hit - SEARCH_SNIPPET_CHARS)
+    end = min(len(text), hit + SEARCH_SNIPPET_CHARS)
+    return ("…" if begin else "") + text[begin:end] + ("…" if end < len(text) else "")
+
+
+def search_segments(
+    conn: sqlite3.Connection,
+    query: str,
+    limit: int = 50,
+    offset: int = 0,
+) -> List[Dict[str, Any]]:
+    """Return matching segments, best match first, with timings in milliseconds."""
+    match = search_query(query)
+    if not match or not _search_available:
+        return []
+    rows = conn.execute(
+        """
+        SELECT s.job_id, s.seg_id, s.start_time, s.end_time, s.text, r.display_name
+        FROM segment_search f
+        JOIN transcript_segments s ON s.rowid = f.rowid
+        JOIN job_records r ON r.job_id = s.job_id
+        WHERE segment_search MATCH ?
+        ORDER BY f.rank
+        LIMIT ? OFFSET ?
+        """,
+        (match, limit, offset),
+    ).fetchall()
+    terms = query.split()
+    return [
+        {
+            "job_id": job_id,
+            "segment_id": seg_id,
+            "start_ms": int(round((start or 0.0) * 1000)),
+            "end_ms": int(round((end or 0.0) * 1000)),
+            "snippet": _snippet(text or "", terms),
+            "display_name": display_name,
+        }
+        for job_id, seg_id, start, end, text, display_name in rows
+    ]
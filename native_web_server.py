@@ -14,6 +14,7 @@ import time
 import shutil
 import mimetypes
 import contextlib
+import functools
 import subprocess
 import ssl
 from urllib.parse import urlparse, quote
@@ -22,6 +23,7 @@ import urllib.request
 from pathlib import Path
 from typing import Dict, Any, Optional, Callable, Tuple
 from collections import defaultdict
+from queue import Empty, Queue
 import threading
 
 try:
@@ -34,7 +36,13 @@ try:
 except ImportError:
     OpenCC = None
 
-from flask import Flask, request, jsonify, send_file, render_template, send_from_directory
+try:
+    from waitress.server import create_server as create_waitress_server
+except ImportError:
+    create_waitress_server = None
+
+from flask import Flask, Response, request, jsonify, send_file, render_template, send_from_directory, stream_with_context
+from werkzeug.serving import BaseWSGIServer, WSGIRequestHandler
 from werkzeug.utils import secure_filename
 
 # Set up environment first
@@ -51,17 +59,29 @@ from native_config import (
 setup_environment()
 
 # Import native modules
-from native_job_queue import get_queue, start_worker
+from native_job_queue import get_queue, start_worker, add_status_listener, find_job
+import native_events
 import native_history
+from native_transcript_store import SegmentExistsError
 from native_job_handlers import (
     process_full_pipeline_job,
+    retranscribe_time_range,
     _prepare_audio_for_processing,
+    _resolve_range_source_audio,
     _normalized_audio_filename,
+    _media_kind_for,
 )
 from model_manager import get_whisper_model_info, whisper_model_status, download_whisper_model
-from whisper_cpp_runtime import resolve_whisper_model, resolve_whisper_engine, resolve_node_binary
+from whisper_cpp_runtime import (
+    resolve_whisper_model,
+    resolve_whisper_engine,
+    resolve_node_binary,
+    get_whisper_engine_variant,
+)
 
 from native_ffmpeg import setup_ffmpeg_environment, test_ffmpeg, get_ffmpeg_path
+from native_streaming import process_live_caption_job, process_url_import_job
+from native_calibration import load_hardware_profile, process_calibration_job, get_profile_path
 from download_media import download_url_media
 
 # Configure logging
@@ -93,6 +113,26 @@ ALLOWED_EXTENSIONS = {
 _THUMBNAIL_MAX_BYTES = 50 * 1024
 _THUMBNAIL_SCALES = [480, 360, 320, 240, 200, 160, 120, 96]
 _THUMBNAIL_QUALITIES = [6, 8, 10, 12, 14, 16, 18, 20, 22, 24, 26, 28, 30]
+_MAX_BATCH_OPERATIONS = 5000
+_SSE_HEARTBEAT_SECONDS = 15.0
+_SSE_RETRY_MS = 2000
+_SSE_MAX_JOBS = 200
+_MAX_POLL_JOBS = 1000
+# Live sessions run on their own threads, outside the shared job workers
+_MAX_LIVE_SESSIONS = 2
+_live_session_slots = threading.BoundedSemaphore(_MAX_LIVE_SESSIONS)
+
+# Serving mode: "production" (bounded thread pool, keep-alive, backlog limit)
+# or "dev" (Werkzeug's thread-per-connection development server).
+_SERVER_MODE_ENV = "XCAPTION_SERVER"
+_SERVER_THREADS_ENV = "XCAPTION_SERVER_THREADS"
+_SERVER_BACKLOG_ENV = "XCAPTION_SERVER_BACKLOG"
+# Every open /events stream holds a worker thread, so leave room for them.
+_DEFAULT_SERVER_THREADS = 24
+_DEFAULT_SERVER_BACKLOG = 64
+# Short, because an idle keep-alive connection occupies a pool worker
+_KEEPALIVE_TIMEOUT_SECONDS = 5
+_SHUTDOWN_TIMEOUT_SECONDS = 5.0
 
 # WebSocket emulation - store pending updates for each job
 job_update_queues = defaultdict(list)
@@ -131,21 +171,6 @@ def _build_ssl_context() -> ssl.SSLContext:
     return ssl.create_default_context()
 
 
-def _find_job(job_id: str) -> Tuple[Optional[Any], Optional[Any]]:
-    for queue_name in QUEUE_NAMES:
-        try:
-            queue = get_queue(queue_name)
-        except Exception:
-            continue
-        try:
-            job = queue.fetch_job(job_id)
-        except Exception:
-            continue
-        if job:
-            return job, queue
-    return None, None
-
-
 def _get_update_cache_path() -> Path:
     return get_data_dir() / UPDATE_CACHE_FILENAME
 
@@ -682,7 +707,11 @@ def _cancel_url_download(download_id: str) -> Optional[Dict[str, Any]]:
         return state
 
 
-def _start_url_download(url: str, download_path: Optional[str]) -> Dict[str, Any]:
+def _start_url_download(
+    url: str,
+    download_path: Optional[str],
+    on_finished: Optional[Callable[[Dict[str, Any]], None]] = None,
+) -> Dict[str, Any]:
     download_id = uuid.uuid4().hex
     downloads_dir, preferred_stem = _parse_download_path(download_path)
 
@@ -795,6 +824,11 @@ def _start_url_download(url: str, download_path: Optional[str]) -> Dict[str, Any
         finally:
             with url_download_lock:
                 url_download_cancel_events.pop(download_id, None)
+            if on_finished:
+                try:
+                    on_finished(dict(state))
+                except Exception as callback_error:
+                    logger.warning("URL download callback failed for %s: %s", download_id, callback_error)
 
     thread = threading.Thread(target=_run_download, name=f"UrlDownload-{download_id}", daemon=True)
     thread.start()
@@ -827,16 +861,68 @@ def emit_update(room: str, event: str, data: Dict[str, Any]):
     room format: "job:job_id"
     """
     with job_update_lock:
-        job_update_queues[room].append({
+        update = {
             'event': event,
             'data': data,
             'timestamp': time.time()
-        })
+        }
+        # Event ids double as /jobs/poll cursors; assign them under the lock
+        # so they stay ordered within each room.
+        if room.startswith("job:"):
+            update['id'] = native_events.publish(room[4:], event, data)
+        job_update_queues[room].append(update)
         # Keep only last 100 updates per job
         if len(job_update_queues[room]) > 100:
             job_update_queues[room] = job_update_queues[room][-100:]
 
 
+def _current_status_update(
+    job_id: str,
+    status: Optional[str],
+    meta_updates: Optional[Dict[str, Any]],
+    job_meta: Dict[str, Any],
+) -> Dict[str, Any]:
+    """Build the trailing 'current status' job_update entry returned by the poll endpoints"""
+    meta_updates = meta_updates if isinstance(meta_updates, dict) else {}
+
+    def _meta_value(key, default=None):
+        if key in meta_updates:
+            return meta_updates[key]
+        if key in job_meta:
+            return job_meta[key]
+        return default
+
+    current_status_data = {
+        'job_id': job_id,
+        'status': status,
+        'progress': _meta_value('progress', 0),
+        'message': _meta_value('message', ''),
+        'timestamp': time.time()
+    }
+
+    # Merge other metadata (stage, partial_result, etc.) so the UI can reflect state transitions
+    for key, value in meta_updates.items():
+        if key not in current_status_data:
+            current_status_data[key] = value
+    for key, value in job_meta.items():
+        if key not in current_status_data:
+            current_status_data[key] = value
+
+    return {
+        'event': 'job_update',
+        'data': current_status_data,
+        'timestamp': time.time()
+    }
+
+
+def _publish_job_status(job_id: str, status: str, error: Optional[str] = None):
+    """Forward queue status transitions to /events subscribers"""
+    data = {'job_id': job_id, 'status': status, 'timestamp': time.time()}
+    if error:
+        data['error'] = error
+    native_events.publish(job_id, 'job_status', data)
+
+
 def publish_job_update(job_id: str, status: str, data: Dict[str, Any]):
     """Publish job update (compatible with WebSocket emit)"""
     try:
@@ -1048,6 +1134,8 @@ def _build_srt_text(segments: list[dict]) -> str:
 def create_app():
     """Create and configure Flask application"""
 
+    add_status_listener(_publish_job_status)
+
     # Create Flask app with custom template and static folders
     app = Flask(
         __name__,
@@ -1101,6 +1189,7 @@ def create_app():
                 "ffmpeg_available": test_ffmpeg(),
                 "whisper_engine": str(engine_path) if engine_path else None,
                 "whisper_engine_kind": engine_kind if engine_path else None,
+                "whisper_engine_variant": get_whisper_engine_variant() if engine_path else None,
                 "node_available": bool(node_path) if engine_kind == "node" else None,
                 "models_ready": models_ready,
                 "whisper_model": whisper_status
@@ -1165,11 +1254,84 @@ def create_app():
             return jsonify({"error": "Download not found"}), 404
         return jsonify(_serialize_model_download(state)), 200
 
+    @app.route('/models/whisper/calibration', methods=['GET'])
+    def whisper_calibration_profile():
+        profile = load_hardware_profile()
+        return jsonify({
+            "calibrated": profile is not None,
+            "profile_path": str(get_profile_path()),
+            "profile": profile,
+        }), 200
+
+    @app.route('/models/whisper/calibration', methods=['POST'])
+    def whisper_calibration_start():
+        try:
+            payload = request.get_json(silent=True) or {}
+            reference_audio = str(payload.get("reference_audio") or "").strip()
+            if not reference_audio or not Path(reference_audio).exists():
+                return jsonify({"error": "reference_audio must point to an existing audio file."}), 400
+
+            reference_text = payload.get("reference_text")
+            reference_text_path = payload.get("reference_text_path")
+            if not reference_text and reference_text_path:
+                try:
+                    reference_text = Path(reference_text_path).read_text(encoding="utf-8")
+                except OSError:
+                    return jsonify({"error": "reference_text_path could not be read."}), 400
+
+            accuracy_target = payload.get("accuracy_target")
+            if accuracy_target is not None:
+                try:
+                    accuracy_target = float(accuracy_target)
+                except (TypeError, ValueError):
+                    return jsonify({"error": "accuracy_target must be a number."}), 400
+
+            models = payload.get("models")
+            if models is not None and not isinstance(models, list):
+                return jsonify({"error": "models must be a list of model file names."}), 400
+
+            job_id = str(uuid.uuid4())
+            get_queue('low').enqueue(
+                process_calibration_job,
+                kwargs={
+                    "job_id": job_id,
+                    "reference_audio": reference_audio,
+                    "reference_text": reference_text,
+                    "models": models,
+                    "language": payload.get("language"),
+                    "accuracy_target": accuracy_target,
+                },
+                job_id=job_id,
+            )
+            return jsonify({"job_id": job_id, "status": "queued"}), 202
+        except Exception as exc:
+            logger.error("Failed to start calibration: %s", exc, exc_info=True)
+            return jsonify({"error": "Failed to start calibration"}), 500
+
     @app.route('/history', methods=['GET'])
     def history():
-        """Return persisted transcription history."""
+        """Return persisted transcription history.
+
+        Supports ``?cursor=&limit=`` keyset paging, ``fields=a,b`` projection
+        and ``since=`` delta sync (changed rows plus deleted job ids).
+        """
         try:
-            return jsonify({"jobs": native_history.load_history()}), 200
+            try:
+                limit = min(max(int(request.args.get('limit', 200)), 1), 500)
+            except ValueError:
+                return jsonify({"error": "limit must be an integer"}), 400
+            raw_fields = request.args.get('fields')
+            fields = [name.strip() for name in raw_fields.split(',') if name.strip()] if raw_fields else None
+            try:
+                page = native_history.load_history_page(
+                    limit=limit,
+                    cursor=request.args.get('cursor') or None,
+                    fields=fields,
+                    since=request.args.get('since') or None,
+                )
+            except ValueError as ve:
+                return jsonify({"error": str(ve)}), 400
+            return jsonify(page), 200
         except Exception as exc:
             logger.error("Failed to load job history: %s", exc)
             return jsonify({"error": "Failed to load history"}), 500
@@ -1387,40 +1549,36 @@ def create_app():
                     "success": False,
                     "error": "job_id, segment_id, and new_text are required"
                 }), 400
-            record = native_history.get_job_record(job_id)
-            transcription = record.get("transcript") if record else None
 
-            if not transcription:
+            try:
+                segment_id = int(segment_id)
+            except Exception:
+                return jsonify({
+                    "success": False,
+                    "error": "segment_id must be a number"
+                }), 400
+
+            try:
+                updated = native_history.update_transcript_segment(
+                    job_id, segment_id, {"text": new_text, "originalText": new_text}
+                )
+            except LookupError:
                 return jsonify({
                     "success": False,
                     "error": "Transcription not found"
                 }), 404
-
-            segment_found = False
-            segments = transcription.get("segments") or []
-            for segment in segments:
-                if segment.get('id') == segment_id:
-                    segment['text'] = new_text
-                    segment['originalText'] = new_text
-                    segment_found = True
-                    break
-
-            if not segment_found:
+            if updated is None:
                 return jsonify({
                     "success": False,
                     "error": f"Segment {segment_id} not found"
                 }), 404
 
-            full_text = " ".join([seg.get('text', '') for seg in segments if seg.get('text')])
-            transcription['text'] = full_text
-
-            native_history.update_job_transcript(job_id, transcription)
-
             logger.info("Updated segment %s in job %s", segment_id, job_id)
 
             return jsonify({
                 "success": True,
-                "message": "Segment updated successfully"
+                "message": "Segment updated successfully",
+                "revision": updated["revision"]
             }), 200
 
         except Exception as e:
@@ -1463,34 +1621,33 @@ def create_app():
                     "error": "end must be greater than start"
                 }), 400
 
-            record = native_history.get_job_record(job_id)
-            transcription = record.get("transcript") if record else None
-            if not transcription:
+            try:
+                segment_id = int(segment_id)
+            except Exception:
+                return jsonify({
+                    "success": False,
+                    "error": "segment_id must be a number"
+                }), 400
+
+            try:
+                updated = native_history.update_transcript_segment(
+                    job_id, segment_id, {"start": start_val, "end": end_val}
+                )
+            except LookupError:
                 return jsonify({
                     "success": False,
                     "error": "Transcription not found"
                 }), 404
-
-            segment_found = False
-            segments = transcription.get("segments") or []
-            for segment in segments:
-                if segment.get('id') == segment_id:
-                    segment['start'] = start_val
-                    segment['end'] = end_val
-                    segment_found = True
-                    break
-
-            if not segment_found:
+            if updated is None:
                 return jsonify({
                     "success": False,
                     "error": f"Segment {segment_id} not found"
                 }), 404
 
-            native_history.update_job_transcript(job_id, transcription)
-
             return jsonify({
                 "success": True,
-                "message": "Segment timing updated"
+                "message": "Segment timing updated",
+                "revision": updated["revision"]
             }), 200
 
         except Exception as e:
@@ -1534,42 +1691,39 @@ def create_app():
                     "error": "end must be greater than start"
                 }), 400
 
-            record = native_history.get_job_record(job_id)
-            transcription = record.get("transcript") if record else None
-            if not transcription:
+            if segment_id is not None:
+                try:
+                    segment_id = int(segment_id)
+                except Exception:
+                    return jsonify({
+                        "success": False,
+                        "error": "segment_id must be a number"
+                    }), 400
+
+            try:
+                added = native_history.add_transcript_segment(job_id, {
+                    "id": segment_id,
+                    "start": start_val,
+                    "end": end_val,
+                    "text": text,
+                    "originalText": text,
+                })
+            except LookupError:
                 return jsonify({
                     "success": False,
                     "error": "Transcription not found"
                 }), 404
-
-            segments = transcription.get("segments") or []
-            if segment_id is None:
-                max_id = 0
-                for seg in segments:
-                    try:
-                        max_id = max(max_id, int(seg.get("id", 0)))
-                    except Exception:
-                        continue
-                segment_id = max_id + 1
-
-            new_segment = {
-                "id": int(segment_id),
-                "start": start_val,
-                "end": end_val,
-                "text": text,
-                "originalText": text,
-            }
-            segments.append(new_segment)
-            segments.sort(key=lambda s: float(s.get("start", 0)))
-            transcription["segments"] = segments
-            transcription["text"] = " ".join([seg.get("text", "") for seg in segments if seg.get("text")]).strip()
-
-            native_history.update_job_transcript(job_id, transcription)
+            except SegmentExistsError as e:
+                return jsonify({
+                    "success": False,
+                    "error": str(e)
+                }), 409
 
             return jsonify({
                 "success": True,
                 "message": "Segment added",
-                "segment": new_segment
+                "segment": added["segment"],
+                "revision": added["revision"]
             }), 200
 
         except Exception as e:
@@ -1603,30 +1757,23 @@ def create_app():
                     "error": "segment_id must be a number"
                 }), 400
 
-            record = native_history.get_job_record(job_id)
-            transcription = record.get("transcript") if record else None
-            if not transcription:
+            try:
+                revision = native_history.delete_transcript_segment(job_id, segment_id_val)
+            except LookupError:
                 return jsonify({
                     "success": False,
                     "error": "Transcription not found"
                 }), 404
-
-            segments = transcription.get("segments") or []
-            next_segments = [seg for seg in segments if int(seg.get("id", -1)) != segment_id_val]
-
-            if len(next_segments) == len(segments):
+            if revision is None:
                 return jsonify({
                     "success": False,
                     "error": f"Segment {segment_id_val} not found"
                 }), 404
 
-            transcription["segments"] = next_segments
-            transcription["text"] = " ".join([seg.get("text", "") for seg in next_segments if seg.get("text")]).strip()
-            native_history.update_job_transcript(job_id, transcription)
-
             return jsonify({
                 "success": True,
-                "message": "Segment deleted"
+                "message": "Segment deleted",
+                "revision": revision
             }), 200
 
         except Exception as e:
@@ -1638,6 +1785,82 @@ def create_app():
                 "error": "Failed to delete segment"
             }), 500
 
+    @app.route('/api/segment/retranscribe', methods=['POST'])
+    def retranscribe_segment_range():
+        """Queue a re-transcription of a time range; the job splices the result into the transcript.
+
+        Poll ``/job/<task_id>`` for the outcome (removed ids, new segments, revision).
+        """
+        try:
+            data = request.get_json() or {}
+            job_id = data.get('job_id')
+            start = data.get('start')
+            end = data.get('end')
+
+            if not job_id or start is None or end is None:
+                return jsonify({
+                    "success": False,
+                    "error": "job_id, start, and end are required"
+                }), 400
+
+            try:
+                start_val = float(start)
+                end_val = float(end)
+            except Exception:
+                return jsonify({
+                    "success": False,
+                    "error": "start and end must be numbers"
+                }), 400
+
+            if start_val < 0 or end_val <= start_val:
+                return jsonify({
+                    "success": False,
+                    "error": "end must be greater than start"
+                }), 400
+
+            record = native_history.get_job_record(job_id)
+            if not record or not record.get("transcript"):
+                return jsonify({
+                    "success": False,
+                    "error": "Transcription not found"
+                }), 404
+            if not _resolve_range_source_audio(job_id, record.get("media_path")):
+                return jsonify({
+                    "success": False,
+                    "error": "Source media for this job is no longer available"
+                }), 409
+
+            # A full engine pass is too slow for the request thread; run it
+            # on the workers like every other transcription.
+            task = get_queue('default').enqueue(
+                retranscribe_time_range,
+                kwargs={
+                    'job_id': job_id,
+                    'start': start_val,
+                    'end': end_val,
+                    'model_path': data.get('model') or None,
+                    'language': data.get('language') or None,
+                    'chinese_style': data.get('chinese_style') or None,
+                },
+            )
+
+            return jsonify({
+                "success": True,
+                "message": "Range re-transcription queued",
+                "job_id": job_id,
+                "task_id": task.id,
+                "status": "queued"
+            }), 202
+
+        except Exception as e:
+            logger.error(f"Error re-transcribing range: {e}")
+            import traceback
+            logger.error(traceback.format_exc())
+            return jsonify({
+                "success": False,
+                "error": "Failed to re-transcribe range"
+            }), 500
+
     @app.route('/api/job/record', methods=['POST'])
     def upsert_job_record():
         """Create or update a job record in the app database."""
@@ -1687,6 +1910,192 @@ def create_app():
             logger.error("Failed to load job record %s: %s", job_id, exc, exc_info=True)
             return jsonify({"success": False, "error": "Failed to load job record"}), 500
 
+    @app.route('/api/job/<job_id>/segments', methods=['GET'])
+    def get_job_segments(job_id: str):
+        """Return the segments overlapping a time window (the whole transcript without bounds)."""
+        try:
+            bounds = {}
+            for key in ('start', 'end'):
+                raw_value = request.args.get(key)
+                if raw_value in (None, ''):
+                    bounds[key] = None
+                    continue
+                try:
+                    bounds[key] = float(raw_value)
+                except ValueError:
+                    return jsonify({"success": False, "error": f"{key} must be a number"}), 400
+            if bounds['start'] is not None and bounds['end'] is not None and bounds['end'] <= bounds['start']:
+                return jsonify({"success": False, "error": "end must be greater than start"}), 400
+
+            indexed = native_history.get_segment_index(job_id)
+            if not indexed:
+                return jsonify({"success": False, "error": "Transcription not found"}), 404
+            _, index = indexed
+            segments = index.overlapping(bounds['start'], bounds['end'])
+            return jsonify({
+                "success": True,
+                "job_id": job_id,
+                "start": bounds['start'],
+                "end": bounds['end'],
+                "total": len(index),
+                "segments": segments,
+            }), 200
+        except Exception as exc:
+            logger.error("Failed to load segments for %s: %s", job_id, exc, exc_info=True)
+            return jsonify({"success": False, "error": "Failed to load segments"}), 500
+
+    @app.route('/api/job/<job_id>/segments/batch', methods=['POST'])
+    def batch_update_segments(job_id: str):
+        """Apply an ordered list of segment operations in one transaction."""
+        try:
+            data = request.get_json(force=True, silent=True) or {}
+            operations = data.get('operations')
+            if isinstance(operations, list) and len(operations) > _MAX_BATCH_OPERATIONS:
+                return jsonify({
+                    "success": False,
+                    "error": f"At most {_MAX_BATCH_OPERATIONS} operations per batch"
+                }), 400
+            try:
+                applied = native_history.apply_transcript_batch(job_id, operations)
+            except LookupError:
+                return jsonify({"success": False, "error": "Transcription not found"}), 404
+            except SegmentExistsError as conflict:
+                return jsonify({"success": False, "error": str(conflict)}), 409
+            except ValueError as ve:
+                return jsonify({"success": False, "error": str(ve)}), 400
+            return jsonify({
+                "success": True,
+                "job_id": job_id,
+                "revision": applied["revision"],
+                "changes": applied["changes"],
+            }), 200
+        except Exception as exc:
+            logger.error("Batch segment update failed for %s: %s", job_id, exc, exc_info=True)
+            return jsonify({"success": False, "error": "Failed to apply segment operations"}), 500
+
+    @app.route('/api/job/<job_id>/replace', methods=['POST'])
+    def replace_in_transcript(job_id: str):
+        """Preview (default) or apply a find-and-replace across a transcript."""
+        try:
+            data = request.get_json(force=True, silent=True) or {}
+            pattern = data.get('pattern')
+            replacement = data.get('replacement', '')
+            if not isinstance(pattern, str) or not pattern:
+                return jsonify({"success": False, "error": "pattern is required"}), 400
+            if not isinstance(replacement, str):
+                return jsonify({"success": False, "error": "replacement must be a string"}), 400
+
+            normalize = None
+            if data.get('normalize_chinese'):
+                if OpenCC is None:
+                    return jsonify({
+                        "success": False,
+                        "error": "Chinese conversion library (opencc) is not available"
+                    }), 400
+                normalize = functools.partial(convert_chinese_text, target='simplified')
+
+            segment_ids = data.get('segment_ids')
+            if segment_ids is not None:
+                try:
+                    segment_ids = [int(value) for value in segment_ids]
+                except (TypeError, ValueError):
+                    return jsonify({"success": False, "error": "segment_ids must be a list of numbers"}), 400
+
+            try:
+                result = native_history.replace_in_transcript(
+                    job_id,
+                    pattern,
+                    replacement,
+                    regex=bool(data.get('regex')),
+                    case_sensitive=bool(data.get('case_sensitive')),
+                    normalize=normalize,
+                    segment_ids=segment_ids,
+                    apply=bool(data.get('apply')),
+                )
+            except LookupError:
+                return jsonify({"success": False, "error": "Transcription not found"}), 404
+            except ValueError as ve:
+                return jsonify({"success": False, "error": str(ve)}), 400
+            return jsonify({"success": True, "job_id": job_id, **result}), 200
+        except Exception as exc:
+            logger.error("Find and replace failed for %s: %s", job_id, exc, exc_info=True)
+            return jsonify({"success": False, "error": "Failed to replace text"}), 500
+
+    @app.route('/api/job/<job_id>/changes', methods=['GET'])
+    def get_transcript_changes(job_id: str):
+        """Return segments changed since ``since_rev`` (or a full snapshot when too far behind)."""
+        try:
+            try:
+                since_rev = int(request.args.get('since_rev', ''))
+            except ValueError:
+                return jsonify({"success": False, "error": "since_rev must be an integer"}), 400
+            try:
+                changes = native_history.get_transcript_changes(job_id, since_rev)
+            except LookupError:
+                return jsonify({"success": False, "error": "Transcription not found"}), 404
+            return jsonify({"success": True, "job_id": job_id, "since_rev": since_rev, **changes}), 200
+        except Exception as exc:
+            logger.error("Failed to load transcript changes for %s: %s", job_id, exc, exc_info=True)
+            return jsonify({"success": False, "error": "Failed to load changes"}), 500
+
+    @app.route('/api/job/<job_id>/undo', methods=['POST'])
+    def undo_transcript_edit(job_id: str):
+        """Undo the newest segment edit; returns only the segments it changed."""
+        return _replay_transcript_edit(job_id, undo=True)
+
+    @app.route('/api/job/<job_id>/redo', methods=['POST'])
+    def redo_transcript_edit(job_id: str):
+        """Redo the most recently undone segment edit."""
+        return _replay_transcript_edit(job_id, undo=False)
+
+    def _replay_transcript_edit(job_id: str, undo: bool):
+        action = "undo" if undo else "redo"
+        try:
+            try:
+                if undo:
+                    applied = native_history.undo_transcript_edit(job_id)
+                else:
+                    applied = native_history.redo_transcript_edit(job_id)
+            except LookupError:
+                return jsonify({"success": False, "error": "Transcription not found"}), 404
+            if applied is None:
+                return jsonify({"success": False, "error": f"Nothing to {action}"}), 409
+            return jsonify({
+                "success": True,
+                "job_id": job_id,
+                "revision": applied["revision"],
+                "changes": applied["changes"],
+            }), 200
+        except Exception as exc:
+            logger.error("Failed to %s edit for %s: %s", action, job_id, exc, exc_info=True)
+            return jsonify({"success": False, "error": f"Failed to {action} edit"}), 500
+
+    @app.route('/api/search', methods=['GET'])
+    def search_transcripts():
+        """Full-text search over every stored transcript segment."""
+        try:
+            query = (request.args.get('q') or '').strip()
+            if not query:
+                return jsonify({"success": False, "error": "q is required"}), 400
+            try:
+                limit = min(max(int(request.args.get('limit', 50)), 1), 200)
+                offset = max(int(request.args.get('offset', 0)), 0)
+            except ValueError:
+                return jsonify({"success": False, "error": "limit and offset must be integers"}), 400
+            results = native_history.search_transcripts(query, limit=limit, offset=offset)
+            if results is None:
+                return jsonify({"success": False, "error": "Search is not available"}), 503
+            return jsonify({
+                "success": True,
+                "query": query,
+                "limit": limit,
+                "offset": offset,
+                "results": results,
+            }), 200
+        except Exception as exc:
+            logger.error("Transcript search failed: %s", exc, exc_info=True)
+            return jsonify({"success": False, "error": "Search failed"}), 500
+
     # Web UI - React
     @app.route('/', methods=['GET'])
     def index():
@@ -1762,6 +2171,67 @@ def create_app():
 
         return jsonify({'connected': True, 'updates': []})
 
+    # Server-Sent Events push channel for job progress
+    @app.route('/events', methods=['GET'])
+    def job_events():
+        """
+        Stream job_update/job_status events as text/event-stream.
+        ?jobs=a,b limits the stream to those jobs (default: every job).
+        Reconnecting clients resume from Last-Event-ID; when the gap can no
+        longer be replayed (or the client fell behind) a "resync" event tells
+        it to refetch /job/<job_id> once.
+        """
+        job_ids = [job_id.strip() for job_id in (request.args.get('jobs') or '').split(',') if job_id.strip()]
+        if len(job_ids) > _SSE_MAX_JOBS:
+            return jsonify({'success': False, 'error': f'At most {_SSE_MAX_JOBS} jobs per stream'}), 400
+
+        last_event_id = request.headers.get('Last-Event-ID') or request.args.get('last_event_id')
+        try:
+            last_event_id = int(last_event_id) if last_event_id not in (None, '') else None
+        except (TypeError, ValueError):
+            last_event_id = None
+
+        # Subscribe before replaying so nothing published in between is lost;
+        # duplicates are skipped by event id.
+        subscriber = native_events.subscribe(job_ids or None)
+
+        def _resync(reason):
+            payload = json.dumps({'reason': reason, 'jobs': job_ids})
+            return f"event: resync\ndata: {payload}\n\n"
+
+        def _stream():
+            last_sent = last_event_id or 0
+            try:
+                yield f"retry: {_SSE_RETRY_MS}\n\n"
+                if last_event_id is not None:
+                    events, complete = native_events.replay(last_event_id, job_ids or None)
+                    if not complete:
+                        yield _resync('history')
+                    for event in events:
+                        yield event.to_sse()
+                        last_sent = event.id
+                while True:
+                    event = subscriber.get(_SSE_HEARTBEAT_SECONDS)
+                    if subscriber.closed:
+                        return
+                    if subscriber.overflowed:
+                        subscriber.overflowed = False
+                        yield _resync('overflow')
+                    if event is None:
+                        yield ": heartbeat\n\n"
+                        continue
+                    if event.id <= last_sent:
+                        continue
+                    yield event.to_sse()
+                    last_sent = event.id
+            finally:
+                native_events.unsubscribe(subscriber)
+
+        response = Response(stream_with_context(_stream()), mimetype='text/event-stream')
+        response.headers['Cache-Control'] = 'no-cache'
+        response.headers['X-Accel-Buffering'] = 'no'
+        return response
+
     # Job polling endpoint (for WebSocket emulation)
     @app.route('/job/<job_id>/poll', methods=['GET'])
     def poll_job_updates(job_id):
@@ -1780,7 +2250,7 @@ def create_app():
                 job_update_queues[room] = []
 
             # Also get current job status from database
-            job, job_queue = _find_job(job_id)
+            job, job_queue = find_job(job_id)
 
             # Always include current job status in response
             if job:
@@ -1788,40 +2258,14 @@ def create_app():
                 if job_queue is None:
                     job_queue = get_queue('default')
 
-                meta_updates = job_queue.get_job_updates(job_id)
-                job_meta = getattr(job, 'meta', {}) or {}
-
-                def _meta_value(key, default=None):
-                    if isinstance(meta_updates, dict) and key in meta_updates:
-                        return meta_updates[key]
-                    if key in job_meta:
-                        return job_meta[key]
-                    return default
-
                 # Always append current status (even if there are pending updates)
                 # This ensures UI always gets the latest state, including stage info
-                current_status_data = {
-                    'job_id': job_id,
-                    'status': job.get_status(),
-                    'progress': _meta_value('progress', 0),
-                    'message': _meta_value('message', ''),
-                    'timestamp': time.time()
-                }
-
-                # Merge other metadata (stage, partial_result, etc.) so the UI can reflect state transitions
-                if isinstance(meta_updates, dict):
-                    for key, value in meta_updates.items():
-                        if key not in current_status_data:
-                            current_status_data[key] = value
-                for key, value in job_meta.items():
-                    if key not in current_status_data:
-                        current_status_data[key] = value
-
-                current_status = {
-                    'event': 'job_update',
-                    'data': current_status_data,
-                    'timestamp': time.time()
-                }
+                current_status = _current_status_update(
+                    job_id,
+                    job.get_status(),
+                    job_queue.get_job_updates(job_id),
+                    getattr(job, 'meta', {}) or {},
+                )
 
                 # If there are pending updates, append status at the end
                 # If no pending updates, status is the only update
@@ -1839,13 +2283,82 @@ def create_app():
             logger.error(f"Error polling job updates: {e}")
             return jsonify({'success': False, 'error': str(e)}), 500
 
+    # Batched polling endpoint for many jobs at once
+    @app.route('/jobs/poll', methods=['POST'])
+    def poll_many_jobs():
+        """
+        Poll several jobs in one request.
+        Body: {"jobs": [{"job_id": "...", "cursor": 12}, ...]} or {"job_ids": [...]}.
+        Unlike /job/<job_id>/poll this does not drain the pending updates:
+        each job returns the updates newer than its cursor plus its current
+        status, and the cursor to send next time.
+        """
+        try:
+            payload = request.get_json(silent=True) or {}
+            entries = payload.get('jobs')
+            if entries is None:
+                entries = payload.get('job_ids') or []
+            if not isinstance(entries, list):
+                return jsonify({'success': False, 'error': 'jobs must be a list'}), 400
+            if len(entries) > _MAX_POLL_JOBS:
+                return jsonify({'success': False, 'error': f'At most {_MAX_POLL_JOBS} jobs per poll'}), 400
+
+            cursors: Dict[str, int] = {}
+            for entry in entries:
+                if isinstance(entry, str):
+                    job_id, cursor = entry, 0
+                elif isinstance(entry, dict) and isinstance(entry.get('job_id'), str):
+                    job_id, cursor = entry['job_id'], entry.get('cursor') or 0
+                else:
+                    return jsonify({'success': False, 'error': 'Each job must be an id or {"job_id", "cursor"}'}), 400
+                try:
+                    cursors[job_id] = int(cursor)
+                except (TypeError, ValueError):
+                    return jsonify({'success': False, 'error': f'Invalid cursor for job {job_id}'}), 400
+
+            # The jobs table is shared by every queue, so one lookup covers them all
+            states = get_queue('default').fetch_job_states(cursors.keys()) if cursors else {}
+
+            with job_update_lock:
+                pending = {
+                    job_id: [dict(update) for update in job_update_queues.get(f"job:{job_id}", ())
+                             if update.get('id', 0) > cursor]
+                    for job_id, cursor in cursors.items()
+                }
+
+            jobs = {}
+            for job_id, cursor in cursors.items():
+                updates = pending[job_id]
+                if updates:
+                    cursor = updates[-1].get('id', cursor)
+                state = states.get(job_id)
+                if state:
+                    queue_name = state['queue_name'] if state['queue_name'] in QUEUE_NAMES else 'default'
+                    updates.append(_current_status_update(
+                        job_id,
+                        state['status'],
+                        get_queue(queue_name).get_job_updates(job_id),
+                        state['meta'],
+                    ))
+                jobs[job_id] = {
+                    'found': state is not None,
+                    'cursor': cursor,
+                    'updates': updates,
+                }
+
+            return jsonify({'success': True, 'jobs': jobs})
+
+        except Exception as e:
+            logger.error(f"Error polling jobs: {e}", exc_info=True)
+            return jsonify({'success': False, 'error': str(e)}), 500
+
     # Job status endpoint
     @app.route('/job/<job_id>', methods=['GET'])
     def get_job_status(job_id):
         """Get job status and results"""
         try:
             # Try to find job in all queues
-            job, job_queue = _find_job(job_id)
+            job, job_queue = find_job(job_id)
 
             if not job:
                 record = native_history.get_job_record(job_id)
@@ -1946,7 +2459,7 @@ def create_app():
         """Terminate a specific job"""
         try:
             # Try to find and cancel job in all queues
-            job, queue = _find_job(job_id)
+            job, queue = find_job(job_id)
             if job and queue:
                 job.cancel()
                 queue.update_job_status(job_id, 'canceled')
@@ -1983,58 +2496,52 @@ def create_app():
             candidate_paths = set()
             job_found = False
 
-            for queue_name in QUEUE_NAMES:
-                try:
-                    queue = get_queue(queue_name)
-                except Exception as queue_error:
-                    logger.warning(f"Unable to access queue '{queue_name}' while removing job {job_id}: {queue_error}")
-                    continue
-
-                meta_sources = []
-
-                try:
-                    job = queue.fetch_job(job_id)
-                except Exception:
-                    job = None
-
-                if job:
-                    job_found = True
-                    if getattr(job, 'kwargs', None):
-                        file_path = job.kwargs.get('file_path')
-                        if file_path:
-                            candidate_paths.add(file_path)
-                    if isinstance(getattr(job, 'meta', None), dict):
-                        meta_sources.append(job.meta)
-                    if isinstance(getattr(job, 'result', None), dict):
-                        meta_sources.append(job.result)
-
-                    try:
-                        if job.get_status() not in ('finished', 'failed', 'canceled', 'cancelled', 'deleted'):
-                            job.cancel()
-                    except Exception as cancel_error:
-                        logger.warning(f"Failed to cancel job {job_id}: {cancel_error}")
+            # Every queue shares the jobs table and the job registry, so one
+            # lookup and one removal cover them all.
+            job, queue = find_job(job_id)
+            if queue is None:
+                queue = get_queue('default')
 
-                meta_updates = queue.get_job_updates(job_id)
-                if isinstance(meta_updates, dict):
-                    meta_sources.append(meta_updates)
+            meta_sources = []
 
-                for meta in meta_sources:
-                    if not isinstance(meta, dict):
-                        continue
-                    file_path = meta.get('file_path')
+            if job:
+                job_found = True
+                if getattr(job, 'kwargs', None):
+                    file_path = job.kwargs.get('file_path')
                     if file_path:
                         candidate_paths.add(file_path)
-                    for key in ('result', 'partial_result'):
-                        nested = meta.get(key)
-                        if isinstance(nested, dict):
-                            nested_path = nested.get('file_path')
-                            if nested_path:
-                                candidate_paths.add(nested_path)
+                if isinstance(getattr(job, 'meta', None), dict):
+                    meta_sources.append(job.meta)
+                if isinstance(getattr(job, 'result', None), dict):
+                    meta_sources.append(job.result)
 
                 try:
-                    queue.remove_job(job_id)
-                except Exception as remove_error:
-                    logger.debug(f"No queue record to remove for job {job_id} in queue '{queue_name}': {remove_error}")
+                    if job.get_status() not in ('finished', 'failed', 'canceled', 'cancelled', 'deleted'):
+                        job.cancel()
+                except Exception as cancel_error:
+                    logger.warning(f"Failed to cancel job {job_id}: {cancel_error}")
+
+            meta_updates = queue.get_job_updates(job_id)
+            if isinstance(meta_updates, dict):
+                meta_sources.append(meta_updates)
+
+            for meta in meta_sources:
+                if not isinstance(meta, dict):
+                    continue
+                file_path = meta.get('file_path')
+                if file_path:
+                    candidate_paths.add(file_path)
+                for key in ('result', 'partial_result'):
+                    nested = meta.get(key)
+                    if isinstance(nested, dict):
+                        nested_path = nested.get('file_path')
+                        if nested_path:
+                            candidate_paths.add(nested_path)
+
+            try:
+                queue.remove_job(job_id)
+            except Exception as remove_error:
+                logger.debug(f"No queue record to remove for job {job_id}: {remove_error}")
 
             # Inspect persisted transcription output before deletion
             job_output_dir = transcriptions_dir / job_id
@@ -2308,6 +2815,95 @@ def create_app():
             logger.error("URL import start failed: %s", exc, exc_info=True)
             return jsonify({"error": f"Failed to start URL download: {exc}"}), 500
 
+    @app.route('/import/url/transcribe', methods=['POST'])
+    def import_url_and_transcribe():
+        """Download a URL for playback while transcribing its audio stream in parallel."""
+        try:
+            data = request.get_json(silent=True) or {}
+            raw_url = str(data.get("url") or "").strip()
+            download_path = str(data.get("download_dir") or data.get("save_path") or "").strip() or None
+            if not raw_url:
+                return jsonify({"error": "URL is required."}), 400
+            if not is_http_url(raw_url):
+                return jsonify({"error": "Only http(s) URLs are supported."}), 400
+
+            model = data.get('model') or 'whisper'
+            if not resolve_whisper_model(model):
+                return jsonify({"error": "Model assets not found. Use the in-app downloader."}), 400
+
+            job_id = data.get('job_id') or str(uuid.uuid4())
+            language = data.get('language') or 'auto'
+            display_name = data.get('display_name')
+            native_history.upsert_job_record({
+                "job_id": job_id,
+                "filename": display_name or raw_url,
+                "display_name": display_name,
+                "status": "processing",
+                "language": language,
+            })
+
+            def _attach_download(download_state: Dict[str, Any]) -> None:
+                file_info = download_state.get("file") or {}
+                if download_state.get("status") == "completed" and file_info.get("path"):
+                    media_path = file_info["path"]
+                    media_size, media_mtime = native_history.get_file_meta(media_path)
+                    native_history.upsert_job_record({
+                        "job_id": job_id,
+                        "filename": file_info.get("name"),
+                        "media_path": media_path,
+                        "media_kind": _media_kind_for(media_path),
+                        "media_size": media_size,
+                        "media_mtime": media_mtime,
+                    })
+                    return
+                # Keep the streamed audio playable when the video never arrives.
+                normalized_path = get_uploads_dir() / _normalized_audio_filename(job_id)
+                if normalized_path.exists():
+                    native_history.upsert_job_record({
+                        "job_id": job_id,
+                        "media_path": str(normalized_path),
+                        "media_kind": "audio",
+                    })
+                else:
+                    native_history.upsert_job_record({"job_id": job_id, "status": "failed"})
+
+            state = _start_url_download(raw_url, download_path, on_finished=_attach_download)
+
+            queue = get_queue('default')
+            queue.enqueue(
+                process_url_import_job,
+                kwargs={
+                    'job_id': job_id,
+                    'url': raw_url,
+                    'model_path': model,
+                    'language': language,
+                    'chinese_style': data.get('chinese_style'),
+                    'conditioning': data.get('conditioning'),
+                    'display_name': display_name,
+                },
+                job_id=job_id,
+            )
+            logger.info(f"Submitted URL import job {job_id} (download {state.get('id')})")
+
+            emit_update(f"job:{job_id}", 'job_update', {
+                'job_id': job_id,
+                'status': 'queued',
+                'message': 'Job submitted successfully',
+                'progress': 0,
+                'timestamp': time.time()
+            })
+
+            return jsonify({
+                "job_id": job_id,
+                "status": "queued",
+                "message": "Job submitted successfully",
+                "websocket_channel": f"job:{job_id}",
+                "download": _serialize_url_download(state),
+            }), 200
+        except Exception as exc:
+            logger.error("URL import transcription failed to start: %s", exc, exc_info=True)
+            return jsonify({"error": f"Failed to start URL import: {exc}"}), 500
+
     @app.route('/import/url/<download_id>', methods=['GET'])
     def import_url_status(download_id: str):
         state = _get_url_download_state(download_id)
@@ -2415,6 +3011,7 @@ def create_app():
             model = request.form.get('model', 'whisper')
             language = request.form.get('language', 'auto')
             chinese_style = request.form.get('chinese_style')
+            conditioning = request.form.get('conditioning')
             display_name = request.form.get('display_name')
             device = request.form.get('device', 'auto') or 'auto'
             compute_type = request.form.get('compute_type', None)
@@ -2435,13 +3032,11 @@ def create_app():
                 room_name = f"job:{job_id}"
                 with job_update_lock:
                     job_update_queues.pop(room_name, None)
-                # Clear any stale job cache/meta across queues for reused job ids.
-                for queue_name in QUEUE_NAMES:
-                    try:
-                        queue = get_queue(queue_name)
-                        queue.remove_job(job_id)
-                    except Exception:
-                        continue
+                # Clear any stale job record/meta for reused job ids (shared by all queues).
+                try:
+                    get_queue('default').remove_job(job_id)
+                except Exception:
+                    pass
 
             if not filename:
                 filename = secure_filename(file.filename) if file else None
@@ -2462,15 +3057,15 @@ def create_app():
                 cleanup_paths.append(str(temp_dir))
 
             if not media_kind:
-                ext = Path(filename).suffix.lower().lstrip(".")
-                media_kind = "video" if ext in _VIDEO_EXTENSIONS else "audio"
+                media_kind = _media_kind_for(filename)
 
             media_size = None
             media_mtime = None
+            # The media fingerprint (and SHA-256 in strict mode) is computed in the
+            # background once the record exists; see native_history.identify_media.
             media_hash = None
             if input_path:
                 media_size, media_mtime = native_history.get_file_meta(input_path)
-                media_hash = native_history.compute_file_hash(input_path)
 
             try:
                 native_history.upsert_job_record({
@@ -2496,6 +3091,7 @@ def create_app():
                 'model_path': model,
                 'language': language,
                 'chinese_style': chinese_style,
+                'conditioning': conditioning,
                 'device': device,
                 'compute_type': compute_type,
                 'vad_filter': vad_filter,
@@ -2569,6 +3165,108 @@ def create_app():
             logger.error(traceback.format_exc())
             return jsonify({"error": "Internal server error", "details": str(e)}), 500
 
+    @app.route('/live/start', methods=['POST'])
+    def start_live_captions():
+        """Start live captioning of a streaming source (URL, device or growing file).
+
+        Captions are delivered through /job/<job_id>/poll with stage "live";
+        POST /job/<job_id>/terminate stops the session. Sessions run on a
+        dedicated thread (at most _MAX_LIVE_SESSIONS at once) so they never
+        hold the workers that process file jobs.
+        """
+        try:
+            data = request.get_json() or {}
+            source = str(data.get('source') or '').strip()
+            if not source:
+                return jsonify({"success": False, "error": "source is required"}), 400
+
+            model = data.get('model') or 'whisper'
+            if not resolve_whisper_model(model):
+                return jsonify({
+                    "success": False,
+                    "error": "Model assets not found. Use the in-app downloader."
+                }), 400
+
+            def _optional_seconds(key: str) -> Optional[float]:
+                value = data.get(key)
+                if value in (None, ''):
+                    return None
+                return max(0.5, float(value))
+
+            try:
+                window_seconds = _optional_seconds('window_seconds')
+                step_seconds = _optional_seconds('step_seconds')
+            except (TypeError, ValueError):
+                return jsonify({
+                    "success": False,
+                    "error": "window_seconds and step_seconds must be numbers"
+                }), 400
+
+            if not _live_session_slots.acquire(blocking=False):
+                return jsonify({
+                    "success": False,
+                    "error": f"At most {_MAX_LIVE_SESSIONS} live sessions can run at once"
+                }), 429
+
+            job_id = data.get('job_id') or str(uuid.uuid4())
+            language = data.get('language') or 'auto'
+            display_name = data.get('display_name')
+            try:
+                native_history.upsert_job_record({
+                    "job_id": job_id,
+                    "filename": Path(source).name or source,
+                    "display_name": display_name,
+                    "media_kind": "audio",
+                    "status": "processing",
+                    "language": language,
+                })
+            except Exception as record_error:
+                logger.debug("Failed to create live job record %s: %s", job_id, record_error)
+
+            try:
+                get_queue('low').start_dedicated(
+                    process_live_caption_job,
+                    kwargs={
+                    'job_id': job_id,
+                    'source': source,
+                    'model_path': model,
+                    'language': language,
+                    'chinese_style': data.get('chinese_style'),
+                    'realtime': bool(data.get('realtime')),
+                    'growing': bool(data.get('growing')),
+                    'window_seconds': window_seconds,
+                        'step_seconds': step_seconds,
+                        'display_name': display_name,
+                    },
+                    job_id=job_id,
+                    on_finish=_live_session_slots.release,
+                )
+            except Exception:
+                _live_session_slots.release()
+                raise
+            logger.info(f"Started live caption job {job_id} for {source}")
+
+            emit_update(f"job:{job_id}", 'job_update', {
+                'job_id': job_id,
+                'status': 'started',
+                'message': 'Live captioning starting',
+                'progress': 0,
+                'timestamp': time.time()
+            })
+
+            return jsonify({
+                "success": True,
+                "job_id": job_id,
+                "status": "started",
+                "websocket_channel": f"job:{job_id}",
+            })
+
+        except Exception as e:
+            logger.error(f"Error starting live captions: {e}")
+            import traceback
+            logger.error(traceback.format_exc())
+            return jsonify({"success": False, "error": "Failed to start live captioning"}), 500
+
     @app.route('/transcribe_only', methods=['POST'])
     def transcribe_only():
         """Alias for /transcribe (kept for compatibility)."""
@@ -2643,15 +3341,155 @@ def patch_job_handlers():
     native_job_handlers.update_job_progress = new_update_job_progress
 
 
-def start_server(app, port=11440, host='127.0.0.1'):
-    """Start the Flask server"""
+class _KeepAliveRequestHandler(WSGIRequestHandler):
+    """
+    HTTP/1.1 handler so clients can reuse connections. An idle connection
+    keeps its pool worker, so it is closed after the current request when
+    other connections are waiting for a worker or the server is stopping.
+    """
+    protocol_version = "HTTP/1.1"
+    timeout = _KEEPALIVE_TIMEOUT_SECONDS
+
+    def handle_one_request(self):
+        super().handle_one_request()
+        if self.server.connections_waiting() or self.server.stopping.is_set():
+            self.close_connection = True
+
+
+class _PooledWSGIServer(BaseWSGIServer):
+    """
+    Werkzeug server that hands accepted connections to a fixed set of worker
+    threads. When every worker is busy the accept loop waits, so excess
+    connections queue in the (bounded) listen backlog instead of spawning
+    a thread each.
+    """
+    multithread = True
+
+    def __init__(self, host: str, port: int, app, threads: int, backlog: int):
+        self.request_queue_size = backlog
+        super().__init__(host, port, app, handler=_KeepAliveRequestHandler)
+        self.stopping = threading.Event()
+        self._connections = Queue(maxsize=threads)
+        self._workers = [
+            threading.Thread(target=self._work, name=f"xcaption-http-{index}", daemon=True)
+            for index in range(threads)
+        ]
+        for worker in self._workers:
+            worker.start()
+
+    def connections_waiting(self) -> bool:
+        return not self._connections.empty()
+
+    def process_request(self, request, client_address):
+        self._connections.put((request, client_address))
+
+    def _work(self):
+        while True:
+            try:
+                request, client_address = self._connections.get(timeout=0.5)
+            except Empty:
+                # Exit only once every accepted connection has been served
+                if self.stopping.is_set():
+                    return
+                continue
+            try:
+                self.finish_request(request, client_address)
+            except Exception:
+                self.handle_error(request, client_address)
+            finally:
+                self.shutdown_request(request)
+
+    def drain(self, timeout: float = _SHUTDOWN_TIMEOUT_SECONDS):
+        """Let workers finish in-flight and queued requests, waiting at most *timeout*"""
+        self.stopping.set()
+        deadline = time.monotonic() + timeout
+        current = threading.current_thread()
+        for worker in self._workers:
+            if worker is not current:
+                worker.join(max(0.0, deadline - time.monotonic()))
+
+    def server_close(self):
+        super().server_close()
+        self.stopping.set()
+
+
+_active_server = None
+_active_server_lock = threading.Lock()
+
+
+def _env_int(name: str, default: int) -> int:
     try:
-        logger.info(f"Starting web server on {host}:{port}")
+        value = int(os.environ.get(name, default))
+    except (TypeError, ValueError):
+        return default
+    return value if value > 0 else default
+
+
+def start_server(app, port=11440, host='127.0.0.1', mode: Optional[str] = None):
+    """
+    Start the web server and block until it stops.
+    mode (or XCAPTION_SERVER) is "production" (default) or "dev". Production
+    uses waitress when it is installed, otherwise a thread-pooled Werkzeug
+    server; "dev" keeps Werkzeug's development server for scripts/dev.py.
+    """
+    global _active_server
+    mode = (mode or os.environ.get(_SERVER_MODE_ENV) or "production").strip().lower()
+    threads = _env_int(_SERVER_THREADS_ENV, _DEFAULT_SERVER_THREADS)
+    backlog = _env_int(_SERVER_BACKLOG_ENV, _DEFAULT_SERVER_BACKLOG)
+    try:
+        logger.info(f"Starting web server on {host}:{port} ({mode} mode)")
         logger.info("WebSocket emulation enabled (using HTTP polling)")
-        app.run(host=host, port=port, debug=False, threaded=True)
+        if mode == "dev":
+            app.run(host=host, port=port, debug=False, threaded=True)
+            return
+
+        if create_waitress_server is not None:
+            server = create_waitress_server(
+                app,
+                host=host,
+                port=port,
+                threads=threads,
+                backlog=backlog,
+                channel_timeout=_KEEPALIVE_TIMEOUT_SECONDS,
+                ident="X-Caption",
+            )
+            logger.info(f"Serving with waitress ({threads} threads, backlog {backlog})")
+            with _active_server_lock:
+                _active_server = server
+            server.run()
+            return
+
+        server = _PooledWSGIServer(host, port, app, threads=threads, backlog=backlog)
+        logger.info(f"Serving with pooled Werkzeug server ({threads} threads, backlog {backlog})")
+        with _active_server_lock:
+            _active_server = server
+        # serve_forever() closes the server (and drains the pool) when it returns
+        server.serve_forever()
     except Exception as e:
         logger.error(f"Failed to start server: {e}")
         raise
+    finally:
+        with _active_server_lock:
+            _active_server = None
+
+
+def stop_server():
+    """Stop accepting connections and let in-flight requests finish (bounded wait)"""
+    with _active_server_lock:
+        server = _active_server
+    if server is None:
+        return
+    # Open /events streams would otherwise hold their workers until the deadline
+    native_events.close_all()
+    try:
+        if isinstance(server, _PooledWSGIServer):
+            server.shutdown()
+            server.drain()
+        else:
+            server.close()
+            server.task_dispatcher.shutdown(timeout=_SHUTDOWN_TIMEOUT_SECONDS)
+    except Exception as e:
+        logger.warning(f"Error while stopping web server: {e}")
 
 
 if __name__ == '__main__':
@@ -0,0 +1,143 @@
+#!/usr/bin/env python3
+"""
+Compare Cantonese style conditioning modes:
+- audio: prepend the style prefix clip (+ silence) and trim it afterwards
+- prompt: pass the equivalent style prompt to whisper.cpp and skip the prefix
+
+Reports wall time, transcription time and how closely the two outputs agree
+(and, when reference transcripts are given, the character error rate of each).
+"""
+
+from __future__ import annotations
+
+import argparse
+import difflib
+import json
+import sys
+import time
+import uuid
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+MODES = ("audio", "prompt")
+
+
+def _repo_root() -> Path:
+    return Path(__file__).resolve().parent.parent
+
+
+def _normalize_text(text: str) -> str:
+    return "".join(ch for ch in (text or "") if not ch.isspace())
+
+
+def _run_mode(file_path: Path, mode: str, args: argparse.Namespace) -> Dict[str, Any]:
+    import native_history
+    from native_job_handlers import process_transcription_job
+
+    job_id = f"bench-{mode}-{uuid.uuid4().hex[:8]}"
+    started = time.perf_counter()
+    try:
+        result = process_transcription_job(
+            job_id=job_id,
+            file_path=str(file_path),
+            language=args.language,
+            chinese_style=args.chinese_style,
+            send_completion=False,
+            conditioning=mode,
+        )
+    finally:
+        try:
+            native_history.remove_entry(job_id)
+        except Exception:
+            pass
+    wall_time = time.perf_counter() - started
+    return {
+        "wall_time": round(wall_time, 2),
+        "transcription_time": result.get("transcription_time"),
+        "segment_count": result.get("segment_count"),
+        "text": result.get("text") or "",
+        "conditioning": result.get("conditioning"),
+    }
+
+
+def _load_reference(file_path: Path, reference_dir: Optional[Path]) -> Optional[str]:
+    if not reference_dir:
+        return None
+    candidate = reference_dir / f"{file_path.stem}.txt"
+    if not candidate.exists():
+        return None
+    return candidate.read_text(encoding="utf-8")
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Benchmark audio-prefix vs text-prompt conditioning.")
+    parser.add_argument("files", nargs="+", help="Media files to transcribe with both modes.")
+    parser.add_argument("--language", default="yue", help="Language passed to the pipeline (default: yue).")
+    parser.add_argument("--chinese-style", default="written", choices=["written", "spoken"])
+    parser.add_argument(
+        "--reference-dir",
+        default=None,
+        help="Directory of <stem>.txt reference transcripts for CER scoring.",
+    )
+    parser.add_argument("--json", action="store_true", help="Print the full report as JSON.")
+    args = parser.parse_args()
+
+    sys.path.insert(0, str(_repo_root()))
+    from native_config import setup_environment
+
+    setup_environment()
+    reference_dir = Path(args.reference_dir) if args.reference_dir else None
+
+    report: List[Dict[str, Any]] = []
+    totals = {mode: 0.0 for mode in MODES}
+    for raw_path in args.files:
+        file_path = Path(raw_path).resolve()
+        if not file_path.exists():
+            print(f"[SKIP] {file_path} does not exist", file=sys.stderr)
+            continue
+        runs = {mode: _run_mode(file_path, mode, args) for mode in MODES}
+        for mode in MODES:
+            totals[mode] += runs[mode]["wall_time"]
+        similarity = difflib.SequenceMatcher(
+            None,
+            _normalize_text(runs["audio"]["text"]),
+            _normalize_text(runs["prompt"]["text"]),
+        ).ratio()
+        reference = _load_reference(file_path, reference_dir)
+        entry: Dict[str, Any] = {
+            "file": str(file_path),
+            "similarity": round(similarity, 4),
+            "runs": runs,
+        }
+        if reference is not None:
+            from native_calibration import character_error_rate
+
+            for mode in MODES:
+                cer = character_error_rate(runs[mode]["text"], reference)
+                runs[mode]["cer"] = round(cer, 4) if cer is not None else None
+        report.append(entry)
+
+        if not args.json:
+            print(f"{file_path.name}")
+            for mode in MODES:
+                run = runs[mode]
+                cer_label = f"  cer={run['cer']}" if "cer" in run else ""
+                print(
+                    f"  {mode:<6} wall={run['wall_time']}s "
+                    f"transcribe={run['transcription_time']}s "
+                    f"segments={run['segment_count']}{cer_label}"
+                )
+            print(f"  similarity={entry['similarity']}")
+
+    if args.json:
+        print(json.dumps({"files": report, "totals": totals}, ensure_ascii=False, indent=2))
+    elif report:
+        audio_total = totals["audio"]
+        prompt_total = totals["prompt"]
+        saved = (1 - prompt_total / audio_total) * 100 if audio_total else 0.0
+        print(f"Total: audio={audio_total:.2f}s prompt={prompt_total:.2f}s ({saved:.1f}% less wall time)")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
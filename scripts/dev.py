@@ -154,6 +154,8 @@ def main() -> int:
     port = _pick_free_port(args.host, args.port)
     ui_url = f"http://{args.host}:{port}/static/ui/"
     env["XCAPTION_UI_DEV_URL"] = ui_url
+    # Keep Werkzeug's development server while iterating locally.
+    env.setdefault("XCAPTION_SERVER", "dev")
 
     print(f"[DEV] Starting Vite dev server at {ui_url} ...")
     vite_cmd = _vite_cmd(ui_dir)
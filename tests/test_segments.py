@@ -0,0 +1,14 @@
+from native_segments import SegmentTable
+
+
+def test_shifted_clamps_words_to_upper_bound():
+    table = SegmentTable.from_dicts([
+        {"start": 0.0, "end": 12.0, "text": "hi", "words": [{"word": "hi", "start": 9.0, "end": 11.5}, {"word": "x"}]},
+    ])
+
+    (segment,) = table.shifted(100.0, upper=110.0).to_dicts()
+
+    assert (segment["start"], segment["end"]) == (100.0, 110.0)
+    assert segment["words"][0] == {"word": "hi", "start": 109.0, "end": 110.0}
+    # Words without timings stay without them.
+    assert segment["words"][1] == {"word": "x"}
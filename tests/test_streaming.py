@@ -0,0 +1,55 @@
+import io
+
+import native_job_handlers
+import native_streaming as streaming
+
+
+class _FakeDecoder:
+    def __init__(self, seconds):
+        self.stdout = io.BytesIO(b"\0" * int(seconds * streaming._BYTES_PER_SECOND))
+        self.returncode = 0
+
+    def poll(self):
+        return 0
+
+    def terminate(self):
+        pass
+
+    def wait(self, timeout=None):
+        return 0
+
+    def kill(self):
+        pass
+
+
+def test_capped_window_spanned_by_one_segment_still_advances(monkeypatch):
+    calls = []
+
+    def transcribe_window(pcm, offset, **kwargs):
+        calls.append(offset)
+        assert len(calls) < 50, "stream stopped making progress"
+        end = offset + len(pcm) / streaming._BYTES_PER_SECOND
+        # One segment covering the whole window, ending inside the holdback.
+        return {"segments": [{"start": offset, "end": end - 0.5, "text": "la la la", "words": []}], "language": "en"}
+
+    monkeypatch.setattr(streaming, "_transcribe_window", transcribe_window)
+    monkeypatch.setattr(streaming, "_is_canceled", lambda job_id: False)
+    monkeypatch.setattr(native_job_handlers, "update_job_progress", lambda *args, **kwargs: None)
+
+    outcome = streaming._caption_stream(
+        "job",
+        _FakeDecoder(95.0),
+        model_path=None,
+        language="en",
+        chinese_style=None,
+        window_seconds=streaming._IMPORT_WINDOW_SECONDS,
+        step_seconds=streaming._IMPORT_WINDOW_SECONDS - streaming._HOLDBACK_SECONDS,
+        max_window_seconds=streaming._IMPORT_WINDOW_SECONDS,
+        skip_lag=False,
+        stage="transcription",
+    )
+
+    assert outcome["audio_duration"] == 95.0
+    assert outcome["segments"]
+    starts = [segment["start"] for segment in outcome["segments"]]
+    assert starts == sorted(starts)
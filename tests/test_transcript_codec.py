@@ -0,0 +1,25 @@
+import native_transcript_codec as codec
+
+
+def test_round_trip_with_raw_segments_and_null_text():
+    transcript = {
+        "text": None,
+        "language": "en",
+        "segments": [
+            {"id": "a", "start": 0, "end": 1, "text": "x"},
+            {"id": 2, "start": 1.5, "end": 2.25, "text": "hello", "words": [{"word": "hello", "start": 1.5, "end": 2.25, "probability": 0.9}]},
+        ],
+    }
+    assert codec.decode_transcript(codec.encode_transcript(transcript)) == transcript
+
+
+def test_round_trip_rebuilds_joined_text():
+    transcript = {
+        "text": "one two",
+        "segments": [
+            {"id": 1, "start": 0.0, "end": 1.0, "text": "one", "words": []},
+            {"id": 2, "start": 1.0, "end": 2.0, "text": "two", "words": []},
+        ],
+    }
+    blob = codec.encode_transcript(transcript)
+    assert codec.decode_value(blob) == transcript
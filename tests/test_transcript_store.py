@@ -0,0 +1,121 @@
+import sqlite3
+
+import pytest
+
+import native_transcript_store as store
+
+
+def _segments(count):
+    return [{"id": index + 1, "start": float(index), "end": index + 0.5, "text": f"line {index}"} for index in range(count)]
+
+
+@pytest.fixture
+def conn():
+    connection = sqlite3.connect(":memory:")
+    connection.execute(
+        """
+        CREATE TABLE job_records (
+            job_id TEXT PRIMARY KEY, status TEXT, segment_count INTEGER, transcript_preview TEXT,
+            updated_at REAL, sort_key REAL, changed_at REAL
+        )
+        """
+    )
+    store.ensure_tables(connection)
+    yield connection
+    connection.close()
+
+
+def _write(conn, job_id, segments):
+    conn.execute("INSERT INTO job_records (job_id) VALUES (?)", (job_id,))
+    store.write_transcript(conn, job_id, {"text": "", "segments": segments}, "", 0.0)
+
+
+def test_batch_larger_than_journal_limit_is_undone_whole(conn):
+    count = store.JOURNAL_LIMIT + 100
+    _write(conn, "job", _segments(count))
+
+    store.apply_batch(conn, "job", [{"op": "shift_range", "delta": 2.0}])
+    assert [segment["start"] for segment in store.load_segments(conn, "job")] == [index + 2.0 for index in range(count)]
+
+    result = store.undo(conn, "job")
+    assert result is not None
+    assert len(result["changes"]) == count
+    assert [segment["start"] for segment in store.load_segments(conn, "job")] == [float(index) for index in range(count)]
+
+    # The undone batch can still be redone.
+    assert store.redo(conn, "job") is not None
+    assert store.load_segments(conn, "job")[0]["start"] == 2.0
+
+
+def test_journal_is_trimmed_by_whole_transactions(conn):
+    _write(conn, "job", _segments(3))
+    for index in range(store.JOURNAL_LIMIT + 200):
+        store.update_segment(conn, "job", 1, {"text": f"edit {index}"})
+    store.apply_batch(conn, "job", [{"op": "edit", "segment_id": seg_id, "text": "batch"} for seg_id in (1, 2, 3)])
+
+    count, = conn.execute("SELECT COUNT(*) FROM transcript_ops WHERE job_id = 'job'").fetchone()
+    assert count <= store.JOURNAL_LIMIT + store._JOURNAL_COMPACT_EVERY
+    sizes = conn.execute("SELECT txn, COUNT(*) FROM transcript_ops WHERE job_id = 'job' GROUP BY txn").fetchall()
+    assert sizes[-1][1] == 3
+
+    store.undo(conn, "job")
+    assert {segment["text"] for segment in store.load_segments(conn, "job")} == {
+        f"edit {store.JOURNAL_LIMIT + 199}",
+        "line 1",
+        "line 2",
+    }
+
+
+def test_ripple_batch_over_journal_limit_is_undone_in_one_step(conn):
+    count = store.JOURNAL_LIMIT + 50
+    _write(conn, "job", _segments(count))
+    store.update_segment(conn, "job", 1, {"text": "earlier edit"})
+
+    store.apply_batch(conn, "job", [
+        {"op": "shift_range", "start": 10.0, "delta": 0.25},
+        {"op": "merge", "segment_ids": list(range(1, count // 2))},
+    ])
+    assert len(store.load_segments(conn, "job")) == count - (count // 2 - 2)
+
+    store.undo(conn, "job")
+    segments = store.load_segments(conn, "job")
+    assert len(segments) == count
+    assert segments[0]["text"] == "earlier edit"
+    assert [segment["start"] for segment in segments] == [float(index) for index in range(count)]
+
+
+def test_splice_range_is_one_undoable_edit_over_current_rows(conn):
+    _write(conn, "job", _segments(5))
+    store.update_segment(conn, "job", 5, {"text": "edited meanwhile"})
+
+    spliced = store.splice_range(conn, "job", 1.0, 3.0, [
+        {"start": 1.0, "end": 2.0, "text": "new a"},
+        {"start": 2.0, "end": 3.0, "text": "new b"},
+    ])
+    assert spliced["removed_ids"] == [2, 3]
+    assert [segment["id"] for segment in spliced["segments"]] == [6, 7]
+    assert [segment["text"] for segment in store.load_segments(conn, "job")] == [
+        "line 0", "new a", "new b", "line 3", "edited meanwhile",
+    ]
+
+    store.undo(conn, "job")
+    assert [segment["text"] for segment in store.load_segments(conn, "job")] == [
+        "line 0", "line 1", "line 2", "line 3", "edited meanwhile",
+    ]
+    # Earlier history survives the splice.
+    store.undo(conn, "job")
+    assert store.load_segments(conn, "job")[-1]["text"] == "line 4"
+
+
+def test_insert_with_taken_id_is_rejected(conn):
+    _write(conn, "job", _segments(3))
+
+    with pytest.raises(store.SegmentExistsError):
+        store.insert_segment(conn, "job", {"id": 2, "start": 9.0, "end": 9.5, "text": "stale"})
+    assert store.get_segment(conn, "job", 2)["text"] == "line 1"
+
+    with pytest.raises(store.SegmentExistsError, match="operation 0"):
+        store.apply_batch(conn, "job", [{"op": "add", "segment_id": 3, "start": 9.0, "end": 9.5, "text": "stale"}])
+
+    added = store.insert_segment(conn, "job", {"start": 9.0, "end": 9.5, "text": "fresh"})
+    assert added["id"] == 4
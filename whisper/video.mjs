@@ -333,7 +333,7 @@ const transcribeAudio = async (audioPath, options = {}) => {
             comma_in_time: false,
             translate: false,
             no_timestamps: false,
-            detect_language: false,
+            detect_language: Boolean(options.detect_language),
             audio_ctx: 0,
             max_len: 0,
             progress_callback: wrappedProgressCallback
@@ -6,11 +6,14 @@ import os
 import re
 import shutil
 import subprocess
+import sys
+from collections import deque
 from pathlib import Path
-from typing import Optional, List, Dict, Any
+from typing import Optional, List, Dict, Any, Iterator
 
 from native_config import get_models_dir, get_bundle_dir, get_data_dir, get_bundled_models_dir
 from model_manager import get_whisper_model_info
+from native_calibration import get_calibrated_settings
 
 try:
     from native_gpu_detection import get_whisper_gpu_flags, is_gpu_available
@@ -25,6 +28,13 @@ logger = logging.getLogger(__name__)
 _PROGRESS_MARKER = "__XCAPTION_PROGRESS__"
 _JSON_MARKER = "__XCAPTION_JSON__"
 _LEGACY_JSON_MARKER = "__XSUB_JSON__"
+_SEGMENT_MARKER = "__XCAPTION_SEGMENT__"
+# Only the tail of the engine log is kept for error reporting.
+_OUTPUT_TAIL_LINES = 200
+_JSON_READ_CHUNK = 64 * 1024
+_JSON_HEADER_LIMIT = 4 * 1024 * 1024
+_JSON_ARRAY_KEY_REGEX = re.compile(r'"(?:transcription|segments)"\s*:\s*\[')
+_JSON_LANGUAGE_REGEX = re.compile(r'"language"\s*:\s*"([^"]*)"')
 _PROGRESS_REGEX = re.compile(r"(?i)progress[^0-9]{0,20}([0-9]{1,3}(?:\.[0-9]+)?)")
 _PERCENT_REGEX = re.compile(r"([0-9]{1,3}(?:\.[0-9]+)?)%")
 
@@ -64,7 +74,13 @@ def _stream_process_output(
     progress_message: str = "Transcribing audio...",
     json_marker: Optional[str] = None,
     env: Optional[dict[str, str]] = None,
+    line_callback=None,
 ) -> tuple[int, str, Optional[str]]:
+    """Run *cmd* and return (return code, tail of its output, JSON marker payload).
+
+    Only the last ``_OUTPUT_TAIL_LINES`` lines are retained. Lines consumed by
+    *line_callback* (it returns True) and JSON marker lines are not kept.
+    """
     proc = subprocess.Popen(
         cmd,
         stdout=subprocess.PIPE,
@@ -75,7 +91,7 @@ def _stream_process_output(
         bufsize=1,
         env=env,
     )
-    output_lines: list[str] = []
+    output_lines: deque[str] = deque(maxlen=_OUTPUT_TAIL_LINES)
     json_payload: Optional[str] = None
     last_progress: Optional[int] = None
 
@@ -86,10 +102,12 @@ def _stream_process_output(
             for line in raw.splitlines():
                 if not line:
                     continue
-                output_lines.append(line)
                 if json_marker and json_marker in line:
                     json_payload = line.split(json_marker, 1)[-1].strip()
                     continue
+                if line_callback and line_callback(line):
+                    continue
+                output_lines.append(line)
                 progress = _extract_progress(line)
                 if progress_callback and progress is not None:
                     if last_progress is None or progress > last_progress:
@@ -105,31 +123,128 @@ def _platform_exe_name(base: str) -> str:
     return base
 
 
-def resolve_whisper_engine() -> Optional[Path]:
+# Engine builds tagged by instruction set, fastest first. Each entry lists the
+# CPU flags (as named in /proc/cpuinfo) the build requires.
+_ENGINE_VARIANTS: tuple[tuple[str, frozenset[str]], ...] = (
+    ("avx512", frozenset({"avx512f", "avx512bw", "avx512vl", "avx2", "fma"})),
+    ("avx2", frozenset({"avx2", "fma", "f16c"})),
+    ("avx", frozenset({"avx"})),
+)
+_SYSCTL_FEATURE_ALIASES = {"avx1.0": "avx", "fma": "fma", "f16c": "f16c"}
+# Windows PF_* constants for IsProcessorFeaturePresent.
+_WINDOWS_FEATURES = {"avx": 39, "avx2": 40, "avx512f": 41}
+_engine_cache: Dict[str, Any] = {}
+_cpu_features_cache: Optional[frozenset[str]] = None
+
+
+def _read_cpu_features() -> frozenset[str]:
+    features: set[str] = set()
+    if sys.platform.startswith("linux"):
+        try:
+            with open("/proc/cpuinfo", "r", encoding="utf-8", errors="ignore") as handle:
+                for line in handle:
+                    if line.startswith("flags"):
+                        features.update(line.split(":", 1)[-1].split())
+                        break
+        except OSError:
+            pass
+    elif sys.platform == "darwin":
+        try:
+            result = subprocess.run(
+                ["sysctl", "-n", "machdep.cpu.features", "machdep.cpu.leaf7_features"],
+                capture_output=True,
+                text=True,
+                timeout=5,
+            )
+            for token in result.stdout.lower().split():
+                features.add(_SYSCTL_FEATURE_ALIASES.get(token, token))
+        except (OSError, subprocess.TimeoutExpired):
+            pass
+    elif os.name == "nt":
+        try:
+            import ctypes
+
+            is_present = ctypes.windll.kernel32.IsProcessorFeaturePresent  # type: ignore[attr-defined]
+            for name, feature_id in _WINDOWS_FEATURES.items():
+                if is_present(feature_id):
+                    features.add(name)
+            if "avx2" in features:
+                # Every AVX2-capable CPU also ships FMA3/F16C; Windows exposes no PF_ flag for them.
+                features.update({"fma", "f16c"})
+            if "avx512f" in features:
+                features.update({"avx512bw", "avx512vl"})
+        except Exception:
+            pass
+    return frozenset(features)
+
+
+def get_cpu_features() -> frozenset[str]:
+    global _cpu_features_cache
+    if _cpu_features_cache is None:
+        _cpu_features_cache = _read_cpu_features()
+        logger.debug("Detected CPU features: %s", " ".join(sorted(_cpu_features_cache)))
+    return _cpu_features_cache
+
+
+def _engine_variant_names() -> List[tuple[str, Optional[str]]]:
+    """Return (binary name, variant) pairs the host can run, fastest first."""
+    features = get_cpu_features()
+    names: List[tuple[str, Optional[str]]] = []
+    for variant, required in _ENGINE_VARIANTS:
+        if required <= features:
+            names.append((_platform_exe_name(f"engine-{variant}"), variant))
+    names.append((_platform_exe_name("engine"), None))
+    names.append((_platform_exe_name("whisper"), None))
+    return names
+
+
+def _find_whisper_engine() -> tuple[Optional[Path], Optional[str]]:
     env_path = os.environ.get("XCAPTION_WHISPER_ENGINE")
-    candidates: List[Path] = []
     if env_path:
-        candidates.append(Path(env_path))
+        candidate = Path(env_path)
+        if candidate.exists() and candidate.is_file():
+            return candidate, None
 
-    models_dir = get_models_dir()
-    candidates.append(models_dir / _platform_exe_name("engine"))
-    candidates.append(models_dir / _platform_exe_name("whisper"))
+    bundle_dir = get_bundle_dir()
+    engine_dirs = [
+        get_models_dir(),
+        get_data_dir() / "models" / "whisper",
+        bundle_dir / "whisper",
+        bundle_dir / "Resources" / "whisper",
+    ]
+    variant_names = _engine_variant_names()
+    for engine_dir in engine_dirs:
+        for name, variant in variant_names:
+            candidate = engine_dir / name
+            if candidate.exists() and candidate.is_file():
+                return candidate, variant
+
+    for candidate in (bundle_dir / "whisper" / "video.mjs", bundle_dir / "Resources" / "whisper" / "video.mjs"):
+        if candidate.exists() and candidate.is_file():
+            return candidate, None
+    return None, None
 
-    legacy_models_dir = get_data_dir() / "models" / "whisper"
-    candidates.append(legacy_models_dir / _platform_exe_name("engine"))
-    candidates.append(legacy_models_dir / _platform_exe_name("whisper"))
 
-    bundle_dir = get_bundle_dir()
-    candidates.append(bundle_dir / "whisper" / _platform_exe_name("engine"))
-    candidates.append(bundle_dir / "whisper" / _platform_exe_name("whisper"))
-    candidates.append(bundle_dir / "Resources" / "whisper" / _platform_exe_name("engine"))
-    candidates.append(bundle_dir / "whisper" / "video.mjs")
-    candidates.append(bundle_dir / "Resources" / "whisper" / "video.mjs")
+def resolve_whisper_engine() -> Optional[Path]:
+    cache_key = os.environ.get("XCAPTION_WHISPER_ENGINE", "")
+    cached_path = _engine_cache.get("path")
+    if _engine_cache.get("key") == cache_key and cached_path is not None and cached_path.is_file():
+        return cached_path
+
+    engine, variant = _find_whisper_engine()
+    if engine is None:
+        _engine_cache.clear()
+        return None
+    _engine_cache.update({"key": cache_key, "path": engine, "variant": variant})
+    logger.info("Using whisper engine %s (variant: %s)", engine, variant or "generic")
+    return engine
 
-    for candidate in candidates:
-        if candidate and candidate.exists() and candidate.is_file():
-            return candidate
-    return None
+
+def get_whisper_engine_variant() -> Optional[str]:
+    """Return the instruction-set variant of the resolved engine (None for generic builds)."""
+    if resolve_whisper_engine() is None:
+        return None
+    return _engine_cache.get("variant")
 
 
 def resolve_node_binary() -> Optional[str]:
@@ -203,6 +318,73 @@ def resolve_whisper_model(model_path: Optional[str] = None) -> Optional[Path]:
     return None
 
 
+def _resolve_calibrated_model(model_path: Optional[str], calibrated: Dict[str, Any]) -> Optional[Path]:
+    """Prefer the calibrated model unless the caller asked for a specific model file."""
+    if model_path and Path(model_path).suffix.lower() == ".bin":
+        return resolve_whisper_model(model_path)
+    calibrated_model = calibrated.get("model_path")
+    if calibrated_model and Path(calibrated_model).is_file():
+        return Path(calibrated_model)
+    return resolve_whisper_model(model_path)
+
+
+def _calibrated_thread_flags(calibrated: Dict[str, Any]) -> list[str]:
+    flags: list[str] = []
+    if calibrated.get("threads"):
+        flags.extend(["-t", str(int(calibrated["threads"]))])
+    if calibrated.get("processors") and int(calibrated["processors"]) > 1:
+        flags.extend(["-p", str(int(calibrated["processors"]))])
+    return flags
+
+
+def _build_node_script(engine: Path, audio_path: Path, options: Dict[str, Any]) -> str:
+    return f"""
+import {{ pathToFileURL }} from 'url';
+const moduleUrl = pathToFileURL({json.dumps(str(engine))}).href;
+const {{ transcribeAudio }} = await import(moduleUrl);
+const progressMarker = {json.dumps(_PROGRESS_MARKER)};
+const progressCallback = (progress) => {{
+  if (typeof progress === 'number' && Number.isFinite(progress)) {{
+    const rounded = Math.round(progress);
+    console.log(`${{progressMarker}}${{rounded}}`);
+  }}
+}};
+const result = await transcribeAudio({json.dumps(str(audio_path))}, {{
+  ...{json.dumps(options, ensure_ascii=False)},
+  progress_callback: progressCallback
+}});
+// Emit one line per segment so the reader never holds the whole transcript as one string.
+let payload = result;
+if (typeof payload === 'string') {{
+  try {{ payload = JSON.parse(payload); }} catch (err) {{ payload = {{}}; }}
+}}
+const meta = {{}};
+let items = [];
+if (Array.isArray(payload)) {{
+  items = payload;
+}} else if (payload && typeof payload === 'object') {{
+  for (const [key, value] of Object.entries(payload)) {{
+    if (Array.isArray(value) && ['segments', 'result', 'transcription'].includes(key)) {{
+      if (!items.length) items = value;
+    }} else {{
+      meta[key] = value;
+    }}
+  }}
+}}
+for (const item of items) {{
+  console.log({json.dumps(_SEGMENT_MARKER)} + JSON.stringify(item));
+}}
+console.log('{_JSON_MARKER}' + JSON.stringify(meta));
+""".strip()
+
+
+def _build_node_env() -> dict[str, str]:
+    env = os.environ.copy()
+    if not is_gpu_available():
+        env["XCAPTION_FORCE_CPU"] = "1"
+    return env
+
+
 def _parse_srt_timestamp(value: str) -> Optional[float]:
     try:
         parts = value.replace(",", ":").split(":")
@@ -257,6 +439,99 @@ def _coerce_time(value: Any) -> float:
     return 0.0
 
 
+def _segment_from_item(seg: Any) -> Optional[Dict[str, Any]]:
+    if isinstance(seg, (list, tuple)) and len(seg) >= 3:
+        return {
+            "start": _coerce_time(seg[0]),
+            "end": _coerce_time(seg[1]),
+            "text": str(seg[2]).strip(),
+        }
+    if not isinstance(seg, dict):
+        return None
+    offsets = seg.get("offsets")
+    timestamps = seg.get("timestamps")
+    if isinstance(offsets, dict):
+        # whisper.cpp -oj output: offsets are integer milliseconds.
+        start = _coerce_time(offsets.get("from")) / 1000.0
+        end = _coerce_time(offsets.get("to")) / 1000.0
+    elif isinstance(timestamps, dict):
+        start = _coerce_time(timestamps.get("from"))
+        end = _coerce_time(timestamps.get("to"))
+    else:
+        start = _coerce_time(seg.get("start", seg.get("from", 0.0)))
+        end = _coerce_time(seg.get("end", seg.get("to", 0.0)))
+    text = seg.get("text") or seg.get("text_segment") or seg.get("content") or ""
+    return {"start": start, "end": end, "text": str(text).strip()}
+
+
+def _segments_from_payload(parsed: Any) -> List[Dict[str, Any]]:
+    raw_segments: Any = []
+    if isinstance(parsed, dict):
+        raw_segments = parsed.get("segments") or parsed.get("result") or parsed.get("transcription") or []
+    elif isinstance(parsed, list):
+        raw_segments = parsed
+    if not isinstance(raw_segments, list):
+        return []
+    segments: List[Dict[str, Any]] = []
+    for seg in raw_segments:
+        segment = _segment_from_item(seg)
+        if segment is not None:
+            segments.append(segment)
+    return segments
+
+
+def _iter_whisper_json_segments(json_path: Path, info: Dict[str, Any]) -> Iterator[Dict[str, Any]]:
+    """Yield segments from a whisper JSON file without loading the whole document.
+
+    The header before the segment array is scanned for ``"language"`` (the
+    last occurrence wins, so ``result.language`` beats ``params.language``)
+    and stored in *info*. Array items are then decoded one at a time.
+    """
+    decoder = json.JSONDecoder()
+    with json_path.open("r", encoding="utf-8", errors="replace") as handle:
+        buffer = ""
+        match = None
+        while match is None:
+            chunk = handle.read(_JSON_READ_CHUNK)
+            if not chunk:
+                return
+            buffer += chunk
+            match = _JSON_ARRAY_KEY_REGEX.search(buffer)
+            if match is None and len(buffer) > _JSON_HEADER_LIMIT:
+                return
+        for language_match in _JSON_LANGUAGE_REGEX.finditer(buffer, 0, match.start()):
+            info["language"] = language_match.group(1)
+
+        buffer = buffer[match.end():]
+        eof = False
+        while True:
+            position = 0
+            while position < len(buffer) and buffer[position] in " \t\r\n,":
+                position += 1
+            buffer = buffer[position:]
+            if buffer.startswith("]"):
+                return
+            if buffer:
+                try:
+                    item, end = decoder.raw_decode(buffer)
+                except json.JSONDecodeError:
+                    if eof:
+                        raise
+                else:
+                    buffer = buffer[end:]
+                    segment = _segment_from_item(item)
+                    if segment is not None:
+                        yield segment
+                    continue
+            if eof:
+                return
+            chunk = handle.read(_JSON_READ_CHUNK)
+            if chunk:
+                buffer += chunk
+            else:
+                eof = True
+
+
 def _parse_srt_segments(srt_text: str) -> List[Dict[str, Any]]:
     segments: List[Dict[str, Any]] = []
     blocks = [block.strip() for block in srt_text.strip().split("\n\n") if block.strip()]
@@ -287,6 +562,7 @@ def transcribe_whisper_cpp(
     language: Optional[str] = None,
     output_dir: Optional[Path] = None,
     progress_callback=None,
+    prompt: Optional[str] = None,
 ) -> Dict[str, Any]:
     engine = resolve_whisper_engine()
     if not engine:
@@ -295,7 +571,8 @@ def transcribe_whisper_cpp(
             "or add the node-based engine module, or set XCAPTION_WHISPER_ENGINE to the path."
         )
 
-    model_file = resolve_whisper_model(model_path)
+    calibrated = get_calibrated_settings()
+    model_file = _resolve_calibrated_model(model_path, calibrated)
     if not model_file:
         raise RuntimeError(
             "Model assets not found. "
@@ -324,31 +601,36 @@ def transcribe_whisper_cpp(
             raise RuntimeError(
                 "Node.js runtime not found. Install Node.js or set XCAPTION_NODE to its path."
             )
-        progress_marker = _PROGRESS_MARKER
-        json_marker = _JSON_MARKER
-        node_script = f"""
-import {{ pathToFileURL }} from 'url';
-const moduleUrl = pathToFileURL({json.dumps(str(engine))}).href;
-const {{ transcribeAudio }} = await import(moduleUrl);
-const progressMarker = {json.dumps(progress_marker)};
-const progressCallback = (progress) => {{
-  if (typeof progress === 'number' && Number.isFinite(progress)) {{
-    const rounded = Math.round(progress);
-    console.log(`${{progressMarker}}${{rounded}}`);
-  }}
-}};
-const result = await transcribeAudio({json.dumps(str(audio_path))}, {{
-  model: {json.dumps(str(model_file))},
-  language: {json.dumps(language or 'auto')},
-  progress_callback: progressCallback
-}});
-console.log('{json_marker}' + JSON.stringify(result));
-""".strip()
+        node_script = _build_node_script(
+            engine,
+            audio_path,
+            {
+                "model": str(model_file),
+                "language": language or "auto",
+                "prompt": prompt or "",
+            },
+        )
         cmd = [node_bin, "--input-type=module", "-e", node_script]
         logger.info("Running whisper node runner: %s", " ".join(cmd))
-        env = os.environ.copy()
-        if not is_gpu_available():
-            env["XCAPTION_FORCE_CPU"] = "1"
+        env = _build_node_env()
+
+        segments: List[Dict[str, Any]] = []
+        legacy_payload: List[str] = []
+
+        def _handle_line(line: str) -> bool:
+            if _SEGMENT_MARKER in line:
+                try:
+                    item = json.loads(line.split(_SEGMENT_MARKER, 1)[-1].strip())
+                except Exception:
+                    return True
+                segment = _segment_from_item(item)
+                if segment is not None:
+                    segments.append(segment)
+                return True
+            if _LEGACY_JSON_MARKER in line:
+                legacy_payload[:] = [line.split(_LEGACY_JSON_MARKER, 1)[-1].strip()]
+                return True
+            return False
 
         return_code, output, json_payload = _stream_process_output(
             cmd,
@@ -356,28 +638,20 @@ console.log('{json_marker}' + JSON.stringify(result));
             progress_message="Transcribing audio...",
             json_marker=_JSON_MARKER,
             env=env,
+            line_callback=_handle_line,
         )
         if return_code != 0:
             details = output.strip() or "Unknown error"
             raise RuntimeError(f"Transcription runner failed: {details}")
 
         parsed = None
-        if json_payload:
+        for payload in ([json_payload] if json_payload else []) + legacy_payload:
             try:
-                parsed = json.loads(json_payload)
+                parsed = json.loads(payload)
+                break
             except Exception:
-                parsed = None
-        if parsed is None:
-            for line in output.splitlines()[::-1]:
-                if _JSON_MARKER in line or _LEGACY_JSON_MARKER in line:
-                    marker = _JSON_MARKER if _JSON_MARKER in line else _LEGACY_JSON_MARKER
-                    payload = line.split(marker, 1)[-1].strip()
-                    try:
-                        parsed = json.loads(payload)
-                        break
-                    except Exception:
-                        continue
-        if parsed is None:
+                continue
+        if parsed is None and not segments:
             raise RuntimeError("Transcription runner returned no JSON output")
 
         if isinstance(parsed, str):
@@ -386,36 +660,10 @@ console.log('{json_marker}' + JSON.stringify(result));
             except Exception:
                 pass
 
-        segments: List[Dict[str, Any]] = []
-        detected_language = None
-        if isinstance(parsed, dict):
-            detected_language = parsed.get("language")
-            raw_segments = parsed.get("segments") or parsed.get("result") or parsed.get("transcription") or []
-            if isinstance(raw_segments, list):
-                for seg in raw_segments:
-                    if isinstance(seg, (list, tuple)) and len(seg) >= 3:
-                        segments.append({
-                            "start": _coerce_time(seg[0]),
-                            "end": _coerce_time(seg[1]),
-                            "text": str(seg[2]).strip(),
-                        })
-                    elif isinstance(seg, dict):
-                        start = seg.get("start", seg.get("from", 0.0))
-                        end = seg.get("end", seg.get("to", 0.0))
-                        text = seg.get("text") or seg.get("text_segment") or seg.get("content") or ""
-                        segments.append({
-                            "start": _coerce_time(start),
-                            "end": _coerce_time(end),
-                            "text": str(text).strip(),
-                        })
-        elif isinstance(parsed, list):
-            for seg in parsed:
-                if isinstance(seg, (list, tuple)) and len(seg) >= 3:
-                    segments.append({
-                        "start": _coerce_time(seg[0]),
-                        "end": _coerce_time(seg[1]),
-                        "text": str(seg[2]).strip(),
-                    })
+        detected_language = parsed.get("language") if isinstance(parsed, dict) else None
+        if not segments:
+            segments = _segments_from_payload(parsed)
+        parsed = None
 
         if not segments and srt_path.exists():
             try:
@@ -459,6 +707,9 @@ console.log('{json_marker}' + JSON.stringify(result));
     ]
     if language and language not in {"auto", ""}:
         cmd.extend(["-l", language])
+    if prompt:
+        cmd.extend(["--prompt", prompt])
+    cmd.extend(_calibrated_thread_flags(calibrated))
 
     # Add GPU acceleration flags if available
     gpu_flags = get_whisper_gpu_flags()
@@ -467,10 +718,19 @@ console.log('{json_marker}' + JSON.stringify(result));
         logger.info("GPU acceleration enabled with flags: %s", " ".join(gpu_flags))
 
     logger.info("Running whisper.cpp: %s", " ".join(cmd))
+    stdout_language: List[str] = []
+
+    def _capture_language(line: str) -> bool:
+        match = _DETECTED_LANGUAGE_REGEX.search(line)
+        if match:
+            stdout_language[:] = [match.group(1).lower()]
+        return False
+
     return_code, output, _ = _stream_process_output(
         cmd,
         progress_callback=progress_callback,
         progress_message="Transcribing audio...",
+        line_callback=_capture_language,
     )
     if return_code != 0 and "-oj" in cmd:
         fallback_cmd = [arg for arg in cmd if arg != "-oj"]
@@ -478,6 +738,7 @@ console.log('{json_marker}' + JSON.stringify(result));
             fallback_cmd,
             progress_callback=progress_callback,
             progress_message="Transcribing audio...",
+            line_callback=_capture_language,
         )
 
     if return_code != 0:
@@ -488,19 +749,18 @@ console.log('{json_marker}' + JSON.stringify(result));
     detected_language = None
 
     if json_path.exists():
+        json_info: Dict[str, Any] = {}
         try:
-            with json_path.open("r", encoding="utf-8") as f:
-                payload = json.load(f)
-            detected_language = payload.get("language")
-            raw_segments = payload.get("segments") or []
-            for seg in raw_segments:
-                segments.append({
-                    "start": _coerce_time(seg.get("start", 0.0)),
-                    "end": _coerce_time(seg.get("end", 0.0)),
-                    "text": str(seg.get("text", "")).strip(),
-                })
+            for segment in _iter_whisper_json_segments(json_path, json_info):
+                segments.append(segment)
         except Exception as exc:
             logger.warning("Failed to parse whisper JSON output: %s", exc)
+            segments = []
+        header_language = str(json_info.get("language") or "").strip().lower()
+        if header_language and header_language != "auto":
+            detected_language = header_language
+    if not detected_language and stdout_language:
+        detected_language = stdout_language[0]
 
     if not segments and srt_path.exists():
         try:
@@ -529,3 +789,94 @@ console.log('{json_marker}' + JSON.stringify(result));
         "language": detected_language or language or "auto",
         "duration": duration,
     }
+
+
+_DETECTED_LANGUAGE_REGEX = re.compile(
+    r"auto-detected language:\s*([a-z_]+)(?:\s*\(p\s*=\s*([0-9.]+)\))?",
+    re.IGNORECASE,
+)
+
+
+def detect_language_whisper_cpp(
+    audio_path: Path | str,
+    *,
+    model_path: Optional[str] = None,
+) -> Optional[Dict[str, Any]]:
+    """Run the engine in detect-only mode and return the spoken language of *audio_path*."""
+    engine = resolve_whisper_engine()
+    model_file = resolve_whisper_model(model_path)
+    if not engine or not model_file:
+        return None
+
+    audio_path = Path(audio_path)
+    if not audio_path.exists():
+        return None
+
+    if engine.suffix.lower() == ".mjs":
+        node_bin = resolve_node_binary()
+        if not node_bin:
+            return None
+        node_script = _build_node_script(
+            engine,
+            audio_path,
+            {
+                "model": str(model_file),
+                "language": "auto",
+                "detect_language": True,
+            },
+        )
+        cmd = [node_bin, "--input-type=module", "-e", node_script]
+        return_code, output, json_payload = _stream_process_output(
+            cmd,
+            json_marker=_JSON_MARKER,
+            env=_build_node_env(),
+        )
+        if return_code != 0:
+            logger.warning("Language detection runner failed: %s", output.strip() or "Unknown error")
+            return None
+        parsed: Any = None
+        if json_payload:
+            try:
+                parsed = json.loads(json_payload)
+            except Exception:
+                parsed = None
+        if isinstance(parsed, str):
+            try:
+                parsed = json.loads(parsed)
+            except Exception:
+                parsed = None
+        if isinstance(parsed, dict) and parsed.get("language"):
+            probability = parsed.get("language_probability", parsed.get("probability"))
+            return {
+                "language": str(parsed["language"]).strip().lower(),
+                "probability": float(probability) if isinstance(probability, (int, float)) else None,
+            }
+    else:
+        cmd = [
+            str(engine),
+            "-m",
+            str(model_file),
+            "-f",
+            str(audio_path),
+            "-dl",
+        ]
+        cmd.extend(_calibrated_thread_flags(get_calibrated_settings()))
+        cmd.extend(get_whisper_gpu_flags())
+        logger.info("Running whisper.cpp language detection: %s", " ".join(cmd))
+        return_code, output, _ = _stream_process_output(cmd)
+        if return_code != 0:
+            logger.warning("Language detection failed: %s", output.strip() or "Unknown error")
+            return None
+
+    match = None
+    for match in _DETECTED_LANGUAGE_REGEX.finditer(output):
+        pass
+    if not match:
+        return None
+    probability = None
+    if match.group(2):
+        try:
+            probability = float(match.group(2))
+        except ValueError:
+            probability = None
+    return {"language": match.group(1).lower(), "probability": probability}
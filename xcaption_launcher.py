@@ -168,8 +168,20 @@ def print_banner():
         print(line)
 
 
+def _stop_web_server():
+    """Let the web server finish in-flight requests before the process exits."""
+    native_web_server = sys.modules.get("native_web_server")
+    if native_web_server is None:
+        return
+    try:
+        native_web_server.stop_server()
+    except Exception as exc:
+        logger.debug("Failed to stop web server: %s", exc)
+
+
 def _force_exit(code: int = 0):
     """Force terminate the process (used when GUI loop doesn't exit cleanly)."""
+    _stop_web_server()
     try:
         sys.stdout.flush()
         sys.stderr.flush()
@@ -1780,6 +1792,7 @@ def main():
             print("Shutting down...")
             print("=" * 70)
             print()
+            _stop_web_server()
             print("Thank you for using X-Caption!")
             print()
 